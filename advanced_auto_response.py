@@ -13,53 +13,465 @@
 - Web API連携
 """
 
+from __future__ import annotations
+
+import argparse
 import asyncio
+import functools
+import hashlib
 import json
 import logging
+import queue
 import sqlite3
 import time
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+import unicodedata
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 import re
-import random
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
 
-# 音声処理
-import speech_recognition as sr
-import pyttsx3
-import pyaudio
-import wave
+# 起動時間の計測と遅延読み込み
+from startup_profile import PROFILE, is_loaded, lazy_component, lazy_import
+
+_import_started = time.perf_counter()
+
+# 音声処理（音声の入出力を使うときに読み込む）
+sr = lazy_import('speech_recognition')
+pyttsx3 = lazy_import('pyttsx3')
+
+# 常時録音・発話区間検出
+audio_capture = lazy_import('audio_capture')
+
+# 音声認識バックエンド
+speech_backends = lazy_import('speech_backends')
+
+# ログ出力・計測
+from logging_setup import category_logger, configure_categories, setup_logging
+from metrics import MetricsExporter, MetricsRegistry, timed_method
+
+# 意図予測の近似最近傍インデックス
+from intent_index import IntentIndex, vectorizer_fingerprint
+
+# 応答カタログ・会話履歴
+from conversation_history import ConversationHistory, HistoryRecord
+from response_catalog import ResponseCatalog
+
+# 音声合成ワーカー・合成音声キャッシュ
+audio_cache = lazy_import('tts_cache')
+from tts_worker import SpeechJob, TTSWorker
 
-# 機械学習
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import joblib
+# 機械学習（数値計算・ベクトライザーは学習データを読み込むときに読み込む）
+np = lazy_import('numpy')
+sp = lazy_import('scipy.sparse')
+sklearn_text = lazy_import('sklearn.feature_extraction.text')
 
-# 自然言語処理
-import nltk
-from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
+# 自然言語処理（感情分析を使うときに読み込む）
+nltk_sentiment = lazy_import('nltk.sentiment')
 
 # 設定管理
 import yaml
-from dotenv import load_dotenv
 import os
 
-# ログ設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('advanced_auto_response.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# ログ設定（書式化とファイル出力はバックグラウンドで行う）
+setup_logging('advanced_auto_response.log',
+              fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 会話の1ターンごとに出力するログ（logging.categories で間引き・無効化できる）
+recognition_logger = category_logger("recognition")
+speech_logger = category_logger("speech")
+learning_logger = category_logger("learning")
+
+# 頻繁に実行するSQL（同じ文字列を使い回し、接続ごとのステートメントキャッシュに載せる）
+SQL_INSERT_CONVERSATION = '''
+    INSERT INTO conversations
+    (user_id, session_id, user_input, intent, emotion, confidence, response, language)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_INSERT_LEARNING = '''
+    INSERT INTO learning_data (input_text, input_hash, intent, response, confidence, last_seen)
+    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+'''
+# 同じ入力と意図の行は出現回数を数え、信頼度は出現回数で重み付けした平均にする
+SQL_UPDATE_LEARNING = '''
+    UPDATE learning_data
+    SET hit_count = hit_count + 1,
+        confidence = (confidence * hit_count + ?) / (hit_count + 1),
+        response = ?,
+        last_seen = CURRENT_TIMESTAMP
+    WHERE input_hash = ? AND intent = ?
+'''
+SQL_UPSERT_LEARNING = SQL_INSERT_LEARNING + '''
+    ON CONFLICT (input_hash, intent) DO UPDATE
+    SET hit_count = hit_count + 1,
+        confidence = (confidence * hit_count + excluded.confidence) / (hit_count + 1),
+        response = excluded.response,
+        last_seen = CURRENT_TIMESTAMP
+'''
+SQL_SELECT_LEARNING = 'SELECT id, input_text, intent FROM learning_data'
+SQL_SELECT_LEARNING_SINCE = 'SELECT id, input_text, intent FROM learning_data WHERE id > ? ORDER BY id'
+
+class ConnectionManager:
+    """SQLite接続マネージャー
+    
+    スレッドごとに接続を1本保持して使い回す。WALジャーナルとbusy_timeoutにより、
+    複数セッションからの同時書き込みでも読み込みを妨げず、ロック待ちで失敗しにくい。
+    """
+    
+    def __init__(self, db_path: str, busy_timeout_ms: int = 5000,
+                 cached_statements: int = 256, synchronous: str = 'NORMAL'):
+        """接続マネージャーを初期化"""
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.synchronous = synchronous
+        
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._generation = 0
+    
+    def connection(self) -> sqlite3.Connection:
+        """呼び出し元スレッド専用の接続を取得"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.generation == self._generation:
+            return conn
+        
+        # 自動コミットモードで開き、書き込みは transaction() で明示的に囲む
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-8000')
+        
+        with self._lock:
+            self._connections.append(conn)
+            self._local.generation = self._generation
+        self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """書き込みトランザクション（開始時に書き込みロックを確保）"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+    
+    def close_all(self):
+        """すべてのスレッドの接続を閉じる（次回の利用時に再接続）"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.error(f"データベース接続クローズエラー: {e}")
+
+class ConversationWriter:
+    """会話ログのライトビハインド書き込み
+    
+    会話行をメモリ上の有界キューに溜め、バックグラウンドスレッドが
+    まとめて1トランザクションで書き込む。キューが満杯の場合は投入側が待機し、
+    待機がタイムアウトした場合やスレッド停止中は同期的に書き込む。
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, db: ConnectionManager, max_queue: int = 10000,
+                 batch_size: int = 200, flush_interval: float = 0.5,
+                 put_timeout: float = 1.0):
+        """ライターを初期化"""
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'written': 0,
+            'batches': 0,
+            'failed': 0,
+            'sync_writes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    @property
+    def queue_depth(self) -> int:
+        """書き込み待ちの行数"""
+        return self._queue.qsize()
+    
+    def start(self):
+        """書き込みスレッドを開始"""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """残りの行をすべて書き込んでからスレッドを停止"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        try:
+            self._queue.put_nowait(self._STOP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+        
+        # 停止間際に投入された行も書き込む
+        self._drain()
+    
+    def submit(self, row: Tuple):
+        """会話行を書き込みキューに投入"""
+        if self.is_running:
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+                return
+            except queue.Full:
+                logger.warning("会話書き込みキューが満杯のため同期書き込みします")
+        
+        self._write_batch([row])
+        with self._stats_lock:
+            self._stats['sync_writes'] += 1
+    
+    def flush(self):
+        """投入済みの行がすべて書き込まれるまで待機"""
+        if self.is_running:
+            self._queue.join()
+        else:
+            self._drain()
+    
+    def stats(self) -> Dict:
+        """キュー深さと書き込みレイテンシの統計"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_flush_ms = stats.pop('total_flush_ms')
+        stats['avg_flush_ms'] = total_flush_ms / stats['batches'] if stats['batches'] else 0.0
+        stats['queue_depth'] = self.queue_depth
+        return stats
+    
+    def _run(self):
+        """キューから行を取り出してバッチ書き込み"""
+        while not self._stop.is_set():
+            try:
+                row = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            if row is self._STOP:
+                self._queue.task_done()
+                break
+            self._collect_and_write([row])
+        self._drain()
+    
+    def _drain(self):
+        """キューに残っている行をすべて書き込む"""
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if row is self._STOP:
+                self._queue.task_done()
+                continue
+            self._collect_and_write([row])
+    
+    def _collect_and_write(self, batch: List[Tuple]):
+        """バッチサイズまで行を集めて書き込む"""
+        while len(batch) < self.batch_size:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is self._STOP:
+                self._queue.task_done()
+                continue
+            batch.append(row)
+        try:
+            self._write_batch(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+    
+    def _write_batch(self, batch: List[Tuple]):
+        """1トランザクションでまとめて書き込む"""
+        start_time = time.perf_counter()
+        try:
+            with self.db.transaction() as conn:
+                conn.executemany(SQL_INSERT_CONVERSATION, batch)
+        except Exception as e:
+            logger.error(f"会話書き込みエラー: {e}")
+            with self._stats_lock:
+                self._stats['failed'] += len(batch)
+            return
+        
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        with self._stats_lock:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = elapsed_ms
+            self._stats['max_flush_ms'] = max(self._stats['max_flush_ms'], elapsed_ms)
+            self._stats['total_flush_ms'] += elapsed_ms
+
+def normalize_input(text: str) -> str:
+    """重複判定用に入力を正規化（全角・半角と大文字・小文字を統一し、記号と余分な空白を除く）"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = ''.join(' ' if unicodedata.category(char)[0] in 'PSZ' else char for char in text)
+    return ' '.join(text.split())
+
+def input_hash(text: str) -> str:
+    """正規化した入力のハッシュ"""
+    return hashlib.blake2b(normalize_input(text).encode('utf-8'), digest_size=8).hexdigest()
+
+class LearningStore:
+    """重複を除いた学習データの保存先
+    
+    入力を正規化したハッシュと意図の組ごとに1行だけを保持し、
+    同じ組が再び学習されたら出現回数を増やして信頼度を平均する。
+    長く出現していない行や信頼度の低い行は prune() で削除する。
+    """
+    
+    def __init__(self, db: ConnectionManager):
+        """保存先を初期化"""
+        self.db = db
+    
+    def migrate(self, conn: sqlite3.Connection):
+        """既存の learning_data に列とインデックスを追加し、重複行をまとめる（トランザクション内で呼ぶ）"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(learning_data)')}
+        if 'input_hash' not in columns:
+            conn.execute('ALTER TABLE learning_data ADD COLUMN input_hash TEXT')
+        if 'hit_count' not in columns:
+            conn.execute('ALTER TABLE learning_data ADD COLUMN hit_count INTEGER NOT NULL DEFAULT 1')
+        if 'last_seen' not in columns:
+            conn.execute('ALTER TABLE learning_data ADD COLUMN last_seen DATETIME')
+            conn.execute('UPDATE learning_data SET last_seen = created_at')
+        
+        rows = conn.execute('SELECT id, input_text FROM learning_data WHERE input_hash IS NULL').fetchall()
+        if rows:
+            conn.executemany(
+                'UPDATE learning_data SET input_hash = ? WHERE id = ?',
+                [(input_hash(text), row_id) for row_id, text in rows]
+            )
+            # 相関サブクエリが全件走査にならないよう、まとめる前に一意でないインデックスを作る
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_learning_hash_intent_migrate
+                ON learning_data (input_hash, intent)
+            ''')
+            # 重複した行は最も古い行に出現回数・信頼度・最終出現日時をまとめる
+            conn.execute('''
+                UPDATE learning_data
+                SET hit_count = (SELECT SUM(d.hit_count) FROM learning_data d
+                                 WHERE d.input_hash = learning_data.input_hash
+                                 AND d.intent = learning_data.intent),
+                    confidence = (SELECT SUM(d.confidence * d.hit_count) / SUM(d.hit_count)
+                                  FROM learning_data d
+                                  WHERE d.input_hash = learning_data.input_hash
+                                  AND d.intent = learning_data.intent),
+                    last_seen = (SELECT MAX(d.last_seen) FROM learning_data d
+                                 WHERE d.input_hash = learning_data.input_hash
+                                 AND d.intent = learning_data.intent)
+                WHERE id IN (
+                    SELECT MIN(id) FROM learning_data GROUP BY input_hash, intent HAVING COUNT(*) > 1
+                )
+            ''')
+            deleted = conn.execute('''
+                DELETE FROM learning_data
+                WHERE id NOT IN (SELECT MIN(id) FROM learning_data GROUP BY input_hash, intent)
+            ''').rowcount
+            if deleted:
+                logger.info(f"重複した学習データをまとめました: {deleted}件")
+        
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_learning_hash_intent
+            ON learning_data (input_hash, intent)
+        ''')
+        # 一意インデックスと同じ列のため、移行用のインデックスは不要
+        conn.execute('DROP INDEX IF EXISTS idx_learning_hash_intent_migrate')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_learning_intent ON learning_data (intent)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_learning_last_seen ON learning_data (last_seen)')
+    
+    def record(self, text: str, intent: str, response: str, confidence: float = 1.0) -> Optional[int]:
+        """学習データを1件記録（新しい行を追加した場合はその行ID、既存の行にまとめた場合は None）"""
+        key = input_hash(text)
+        with self.db.transaction() as conn:
+            if conn.execute(SQL_UPDATE_LEARNING, (confidence, response, key, intent)).rowcount:
+                return None
+            return conn.execute(
+                SQL_INSERT_LEARNING, (text, key, intent, response, confidence)
+            ).lastrowid
+    
+    def record_many(self, rows: Iterable[Tuple[str, str, str, float]]):
+        """(入力, 意図, 応答, 信頼度) をまとめて記録"""
+        with self.db.transaction() as conn:
+            conn.executemany(SQL_UPSERT_LEARNING, (
+                (text, input_hash(text), intent, response, confidence)
+                for text, intent, response, confidence in rows
+            ))
+    
+    def prune(self, max_age_days: Optional[float] = None, min_hits: int = 1,
+              min_confidence: float = 0.0, max_rows: Optional[int] = None) -> int:
+        """方針に従って学習データを削除し、削除した行数を返す
+        
+        - 最終出現から max_age_days × min(出現回数, min_hits) 日以上たった行
+          （出現回数の多い行ほど長く残すが、出現回数によらずいずれは削除する）
+        - 信頼度が min_confidence 未満の行
+        - max_rows を超えた分（出現回数が少なく、最終出現が古い順）
+        """
+        deleted = 0
+        with self.db.transaction() as conn:
+            if max_age_days is not None:
+                # 前半の条件は最終出現日時のインデックスで候補を絞り込むため
+                deleted += conn.execute('''
+                    DELETE FROM learning_data
+                    WHERE last_seen < datetime('now', ?)
+                    AND last_seen < datetime('now', '-' || (? * min(hit_count, ?)) || ' days')
+                ''', (f"-{max_age_days} days", max_age_days, max(1, min_hits))).rowcount
+            if min_confidence > 0:
+                deleted += conn.execute(
+                    'DELETE FROM learning_data WHERE confidence < ?', (min_confidence,)
+                ).rowcount
+            if max_rows is not None:
+                deleted += conn.execute('''
+                    DELETE FROM learning_data WHERE id IN (
+                        SELECT id FROM learning_data ORDER BY hit_count, last_seen, id
+                        LIMIT max(0, (SELECT COUNT(*) FROM learning_data) - ?)
+                    )
+                ''', (max_rows,)).rowcount
+        return deleted
+    
+    def stats(self) -> Dict:
+        """行数と出現回数の合計"""
+        rows, hits = self.db.connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(hit_count), 0) FROM learning_data'
+        ).fetchone()
+        return {'rows': rows, 'hits': hits}
+
 @dataclass
 class ConversationContext:
     """会話コンテキスト"""
@@ -68,11 +480,352 @@ class ConversationContext:
     language: str = "ja"
     emotion: str = "neutral"
     confidence: float = 0.0
-    history: List[Dict] = None
+    history: Optional[ConversationHistory] = None
     
     def __post_init__(self):
         if self.history is None:
-            self.history = []
+            self.history = ConversationHistory()
+
+@dataclass
+class BatchResult:
+    """バッチ推論の結果"""
+    text: str
+    intent: str
+    intent_confidence: float
+    emotion: str
+    emotion_confidence: float
+    response: str
+
+class IntentCorpus:
+    """意図予測用の学習コーパス
+    
+    学習データのTF-IDFベクトルをメモリ上の疎行列として保持する。
+    追加された行は末尾ブロックに溜め、一定数ごとに本体の行列へ結合する。
+    ベクトライザーを学習し直すときは新しいインスタンスを作成する。
+    base_row_id 以下の learning_data 行は構築時に取り込み済みとして扱う。
+    """
+    
+    TAIL_LIMIT = 64
+    
+    def __init__(self, vectorizer: sklearn_text.TfidfVectorizer, texts: Tuple[str, ...] = (),
+                 intents: Tuple[str, ...] = (), base_row_id: int = 0):
+        """学習済みベクトライザーでコーパス全体をベクトル化"""
+        self.vectorizer = vectorizer
+        self.intents: List[str] = list(intents)
+        self.base_row_id = base_row_id
+        self._matrix = vectorizer.transform(texts) if texts else None
+        self._tail: List = []
+        self._lock = threading.Lock()
+        # 近似最近傍インデックス（None なら全件検索）
+        self.index: Optional[IntentIndex] = None
+        
+        # 語彙ドリフトの計測用
+        self._analyzer = vectorizer.build_analyzer()
+        self._vocabulary = vectorizer.vocabulary_
+        # 1件ずつのベクトル化を transform を経由せずに行えるか
+        self._fast_vectorize = (
+            vectorizer.norm == 'l2' and vectorizer.use_idf
+            and not vectorizer.sublinear_tf and not vectorizer.binary
+        )
+        self._idf = vectorizer.idf_ if vectorizer.use_idf else None
+        self.pending_rows = 0
+        self._token_count = 0
+        self._oov_count = 0
+    
+    def __len__(self) -> int:
+        return len(self.intents)
+    
+    @property
+    def matrix(self):
+        """コーパス全体の疎行列（末尾ブロックを結合して返す）"""
+        with self._lock:
+            self._compact()
+            return self._matrix
+    
+    @property
+    def drift(self) -> float:
+        """構築後に追加された行に含まれる語彙外トークンの割合"""
+        if not self._token_count:
+            return 0.0
+        return self._oov_count / self._token_count
+    
+    def add(self, text: str, intent: str, row_id: Optional[int] = None) -> bool:
+        """1行分のベクトルを追加（取り込み済みの行は無視）"""
+        if row_id is not None and row_id <= self.base_row_id:
+            return False
+        
+        vector = self.vectorizer.transform([text])
+        tokens = self._analyzer(text)
+        oov = sum(1 for token in tokens if token not in self._vocabulary)
+        
+        with self._lock:
+            self._tail.append(vector)
+            self.intents.append(intent)
+            if self.index is not None:
+                self.index.add(vector.indices, vector.data)
+            self.pending_rows += 1
+            self._token_count += len(tokens)
+            self._oov_count += oov
+            if len(self._tail) >= self.TAIL_LIMIT:
+                self._compact()
+        return True
+    
+    def _compact(self):
+        """末尾ブロックを本体の行列に結合"""
+        if not self._tail:
+            return
+        blocks = self._tail if self._matrix is None else [self._matrix] + self._tail
+        self._matrix = sp.vstack(blocks, format='csr')
+        self._tail = []
+    
+    def vectorize(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """1件のテキストのTF-IDFベクトル（非ゼロの列番号と値）"""
+        if not self._fast_vectorize:
+            vector = self.vectorizer.transform([text])
+            return vector.indices, vector.data
+        
+        # transform と同じ計算（出現回数 × IDF をL2正規化）を疎行列を作らずに行う
+        counts: Dict[int, int] = {}
+        for token in self._analyzer(text):
+            column = self._vocabulary.get(token)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        columns = np.fromiter(counts.keys(), dtype=np.int32, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * self._idf[columns]
+        if len(weights):
+            weights /= np.sqrt(weights @ weights)
+        return columns, weights
+    
+    def best_match(self, text: str, exact: bool = False) -> Tuple[str, float]:
+        """最も類似度の高い学習データの意図と類似度を返す
+        
+        インデックスがある場合は候補の行だけと比較し、候補がないか
+        どの候補とも類似度が0の場合（exact が真の場合も）は全件と比較する。
+        """
+        columns, weights = self.vectorize(text)
+        
+        with self._lock:
+            if not self.intents:
+                return "unknown", 0.0
+            blocks = [] if self._matrix is None else [self._matrix]
+            if self._tail:
+                blocks.append(sp.vstack(self._tail, format='csr'))
+            intents = self.intents
+            rows_total = len(intents)
+            index = None if exact else self.index
+        
+        if not len(columns):
+            # 語彙に含まれる語がなければ、どの行とも類似度は0
+            return intents[0], 0.0
+        
+        # TF-IDFベクトルはL2正規化済みのため、内積がコサイン類似度になる
+        query = np.zeros(self.vectorizer.idf_.shape[0])
+        query[columns] = weights
+        
+        if index is not None:
+            candidates = index.candidates(columns, weights)
+            candidates = candidates[candidates < rows_total]
+            best_idx, best_similarity, offset = 0, 0.0, 0
+            for block in blocks:
+                selected = candidates[(candidates >= offset) & (candidates < offset + block.shape[0])]
+                if len(selected):
+                    similarities = _row_dots(block, selected - offset, query)
+                    idx = int(np.argmax(similarities))
+                    if similarities[idx] > best_similarity:
+                        best_idx, best_similarity = int(selected[idx]), float(similarities[idx])
+                offset += block.shape[0]
+            if best_similarity > 0:
+                return intents[best_idx], min(best_similarity, 1.0)
+        
+        best_idx, best_similarity, offset = 0, -1.0, 0
+        for block in blocks:
+            similarities = block @ query
+            idx = int(np.argmax(similarities))
+            if similarities[idx] > best_similarity:
+                best_idx, best_similarity = offset + idx, float(similarities[idx])
+            offset += block.shape[0]
+        
+        return intents[best_idx], min(best_similarity, 1.0)
+    
+    def best_matches(self, texts: List[str], chunk_size: int = 4096) -> List[Tuple[str, float]]:
+        """複数テキストをまとめてベクトル化し、それぞれの最類似意図と類似度を返す"""
+        if not texts:
+            return []
+        
+        text_matrix = self.vectorizer.transform(texts)
+        matrix = self.matrix
+        with self._lock:
+            intents = list(self.intents)
+        if matrix is None or not intents:
+            return [("unknown", 0.0)] * len(texts)
+        
+        # 類似度行列が大きくなりすぎないよう、入力側を分割して計算
+        corpus_t = matrix.T.tocsc()
+        results = []
+        for start in range(0, text_matrix.shape[0], chunk_size):
+            similarities = (text_matrix[start:start + chunk_size] @ corpus_t).tocsr()
+            similarities.sort_indices()
+            best_indices = np.asarray(similarities.argmax(axis=1)).ravel()
+            best_values = similarities.max(axis=1).toarray().ravel()
+            results.extend(
+                (intents[idx], min(float(value), 1.0))
+                for idx, value in zip(best_indices, best_values)
+            )
+        return results
+
+def _row_dots(matrix, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """疎行列の指定した行と密ベクトルの内積（行を取り出した行列を作らずに計算）"""
+    starts = matrix.indptr[rows]
+    lengths = matrix.indptr[rows + 1] - starts
+    positions = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+    products = matrix.data[positions] * query[matrix.indices[positions]]
+    return np.bincount(np.repeat(np.arange(len(rows)), lengths), weights=products, minlength=len(rows))
+
+class RefitScheduler:
+    """ベクトライザー再学習のスケジューラー
+    
+    追加行数・経過時間・語彙ドリフト率のいずれかが閾値に達したら再学習する。
+    background が有効な場合は専用スレッドで実行し、会話処理を待たせない。
+    """
+    
+    def __init__(self, refit: Callable[[], None], every_rows: int = 50,
+                 interval_seconds: float = 300.0, drift_threshold: float = 0.2,
+                 background: bool = True):
+        """スケジューラーを初期化"""
+        self.refit = refit
+        self.every_rows = every_rows
+        self.interval_seconds = interval_seconds
+        self.drift_threshold = drift_threshold
+        self.background = background
+        self.refit_count = 0
+        
+        self._dirty = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        """バックグラウンドスレッドを開始"""
+        if not self.background or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="refit-scheduler", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """バックグラウンドスレッドを停止"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def notify(self, pending_rows: int, drift: float):
+        """学習データの追加を通知し、閾値を超えていれば再学習を要求"""
+        self._dirty = True
+        if pending_rows >= self.every_rows or drift >= self.drift_threshold:
+            self.request()
+    
+    def request(self):
+        """再学習を要求"""
+        if self.background:
+            self._wake.set()
+        else:
+            self._run_refit()
+    
+    def _run(self):
+        """再学習要求または一定時間ごとに再学習を実行"""
+        while not self._stop.is_set():
+            requested = self._wake.wait(self.interval_seconds or None)
+            if self._stop.is_set():
+                break
+            self._wake.clear()
+            if requested or self._dirty:
+                self._run_refit()
+    
+    def _run_refit(self):
+        """再学習を実行"""
+        self._dirty = False
+        start_time = time.time()
+        try:
+            self.refit()
+            self.refit_count += 1
+            logger.info(f"ベクトライザーを再学習しました: {time.time() - start_time:.2f}秒")
+        except Exception as e:
+            logger.error(f"再学習エラー: {e}")
+
+class SessionScheduler:
+    """会話セッションスケジューラー
+    
+    音声認識(stt)・自然言語処理(nlp)・データベース(db)・音声合成(tts)の
+    各ステージを専用のスレッドプールで実行し、イベントループを止めずに
+    複数セッションを並行処理する。同時実行セッション数はセマフォで制限する。
+    各セッションは一度に1ステージしか要求せず、プールは到着順に処理するため、
+    特定のセッションがステージを占有することはない。
+    """
+    
+    # マイクと pyttsx3 エンジンは共有資源のため、既定では1スレッドで直列化する
+    DEFAULT_STAGE_WORKERS = {'stt': 1, 'nlp': 4, 'db': 2, 'tts': 1}
+    
+    def __init__(self, max_sessions: int = 4, stage_workers: Optional[Dict[str, int]] = None):
+        """スケジューラーを初期化"""
+        self.max_sessions = max_sessions
+        workers = {**self.DEFAULT_STAGE_WORKERS, **(stage_workers or {})}
+        self._executors = {
+            stage: ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"stage-{stage}")
+            for stage, count in workers.items()
+        }
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    @property
+    def session_ids(self) -> List[str]:
+        """登録中のセッションID（空き待ちを含む）"""
+        return list(self._tasks)
+    
+    async def run_stage(self, stage: str, func: Callable, *args):
+        """ステージ用のスレッドプールでブロッキング処理を実行"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executors[stage], functools.partial(func, *args))
+    
+    def submit(self, session_id: str, session: Callable[[], Awaitable]) -> asyncio.Task:
+        """セッションを登録（同時実行数の上限に達している場合は空きを待つ）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_sessions)
+        
+        if session_id in self._tasks:
+            raise ValueError(f"セッション {session_id} は既に実行中です")
+        
+        task = loop.create_task(self._run_session(session, self._semaphore))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+        return task
+    
+    async def _run_session(self, session: Callable[[], Awaitable], semaphore: asyncio.Semaphore):
+        """実行枠を確保してからセッションを実行"""
+        async with semaphore:
+            return await session()
+    
+    def cancel(self, session_id: str) -> bool:
+        """セッションをキャンセル"""
+        task = self._tasks.get(session_id)
+        if task is None:
+            return False
+        return task.cancel()
+    
+    async def join(self):
+        """登録中のすべてのセッションの終了を待つ"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+    
+    def shutdown(self, wait: bool = True):
+        """ステージのスレッドプールを停止"""
+        for executor in self._executors.values():
+            executor.shutdown(wait=wait, cancel_futures=True)
 
 class AdvancedAutoResponseSystem:
     """高度な自動認識・自動応答システム"""
@@ -80,51 +833,260 @@ class AdvancedAutoResponseSystem:
     def __init__(self, config_file: str = "config.yaml"):
         """システムの初期化"""
         self.config = self.load_config(config_file)
+        
+        # ログの出力レベルとカテゴリごとの間引きを適用
+        log_config = self.config.get('logging', {})
+        logging.getLogger().setLevel(log_config.get('level', 'INFO'))
+        configure_categories(log_config.get('categories', {}))
+        
+        # 処理段階ごとの計測
+        self.metrics = MetricsRegistry()
+        self.metrics_exporter: Optional[MetricsExporter] = None
         self.db_path = self.config.get('database', {}).get('path', 'conversations.db')
+        self.db = ConnectionManager(
+            self.db_path,
+            busy_timeout_ms=self.config['database'].get('busy_timeout_ms', 5000),
+            synchronous=self.config['database'].get('synchronous', 'NORMAL')
+        )
+        
+        # 会話ログのライトビハインド書き込み
+        write_behind = self.config['database'].get('write_behind', {})
+        self.conversation_writer = ConversationWriter(
+            self.db,
+            max_queue=write_behind.get('max_queue', 10000),
+            batch_size=write_behind.get('batch_size', 200),
+            flush_interval=write_behind.get('flush_interval', 0.5)
+        )
+        if write_behind.get('enabled', True):
+            self.conversation_writer.start()
         
-        # 音声認識エンジンの初期化
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        # 音声認識・音声合成のエンジンと感情分析器は最初に使うときに初期化する
+        self.audio_pipeline: Optional[audio_capture.AudioCapturePipeline] = None
+        # 合成音声キャッシュに定型応答を登録した時点の応答カタログの版（再読み込みの検出用）
+        self._cache_catalog_version = -1
         
-        # 音声合成エンジンの初期化
-        self.tts_engine = pyttsx3.init()
-        self.setup_tts()
+        # 応答カタログの読み込み
+        response_config = self.config.get('response', {})
+        self.response_catalog = ResponseCatalog(
+            response_config.get('catalog', 'responses.yaml'),
+            reload_interval=response_config.get('reload_interval', 5),
+            include_emotion=response_config.get('include_emotion', True),
+            include_context=response_config.get('include_context', True),
+            randomize=response_config.get('randomize', True)
+        )
         
         # 機械学習モデルの初期化
-        self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+        self.intent_corpus: Optional[IntentCorpus] = None
+        self._corpus_lock = threading.Lock()
+        self._refit_lock = threading.Lock()
         
         # データベースの初期化
-        self.init_database()
+        self.learning_store = LearningStore(self.db)
+        with PROFILE.measure("phase", "database"):
+            self.init_database()
         
-        # 学習データの読み込み
-        self.load_learning_data()
+        # 古い学習データを削除してから読み込み
+        with PROFILE.measure("phase", "learning_data"):
+            self.prune_learning_data()
+            self.load_learning_data()
+        
+        # 再学習スケジューラーの初期化
+        refit_config = self.config['ml'].get('refit', {})
+        self.refit_scheduler = RefitScheduler(
+            self.refit_vectorizer,
+            every_rows=refit_config.get('every_rows', 50),
+            interval_seconds=refit_config.get('interval_seconds', 300),
+            drift_threshold=refit_config.get('drift_threshold', 0.2),
+            background=refit_config.get('background', True)
+        )
+        self.refit_scheduler.start()
         
         # システム状態
         self.is_running = False
         self.active_sessions = {}
         
+        # セッションスケジューラーの初期化
+        session_config = self.config.get('sessions', {})
+        self.session_scheduler = SessionScheduler(
+            max_sessions=session_config.get('max_concurrent', 4),
+            stage_workers=session_config.get('stage_workers')
+        )
+        
+        # 起動時間の確認
+        startup_config = self.config.get('startup', {})
+        PROFILE.check_budget(startup_config.get('import_budget_ms'))
+        if startup_config.get('report', False):
+            logger.info("起動プロファイル:\n" + PROFILE.report())
+        
         logger.info("高度な自動認識・自動応答システムが初期化されました")
     
+    @lazy_component
+    def recognizer(self) -> sr.Recognizer:
+        """音声認識器"""
+        return sr.Recognizer()
+    
+    @lazy_component
+    def microphone(self) -> sr.Microphone:
+        """マイク"""
+        return sr.Microphone()
+    
+    @lazy_component
+    def speech_recognizer(self) -> speech_backends.ParallelRecognizer:
+        """音声認識バックエンド（並列実行）"""
+        engines_config = self.config.get('recognition_engines', {})
+        return speech_backends.ParallelRecognizer(
+            speech_backends.create_backends(engines_config),
+            confidence_threshold=engines_config.get(
+                'confidence_threshold', self.config['ml']['confidence_threshold']
+            )
+        )
+    
+    @lazy_component
+    def tts_engine(self):
+        """音声合成エンジン"""
+        engine = pyttsx3.init()
+        self.setup_tts(engine)
+        return engine
+    
+    @lazy_component
+    def tts_worker(self) -> TTSWorker:
+        """音声合成ワーカー（発話中も認識を続けられるよう再生を別スレッドで行う）"""
+        worker_config = self.config['tts'].get('worker', {})
+        return TTSWorker(
+            self.tts_engine, self._speak_blocking,
+            max_queue=worker_config.get('max_queue', 32)
+        )
+    
+    @lazy_component
+    def tts_cache(self) -> Optional[audio_cache.TTSAudioCache]:
+        """合成音声キャッシュ（定型の応答を毎回合成し直さない）"""
+        cache_config = self.config['tts'].get('cache', {})
+        if not cache_config.get('enabled', True):
+            return None
+        cache = audio_cache.TTSAudioCache(
+            self.tts_engine,
+            cache_dir=cache_config.get('dir', 'tts_cache/'),
+            max_items=cache_config.get('memory_items', 64),
+            max_disk_items=cache_config.get('disk_items', 512)
+        )
+        # 文脈に応じた応答などはキャッシュせず、定型応答だけを対象にする
+        cache.set_templates(text for text, _ in self.response_texts())
+        self._cache_catalog_version = self.response_catalog.reload_count
+        return cache
+    
+    @lazy_component
+    def sentiment_analyzer(self) -> nltk_sentiment.SentimentIntensityAnalyzer:
+        """感情分析器"""
+        return nltk_sentiment.SentimentIntensityAnalyzer()
+    
     def load_config(self, config_file: str) -> Dict:
         """設定ファイルを読み込み"""
         default_config = {
             'speech': {
                 'language': 'ja-JP',
                 'timeout': 5,
-                'phrase_time_limit': 10
+                'phrase_time_limit': 10,
+                'capture': {
+                    'enabled': True,
+                    'calibration_duration': 0.5,
+                    'energy_ratio': 3.0,
+                    'min_energy': 100,
+                    'noise_adapt_rate': 0.05,
+                    'silence_duration': 0.8,
+                    'pre_roll': 0.3,
+                    'min_speech_duration': 0.2,
+                    'max_queue': 16
+                }
             },
             'tts': {
                 'rate': 150,
                 'volume': 0.8,
-                'voice': 'japanese'
+                'voice': 'japanese',
+                'worker': {
+                    'enabled': True,
+                    'max_queue': 32
+                },
+                'barge_in': False,
+                'cache': {
+                    'enabled': True,
+                    'dir': 'tts_cache/',
+                    'memory_items': 64,
+                    'disk_items': 512,
+                    'warm_up': True
+                }
+            },
+            'recognition_engines': {
+                'primary': 'google',
+                'backends': ['google'],
+                'timeout': 5
             },
             'ml': {
                 'model_path': 'models/',
-                'confidence_threshold': 0.7
+                'confidence_threshold': 0.7,
+                'refit': {
+                    'every_rows': 50,
+                    'interval_seconds': 300,
+                    'drift_threshold': 0.2,
+                    'background': True
+                },
+                'learning': {
+                    'max_age_days': 180,
+                    'min_hits': 2,
+                    'min_confidence': 0.0,
+                    'max_rows': None
+                },
+                'index': {
+                    'enabled': True,
+                    'min_rows': 10000,
+                    'tables': 8,
+                    'bits': 20,
+                    'probes': True,
+                    'max_candidates': 1000,
+                    'path': 'models/intent_index.npz'
+                }
+            },
+            'sessions': {
+                'max_concurrent': 4,
+                'history_size': 100,
+                'stage_workers': {'stt': 1, 'nlp': 4, 'db': 2, 'tts': 1}
+            },
+            'logging': {
+                'level': 'INFO',
+                'categories': {
+                    'recognition': 1.0,
+                    'speech': 1.0,
+                    'learning': 1.0
+                }
+            },
+            'monitoring': {
+                'enabled': True,
+                'metrics_interval': 60,
+                'metrics_host': '127.0.0.1',
+                'metrics_port': None,
+                'metrics_file': 'metrics.json'
+            },
+            'response': {
+                'catalog': 'responses.yaml',
+                'reload_interval': 5,
+                'include_emotion': True,
+                'include_context': True,
+                'randomize': True
+            },
+            'startup': {
+                'import_budget_ms': 1500,
+                'report': False,
+                'preload': ['sentiment_analyzer', 'speech_recognizer', 'tts_worker']
             },
             'database': {
-                'path': 'conversations.db'
+                'path': 'conversations.db',
+                'busy_timeout_ms': 5000,
+                'synchronous': 'NORMAL',
+                'write_behind': {
+                    'enabled': True,
+                    'max_queue': 10000,
+                    'batch_size': 200,
+                    'flush_interval': 0.5
+                }
             }
         }
         
@@ -142,83 +1104,126 @@ class AdvancedAutoResponseSystem:
             logger.error(f"設定ファイル読み込みエラー: {e}")
             return default_config
     
-    def setup_tts(self):
+    def setup_tts(self, engine=None):
         """音声合成エンジンの設定"""
-        voices = self.tts_engine.getProperty('voices')
+        engine = engine or self.tts_engine
+        voices = engine.getProperty('voices')
         
         # 日本語音声を探す
         for voice in voices:
             if 'japanese' in voice.name.lower() or 'ja' in voice.id.lower():
-                self.tts_engine.setProperty('voice', voice.id)
+                engine.setProperty('voice', voice.id)
                 break
         
         # 設定を適用
-        self.tts_engine.setProperty('rate', self.config['tts']['rate'])
-        self.tts_engine.setProperty('volume', self.config['tts']['volume'])
+        engine.setProperty('rate', self.config['tts']['rate'])
+        engine.setProperty('volume', self.config['tts']['volume'])
+    
+    @property
+    def vectorizer(self) -> sklearn_text.TfidfVectorizer:
+        """意図コーパスが使用しているベクトライザー"""
+        return self.intent_corpus.vectorizer
+    
+    def create_vectorizer(self) -> sklearn_text.TfidfVectorizer:
+        """未学習のベクトライザーを作成"""
+        return sklearn_text.TfidfVectorizer(max_features=1000, stop_words='english')
     
     def init_database(self):
         """データベースを初期化"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 会話テーブル
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id TEXT NOT NULL,
-                    session_id TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    user_input TEXT NOT NULL,
-                    intent TEXT,
-                    emotion TEXT,
-                    confidence REAL,
-                    response TEXT NOT NULL,
-                    language TEXT DEFAULT 'ja'
-                )
-            ''')
+            with self.db.transaction() as conn:
+                # 会話テーブル
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS conversations (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id TEXT NOT NULL,
+                        session_id TEXT NOT NULL,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        user_input TEXT NOT NULL,
+                        intent TEXT,
+                        emotion TEXT,
+                        confidence REAL,
+                        response TEXT NOT NULL,
+                        language TEXT DEFAULT 'ja'
+                    )
+                ''')
             
-            # 学習データテーブル
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS learning_data (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    input_text TEXT NOT NULL,
-                    intent TEXT NOT NULL,
-                    response TEXT NOT NULL,
-                    confidence REAL DEFAULT 1.0,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+                # 学習データテーブル
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS learning_data (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        input_text TEXT NOT NULL,
+                        intent TEXT NOT NULL,
+                        response TEXT NOT NULL,
+                        confidence REAL DEFAULT 1.0,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        input_hash TEXT,
+                        hit_count INTEGER NOT NULL DEFAULT 1,
+                        last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                # 重複除去用の列・インデックス（既存のデータベースも移行する）
+                self.learning_store.migrate(conn)
             
-            conn.commit()
-            conn.close()
             logger.info("データベースを初期化しました")
             
         except Exception as e:
             logger.error(f"データベース初期化エラー: {e}")
     
     def load_learning_data(self):
-        """学習データを読み込み"""
+        """学習データを読み込み、ベクトライザーとコーパス行列を再構築"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT input_text, intent FROM learning_data')
-            data = cursor.fetchall()
+            data = self.db.connection().execute(SQL_SELECT_LEARNING).fetchall()
             
             if data:
-                texts, intents = zip(*data)
-                self.vectorizer.fit(texts)
+                row_ids, texts, intents = zip(*data)
+                vectorizer = self.create_vectorizer()
+                vectorizer.fit(texts)
+                corpus = IntentCorpus(vectorizer, texts, intents, base_row_id=max(row_ids))
+                corpus.index = self.build_intent_index(corpus)
+                self.swap_intent_corpus(corpus)
                 logger.info(f"学習データを読み込みました: {len(data)}件")
             else:
                 # デフォルト学習データ
                 self.load_default_learning_data()
             
-            conn.close()
-            
         except Exception as e:
             logger.error(f"学習データ読み込みエラー: {e}")
-            self.load_default_learning_data()
+            # 再学習に失敗した場合は現在のコーパスを使い続ける
+            if self.intent_corpus is None:
+                self.load_default_learning_data()
+    
+    def build_intent_index(self, corpus: IntentCorpus) -> Optional[IntentIndex]:
+        """コーパスの近似最近傍インデックスを読み込みまたは構築（件数が少なければ None）"""
+        index_config = self.config['ml'].get('index', {})
+        if not index_config.get('enabled', True) or len(corpus) < index_config.get('min_rows', 10000):
+            return None
+        
+        options = {
+            key: index_config[key]
+            for key in ('tables', 'bits', 'probes', 'max_candidates', 'seed') if key in index_config
+        }
+        path = index_config.get('path', 'models/intent_index.npz')
+        matrix = corpus.matrix
+        fingerprint = vectorizer_fingerprint(corpus.vectorizer, len(corpus), corpus.base_row_id)
+        
+        # 同じ学習データ・語彙で保存したインデックスがあれば再利用
+        try:
+            index = IntentIndex.load(path, matrix.shape[1], fingerprint, **options)
+            if index is not None:
+                logger.info(f"意図インデックスを読み込みました: {len(index)}件")
+                return index
+        except Exception as e:
+            logger.error(f"意図インデックス読み込みエラー: {e}")
+        
+        index = IntentIndex.build(matrix, fingerprint=fingerprint, **options)
+        try:
+            index.save(path)
+        except Exception as e:
+            logger.error(f"意図インデックス保存エラー: {e}")
+        logger.info(f"意図インデックスを構築しました: {len(index)}件")
+        return index
     
     def load_default_learning_data(self):
         """デフォルト学習データを読み込み"""
@@ -236,43 +1241,77 @@ class AdvancedAutoResponseSystem:
         ]
         
         texts, intents = zip(*default_data)
-        self.vectorizer.fit(texts)
+        vectorizer = self.create_vectorizer()
+        vectorizer.fit(texts)
+        
+        # デフォルトデータは語彙の学習のみに使用し、類似度計算の対象にはしない
+        self.swap_intent_corpus(IntentCorpus(vectorizer))
         logger.info("デフォルト学習データを読み込みました")
     
+    def swap_intent_corpus(self, corpus: IntentCorpus):
+        """再学習中に追加された行を取り込んでからコーパスを差し替え"""
+        with self._corpus_lock:
+            rows = self.db.connection().execute(
+                SQL_SELECT_LEARNING_SINCE, (corpus.base_row_id,)
+            ).fetchall()
+            for row_id, text, intent in rows:
+                corpus.add(text, intent)
+                corpus.base_row_id = row_id
+            
+            self.intent_corpus = corpus
+    
+    def start_audio_capture(self, source: Optional[audio_capture.AudioSource] = None):
+        """常時録音パイプラインを開始（ソース省略時はマイク）"""
+        if self.audio_pipeline is not None and self.audio_pipeline.is_running:
+            return
+        self.audio_pipeline = audio_capture.AudioCapturePipeline.from_config(
+            source or audio_capture.MicrophoneSource(self.microphone),
+            self.config['speech'].get('capture', {}),
+            phrase_time_limit=self.config['speech']['phrase_time_limit']
+        )
+        if self.config['tts'].get('barge_in', False):
+            # 利用者が話し始めたら再生中の応答を止める
+            self.audio_pipeline.detector.on_speech_start = self.tts_worker.interrupt
+        self.audio_pipeline.start()
+    
+    def listen_for_utterance(self) -> sr.AudioData:
+        """発話を1つ取得"""
+        if self.audio_pipeline is not None and self.audio_pipeline.is_active:
+            # 常時録音パイプラインで検出済みの発話区間を取り出す
+            audio = self.audio_pipeline.get_utterance(timeout=self.config['speech']['timeout'])
+            if audio is None:
+                raise sr.WaitTimeoutError("発話区間が検出されませんでした")
+            return audio
+        
+        with self.microphone as source:
+            # 環境ノイズを調整
+            self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            
+            # 音声を聞く
+            return self.recognizer.listen(
+                source, 
+                timeout=self.config['speech']['timeout'],
+                phrase_time_limit=self.config['speech']['phrase_time_limit']
+            )
+    
+    @timed_method("recognition")
+    def recognize_audio(self, audio: sr.AudioData) -> Tuple[Optional[str], float]:
+        """音声データをテキストに変換"""
+        # 複数の認識エンジンを並列に実行し、最良の結果を選択
+        result = self.speech_recognizer.recognize(audio, self.config['speech']['language'])
+        
+        if result is not None:
+            recognition_logger.info("音声認識結果: %s (信頼度: %s, エンジン: %s)",
+                                    result.text, result.confidence, result.engine)
+            return result.text, result.confidence
+        
+        return None, 0.0
+    
     def recognize_speech_advanced(self, session_id: str) -> Optional[Tuple[str, float]]:
         """高度な音声認識"""
         try:
-            with self.microphone as source:
-                # 環境ノイズを調整
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                
-                # 音声を聞く
-                audio = self.recognizer.listen(
-                    source, 
-                    timeout=self.config['speech']['timeout'],
-                    phrase_time_limit=self.config['speech']['phrase_time_limit']
-                )
-                
-                # 複数の認識エンジンを試す
-                recognition_results = []
-                
-                # Google音声認識
-                try:
-                    text = self.recognizer.recognize_google(
-                        audio, 
-                        language=self.config['speech']['language']
-                    )
-                    recognition_results.append(("google", text, 0.8))
-                except:
-                    pass
-                
-                # 最も信頼性の高い結果を選択
-                if recognition_results:
-                    best_result = max(recognition_results, key=lambda x: x[2])
-                    logger.info(f"音声認識結果: {best_result[1]} (信頼度: {best_result[2]})")
-                    return best_result[1], best_result[2]
-                
-                return None, 0.0
+            audio = self.listen_for_utterance()
+            return self.recognize_audio(audio)
                 
         except sr.WaitTimeoutError:
             logger.warning("音声入力のタイムアウト")
@@ -281,6 +1320,7 @@ class AdvancedAutoResponseSystem:
             logger.error(f"音声認識エラー: {e}")
             return None, 0.0
     
+    @timed_method("analyze_emotion")
     def analyze_emotion(self, text: str) -> Tuple[str, float]:
         """感情分析"""
         try:
@@ -304,33 +1344,12 @@ class AdvancedAutoResponseSystem:
             logger.error(f"感情分析エラー: {e}")
             return "neutral", 0.5
     
+    @timed_method("predict_intent")
     def predict_intent(self, text: str) -> Tuple[str, float]:
         """意図予測（機械学習）"""
         try:
-            # テキストをベクトル化
-            text_vector = self.vectorizer.transform([text])
-            
-            # 学習データから類似度を計算
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT input_text, intent FROM learning_data')
-            data = cursor.fetchall()
-            conn.close()
-            
-            if not data:
-                return "unknown", 0.0
-            
-            texts, intents = zip(*data)
-            data_vectors = self.vectorizer.transform(texts)
-            
-            # コサイン類似度を計算
-            similarities = cosine_similarity(text_vector, data_vectors)[0]
-            max_similarity_idx = np.argmax(similarities)
-            max_similarity = similarities[max_similarity_idx]
-            
-            predicted_intent = intents[max_similarity_idx]
-            
-            return predicted_intent, float(max_similarity)
+            # メモリ上のコーパス行列との内積で類似度を計算
+            return self.intent_corpus.best_match(text)
             
         except Exception as e:
             logger.error(f"意図予測エラー: {e}")
@@ -361,158 +1380,247 @@ class AdvancedAutoResponseSystem:
             logger.error(f"応答生成エラー: {e}")
             return "申し訳ございませんが、理解できませんでした。"
     
-    def create_response(self, text: str, intent: str, emotion: str, context: ConversationContext) -> str:
-        """応答を作成"""
-        # 基本的な応答パターン
-        response_templates = {
-            "greeting": [
-                "こんにちは！お疲れ様です。",
-                "はじめまして！何かお手伝いできることはありますか？",
-                "おはようございます！今日も一日頑張りましょう。"
-            ],
-            "thanks": [
-                "どういたしまして！お役に立てて嬉しいです。",
-                "こちらこそ、ありがとうございます。",
-                "お気軽にご相談ください。"
-            ],
-            "help": [
-                "お手伝いさせていただきます。どのようなことでお困りですか？",
-                "心配いりません。一緒に解決しましょう。",
-                "サポートいたします。詳しく教えてください。"
-            ],
-            "question": [
-                "良い質問ですね。詳しく調べてお答えします。",
-                "その件について確認いたします。",
-                "興味深いご質問です。検討して回答いたします。"
-            ],
-            "goodbye": [
-                "お疲れ様でした！またお会いしましょう。",
-                "さようなら！良い一日をお過ごしください。",
-                "また次回お会いできるのを楽しみにしています。"
-            ]
-        }
+    @timed_method("process_batch")
+    def process_batch(self, texts: List[str],
+                      contexts: Optional[List[ConversationContext]] = None,
+                      save: bool = True) -> List[BatchResult]:
+        """テキストのみのバッチ推論
         
-        # 感情に応じた応答の調整
-        if emotion == "positive":
-            prefix = "素晴らしいですね！"
-        elif emotion == "negative":
-            prefix = "お困りのようですね。"
-        else:
-            prefix = ""
+        入力全体を1回でベクトル化してコーパスとの類似度を行列演算で求め、
+        結果は1トランザクションでまとめて保存する。contexts を指定した場合は
+        各コンテキストの感情・信頼度・履歴を更新する。
+        """
+        if contexts is not None and len(contexts) != len(texts):
+            raise ValueError("texts と contexts の件数が一致しません")
         
-        # 応答を選択
-        if intent in response_templates:
-            base_response = random.choice(response_templates[intent])
-        else:
-            base_response = "理解いたしました。他に何かお手伝いできることはありますか？"
+        intents = self.intent_corpus.best_matches(texts)
         
-        # 文脈を考慮した応答
-        if context.history:
-            recent_topics = [h.get('intent', '') for h in context.history[-3:]]
-            if intent in recent_topics:
-                base_response += " 先ほどの件についても、何かご質問はございますか？"
+        # コンテキストがない入力は、履歴を持たない共通のバッチ用コンテキストで処理
+        batch_context = ConversationContext(
+            user_id="batch",
+            session_id=f"batch_{int(time.time())}"
+        )
         
-        return f"{prefix} {base_response}".strip()
+        results = []
+        rows = []
+        for i, (text, (intent, intent_confidence)) in enumerate(zip(texts, intents)):
+            context = contexts[i] if contexts is not None else batch_context
+            emotion, emotion_confidence = self.analyze_emotion(text)
+            response = self.create_response(text, intent, emotion, context)
+            
+            if contexts is not None:
+                context.emotion = emotion
+                context.confidence = intent_confidence
+                context.history.append(HistoryRecord(text, intent, response, emotion))
+            
+            results.append(BatchResult(
+                text, intent, intent_confidence, emotion, emotion_confidence, response
+            ))
+            rows.append((
+                context.user_id, context.session_id, text, intent,
+                emotion, intent_confidence, response, context.language
+            ))
+        
+        if save and rows:
+            with self.db.transaction() as conn:
+                conn.executemany(SQL_INSERT_CONVERSATION, rows)
+        
+        logger.info(f"バッチ推論を実行しました: {len(texts)}件")
+        return results
     
+    @timed_method("create_response")
+    def create_response(self, text: str, intent: str, emotion: str, context: ConversationContext) -> str:
+        """応答を作成（感情の前置きと文脈の追加文はカタログで組み立て済み）"""
+        # 直近の会話と同じ意図かどうか
+        follow_up = context.history.has_recent_intent(intent)
+        
+        return self.response_catalog.choose(intent, emotion, context.language, follow_up)
+    
+    @timed_method("save_conversation")
     def save_conversation(self, context: ConversationContext, user_input: str, 
                          intent: str, emotion: str, confidence: float, response: str):
         """会話をデータベースに保存"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO conversations 
-                (user_id, session_id, user_input, intent, emotion, confidence, response, language)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (context.user_id, context.session_id, user_input, intent, 
-                  emotion, confidence, response, context.language))
-            
-            conn.commit()
-            conn.close()
-            
-            # コンテキスト履歴に追加
-            context.history.append({
-                'timestamp': datetime.now().isoformat(),
-                'user_input': user_input,
-                'intent': intent,
-                'emotion': emotion,
-                'response': response
-            })
+            # 書き込みはバックグラウンドでまとめて行う
+            self.conversation_writer.submit((
+                context.user_id, context.session_id, user_input, intent,
+                emotion, confidence, response, context.language
+            ))
+            
+            # コンテキスト履歴に追加（データベースには書き込み済みのため、あふれた分は破棄する）
+            context.history.append(HistoryRecord(user_input, intent, response, emotion))
             
         except Exception as e:
             logger.error(f"会話保存エラー: {e}")
     
-    def speak_advanced(self, text: str, emotion: str = "neutral"):
-        """高度な音声合成"""
+    def speak_advanced(self, text: str, emotion: str = "neutral",
+                       wait: bool = False) -> Optional[SpeechJob]:
+        """高度な音声合成（ワーカー動作中はキューに追加して即座に戻る）"""
+        if not self.tts_worker.is_running:
+            self._speak_blocking(text, emotion)
+            return None
+        
+        job = self.tts_worker.say(text, emotion)
+        if wait:
+            job.wait()
+        return job
+    
+    @timed_method("speak")
+    def _speak_blocking(self, text: str, emotion: str = "neutral"):
+        """感情に応じた音声合成（再生完了まで待機）"""
         try:
-            # 感情に応じて音声パラメータを調整
-            if emotion == "positive":
-                self.tts_engine.setProperty('rate', 160)
-            elif emotion == "negative":
-                self.tts_engine.setProperty('rate', 140)
-            else:
-                self.tts_engine.setProperty('rate', 150)
+            self.apply_voice(emotion)
             
-            logger.info(f"音声出力: {text} (感情: {emotion})")
+            speech_logger.info("音声出力: %s (感情: %s)", text, emotion)
+            if self._play_cached(text, emotion):
+                return
             self.tts_engine.say(text)
             self.tts_engine.runAndWait()
             
         except Exception as e:
             logger.error(f"音声合成エラー: {e}")
     
+    def apply_voice(self, emotion: str):
+        """感情に応じて音声パラメータを調整"""
+        if emotion == "positive":
+            self.tts_engine.setProperty('rate', 160)
+        elif emotion == "negative":
+            self.tts_engine.setProperty('rate', 140)
+        else:
+            self.tts_engine.setProperty('rate', 150)
+    
+    def _play_cached(self, text: str, emotion: str) -> bool:
+        """キャッシュした音声で再生（再生できなければ偽）"""
+        if self.tts_cache is None:
+            return False
+        try:
+            # 応答カタログが再読み込みされていれば定型応答の一覧を更新
+            if self._cache_catalog_version != self.response_catalog.reload_count:
+                self._cache_catalog_version = self.response_catalog.reload_count
+                self.tts_cache.set_templates(text for text, _ in self.response_texts())
+            return self.tts_cache.play(text, emotion, lambda: self.tts_worker.interrupted)
+        except Exception as e:
+            # 出力デバイスを開けない場合などは以降エンジンで直接再生する
+            logger.warning(f"キャッシュ音声の再生エラー: {e}")
+            self.tts_cache = None
+            return False
+    
+    def response_texts(self, language: Optional[str] = None) -> List[Tuple[str, str]]:
+        """起こりうる定型応答の (テキスト, 感情) の一覧（language を指定するとその言語の応答だけ）"""
+        texts = [
+            ("高度な自動認識・自動応答システムを開始します。何かお話しください。", "neutral"),
+            ("システムを終了します。お疲れ様でした。", "neutral")
+        ]
+        texts.extend(self.response_catalog.all_texts(language))
+        return texts
+    
+    def response_language(self) -> str:
+        """認識言語（speech.language）に対応する応答カタログの言語"""
+        language = self.config['speech']['language'].split('-')[0]
+        if language not in self.response_catalog.languages:
+            return self.response_catalog.default_language
+        return language
+    
+    def warm_up_tts_cache(self) -> Optional[SpeechJob]:
+        """認識言語の定型応答を、音声合成ワーカーが発話していない間に事前合成するジョブを追加
+        
+        合成はエンジンを操作するワーカーのスレッドで行う。ワーカーが動作していなければ事前合成せず、
+        定型応答は初回の再生時に合成する。
+        """
+        if self.tts_cache is None or not self.tts_worker.is_running:
+            return None
+        steps = self.tts_cache.warm_up_steps(
+            self.response_texts(self.response_language()), prepare=self.apply_voice
+        )
+        return self.tts_worker.run_when_idle(steps, "tts_cache warm-up")
+    
+    @timed_method("learn_from_interaction")
     def learn_from_interaction(self, user_input: str, intent: str, response: str, 
                               confidence: float = 1.0):
         """インタラクションから学習"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO learning_data (input_text, intent, response, confidence)
-                VALUES (?, ?, ?, ?)
-            ''', (user_input, intent, response, confidence))
-            
-            conn.commit()
-            conn.close()
+            row_id = self.learning_store.record(user_input, intent, response, confidence)
+            if row_id is None:
+                # 既存の行の出現回数を増やしただけなのでコーパスは変わらない
+                learning_logger.info("学習データの出現回数を更新しました: %s", intent)
+                return
             
-            # ベクトライザーを再学習
-            self.load_learning_data()
+            # コーパス行列に追加（語彙の再学習はスケジューラーに任せる）
+            with self._corpus_lock:
+                corpus = self.intent_corpus
+                corpus.add(user_input, intent, row_id)
+            self.refit_scheduler.notify(corpus.pending_rows, corpus.drift)
             
-            logger.info(f"学習データを追加しました: {intent}")
+            learning_logger.info("学習データを追加しました: %s", intent)
             
         except Exception as e:
             logger.error(f"学習エラー: {e}")
     
-    async def process_conversation_async(self, session_id: str):
-        """非同期会話処理"""
+    def prune_learning_data(self) -> int:
+        """ml.learning の方針で古い学習データや信頼度の低い学習データを削除"""
+        policy = self.config['ml'].get('learning', {})
+        try:
+            deleted = self.learning_store.prune(
+                max_age_days=policy.get('max_age_days'),
+                min_hits=policy.get('min_hits', 1),
+                min_confidence=policy.get('min_confidence', 0.0),
+                max_rows=policy.get('max_rows')
+            )
+            if deleted:
+                logger.info(f"学習データを削除しました: {deleted}件")
+            return deleted
+        except Exception as e:
+            logger.error(f"学習データ削除エラー: {e}")
+            return 0
+    
+    def refit_vectorizer(self):
+        """古い学習データを削除してからベクトライザーを再学習し、コーパス行列を再構築して差し替え"""
+        with self._refit_lock:
+            self.prune_learning_data()
+            self.load_learning_data()
+    
+    async def process_conversation_async(self, session_id: str, user_id: str = "user_001"):
+        """非同期会話処理（ブロッキング処理はステージごとのスレッドプールで実行）"""
+        history_size = self.config.get('sessions', {}).get('history_size', 100)
         context = ConversationContext(
-            user_id="user_001",
+            user_id=user_id,
             session_id=session_id,
-            language="ja"
+            language="ja",
+            history=ConversationHistory(history_size)
         )
         
         self.active_sessions[session_id] = context
+        run_stage = self.session_scheduler.run_stage
         
         logger.info(f"会話セッション開始: {session_id}")
         
         try:
             while self.is_running and session_id in self.active_sessions:
                 # 音声認識
-                user_input, confidence = self.recognize_speech_advanced(session_id)
+                user_input, confidence = await run_stage(
+                    'stt', self.recognize_speech_advanced, session_id
+                )
                 
                 if user_input and confidence > self.config['ml']['confidence_threshold']:
+                    turn_start = time.perf_counter()
+                    
                     # 応答生成
-                    response = self.generate_contextual_response(user_input, context)
+                    response = await run_stage(
+                        'nlp', self.generate_contextual_response, user_input, context
+                    )
                     
                     # 音声出力
-                    self.speak_advanced(response, context.emotion)
+                    await run_stage('tts', self.speak_advanced, response, context.emotion)
                     
                     # 学習データに追加
-                    self.learn_from_interaction(user_input, context.history[-1]['intent'], response)
+                    await run_stage(
+                        'db', self.learn_from_interaction,
+                        user_input, context.history[-1].intent, response
+                    )
+                    self.metrics.observe('turn', time.perf_counter() - turn_start)
                     
                     # 終了条件のチェック
-                    if context.history[-1]['intent'] == "goodbye":
+                    if context.history[-1].intent == "goodbye":
                         break
                 
                 await asyncio.sleep(0.1)
@@ -524,18 +1632,72 @@ class AdvancedAutoResponseSystem:
                 del self.active_sessions[session_id]
             logger.info(f"会話セッション終了: {session_id}")
     
+    def start_session(self, session_id: str, user_id: str = "user_001") -> asyncio.Task:
+        """会話セッションをスケジューラーに登録（イベントループ内から呼び出す）"""
+        return self.session_scheduler.submit(
+            session_id, lambda: self.process_conversation_async(session_id, user_id)
+        )
+    
+    def cancel_session(self, session_id: str) -> bool:
+        """会話セッションをキャンセル"""
+        return self.session_scheduler.cancel(session_id)
+    
+    async def run_sessions(self, session_ids: List[str]):
+        """複数の会話セッションを並行実行し、すべての終了を待つ"""
+        for session_id in session_ids:
+            self.start_session(session_id)
+        await self.session_scheduler.join()
+    
+    def start_metrics_export(self):
+        """計測値の出力を開始（monitoring 設定）"""
+        monitoring = self.config.get('monitoring', {})
+        if not monitoring.get('enabled', True) or self.metrics_exporter is not None:
+            return
+        self.metrics_exporter = MetricsExporter(
+            self.metrics,
+            host=monitoring.get('metrics_host', '127.0.0.1'),
+            port=monitoring.get('metrics_port'),
+            json_path=monitoring.get('metrics_file'),
+            interval=monitoring.get('metrics_interval', 60)
+        )
+        try:
+            self.metrics_exporter.start()
+        except OSError as e:
+            logger.error(f"メトリクス出力の開始エラー: {e}")
+            self.metrics_exporter = None
+    
     def start_advanced(self):
         """高度なシステムを開始"""
         logger.info("高度な自動認識・自動応答システムを開始します")
         self.is_running = True
         
         try:
+            # 計測値の出力を開始
+            self.start_metrics_export()
+            
+            # 最初の会話で初期化を待たないよう、音声の入出力に使う部品を読み込んでおく
+            for name in self.config.get('startup', {}).get('preload', []):
+                with PROFILE.measure("phase", f"preload {name}"):
+                    getattr(self, name)
+            
+            # 音声合成ワーカーを開始
+            if self.config['tts'].get('worker', {}).get('enabled', True):
+                self.tts_worker.start()
+            
             # 開始メッセージ
             self.speak_advanced("高度な自動認識・自動応答システムを開始します。何かお話しください。")
             
+            # 定型応答は開始メッセージの後、ワーカーが発話していない間に事前合成する
+            if self.config['tts'].get('cache', {}).get('warm_up', True):
+                self.warm_up_tts_cache()
+            
+            # 常時録音を開始
+            if self.config['speech'].get('capture', {}).get('enabled', True):
+                self.start_audio_capture()
+            
             # 非同期会話処理を開始
             session_id = f"session_{int(time.time())}"
-            asyncio.run(self.process_conversation_async(session_id))
+            asyncio.run(self.run_sessions([session_id]))
             
         except KeyboardInterrupt:
             logger.info("ユーザーによる中断")
@@ -549,11 +1711,50 @@ class AdvancedAutoResponseSystem:
         logger.info("システムを停止します")
         self.is_running = False
         
-        # 終了メッセージ
-        self.speak_advanced("システムを終了します。お疲れ様でした。")
+        # 録音、セッションのステージ処理、再学習スケジューラーを停止
+        if self.audio_pipeline is not None:
+            self.audio_pipeline.stop()
+        self.session_scheduler.shutdown(wait=False)
+        if is_loaded(self, 'speech_recognizer'):
+            self.speech_recognizer.shutdown()
+        self.refit_scheduler.stop()
+        
+        # 書き込み待ちの会話を保存してからデータベース接続を閉じる
+        self.conversation_writer.stop()
+        self.db.close_all()
+        
+        # 終了メッセージ（待機中の応答を再生し終えてからワーカーを停止）
+        # 音声合成を使っていなければエンジンを初期化してまで再生しない
+        if is_loaded(self, 'tts_engine'):
+            self.speak_advanced("システムを終了します。お疲れ様でした。")
+        if is_loaded(self, 'tts_worker'):
+            self.tts_worker.stop()
+        if is_loaded(self, 'tts_cache') and self.tts_cache is not None:
+            self.tts_cache.close()
+        
+        # 最終的な計測値を書き出して出力を停止
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+
+# モジュールの読み込みにかかった時間（遅延読み込みの分は含まない）
+PROFILE.record("import", __name__, time.perf_counter() - _import_started)
 
 def main():
     """メイン関数"""
+    parser = argparse.ArgumentParser(description="高度な自動認識・自動応答システム")
+    parser.add_argument('--config', default="config.yaml", help="設定ファイル")
+    parser.add_argument('--startup-profile', action='store_true',
+                        help="初期化までの起動プロファイルを表示して終了")
+    args = parser.parse_args()
+    
+    if args.startup_profile:
+        with PROFILE.measure("phase", "AdvancedAutoResponseSystem()"):
+            system = AdvancedAutoResponseSystem(args.config)
+        print(PROFILE.report())
+        system.stop()
+        return
+    
     print("=== 高度な自動認識・自動応答システム ===")
     print("機械学習、感情分析、多言語対応を含む実用的なシステム")
     print("終了するには Ctrl+C を押してください")
@@ -561,7 +1762,7 @@ def main():
     
     try:
         # システムを初期化
-        system = AdvancedAutoResponseSystem()
+        system = AdvancedAutoResponseSystem(args.config)
         
         # システムを開始
         system.start_advanced()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常時録音・発話区間検出パイプライン
+音声入力ストリームを開いたまま読み続け、雑音レベルを推定しながら発話区間を切り出す
+
+機能:
+- 音声入力ソース（マイク、WAVファイル）
+- 雑音レベルの移動推定
+- エネルギーベースの発話区間検出（VAD）
+- 発話区間のキュー出力
+"""
+
+import abc
+import logging
+import queue
+import threading
+import wave
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+class AudioSource(abc.ABC):
+    """音声入力ソースの基底クラス（read を実装していないサブクラスは生成時にエラーになる）"""
+    
+    sample_rate: int = 16000
+    sample_width: int = 2
+    chunk_size: int = 1024
+    
+    def open(self):
+        """ストリームを開く"""
+    
+    @abc.abstractmethod
+    def read(self) -> bytes:
+        """1チャンク分の音声を読み込む（終端では空のバイト列を返す）"""
+    
+    def close(self):
+        """ストリームを閉じる"""
+
+class MicrophoneSource(AudioSource):
+    """マイク入力ソース（ストリームを開いたまま読み続ける）"""
+    
+    def __init__(self, microphone: Optional[sr.Microphone] = None, chunk_size: int = 1024):
+        """マイク入力ソースを初期化"""
+        self.microphone = microphone or sr.Microphone(chunk_size=chunk_size)
+        self._source = None
+    
+    def open(self):
+        """マイクのストリームを開く"""
+        self._source = self.microphone.__enter__()
+        self.sample_rate = self._source.SAMPLE_RATE
+        self.sample_width = self._source.SAMPLE_WIDTH
+        self.chunk_size = self._source.CHUNK
+    
+    def read(self) -> bytes:
+        """1チャンク分の音声を読み込む"""
+        return self._source.stream.read(self.chunk_size)
+    
+    def close(self):
+        """マイクのストリームを閉じる"""
+        if self._source is not None:
+            self.microphone.__exit__(None, None, None)
+            self._source = None
+
+class WaveFileSource(AudioSource):
+    """WAVファイル入力ソース（ハードウェアなしでのテスト用）"""
+    
+    def __init__(self, path: str, chunk_size: int = 1024):
+        """WAVファイル入力ソースを初期化"""
+        self.path = path
+        self.chunk_size = chunk_size
+        self._wave = None
+    
+    def open(self):
+        """WAVファイルを開く"""
+        self._wave = wave.open(self.path, 'rb')
+        if self._wave.getnchannels() != 1:
+            self._wave.close()
+            raise ValueError("モノラルのWAVファイルのみ対応しています")
+        self.sample_rate = self._wave.getframerate()
+        self.sample_width = self._wave.getsampwidth()
+    
+    def read(self) -> bytes:
+        """1チャンク分の音声を読み込む"""
+        return self._wave.readframes(self.chunk_size)
+    
+    def close(self):
+        """WAVファイルを閉じる"""
+        if self._wave is not None:
+            self._wave.close()
+            self._wave = None
+
+class NoiseFloorEstimator:
+    """雑音レベルの移動推定
+    
+    発話以外のフレームのエネルギーを指数移動平均で追跡し、
+    雑音レベルに比例した発話検出の閾値を提供する。
+    """
+    
+    def __init__(self, adapt_rate: float = 0.05, energy_ratio: float = 3.0,
+                 min_energy: float = 100.0):
+        """推定器を初期化"""
+        self.adapt_rate = adapt_rate
+        self.energy_ratio = energy_ratio
+        self.min_energy = min_energy
+        self.floor: Optional[float] = None
+    
+    def update(self, energy: float):
+        """雑音フレームのエネルギーで推定値を更新"""
+        if self.floor is None:
+            self.floor = energy
+        else:
+            self.floor += self.adapt_rate * (energy - self.floor)
+    
+    @property
+    def threshold(self) -> float:
+        """発話とみなすエネルギーの閾値"""
+        if self.floor is None:
+            return self.min_energy
+        return max(self.min_energy, self.floor * self.energy_ratio)
+
+class VoiceActivityDetector:
+    """エネルギーベースの発話区間検出
+    
+    フレームごとのRMSエネルギーを雑音レベルの閾値と比較し、
+    無音が一定時間続いた時点で発話区間を確定する。
+    発話開始直前の音声はプリロールとして区間に含める。
+    on_speech_start を設定すると発話の開始時に呼び出す（音声合成の割り込み用）。
+    """
+    
+    def __init__(self, noise: Optional[NoiseFloorEstimator] = None,
+                 silence_duration: float = 0.8, pre_roll: float = 0.3,
+                 min_speech_duration: float = 0.2, max_duration: float = 10.0,
+                 calibration_duration: float = 0.5):
+        """検出器を初期化"""
+        self.noise = noise or NoiseFloorEstimator()
+        self.silence_duration = silence_duration
+        self.pre_roll = pre_roll
+        self.min_speech_duration = min_speech_duration
+        self.max_duration = max_duration
+        self.calibration_duration = calibration_duration
+        self.on_speech_start: Optional[Callable[[], None]] = None
+        
+        self.sample_rate = 16000
+        self.sample_width = 2
+        self._calibrated = 0.0
+        self._pre_roll_frames: deque = deque()
+        self._pre_roll_seconds = 0.0
+        self._segment: List[bytes] = []
+        self._in_speech = False
+        self._duration = 0.0
+        self._speech = 0.0
+        self._silence = 0.0
+    
+    def configure(self, sample_rate: int, sample_width: int):
+        """入力ソースの形式を設定"""
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+    
+    def energy(self, frame: bytes) -> float:
+        """フレームのRMSエネルギー"""
+        samples = np.frombuffer(frame, dtype=SAMPLE_DTYPES[self.sample_width])
+        if not samples.size:
+            return 0.0
+        return float(np.sqrt(np.mean(samples.astype(np.float64) ** 2)))
+    
+    def process(self, frame: bytes) -> Optional[sr.AudioData]:
+        """1フレームを処理し、発話区間が確定したら音声データを返す"""
+        duration = len(frame) / (self.sample_width * self.sample_rate)
+        energy = self.energy(frame)
+        
+        # 起動直後は雑音レベルの初期推定のみ行う
+        if self._calibrated < self.calibration_duration:
+            self._calibrated += duration
+            self.noise.update(energy)
+            return None
+        
+        if not self._in_speech:
+            self._push_pre_roll(frame, duration)
+            if energy > self.noise.threshold:
+                self._in_speech = True
+                self._segment = list(self._pre_roll_frames)
+                self._duration = self._pre_roll_seconds
+                self._speech = duration
+                self._silence = 0.0
+                self._pre_roll_frames.clear()
+                self._pre_roll_seconds = 0.0
+                if self.on_speech_start is not None:
+                    self.on_speech_start()
+            else:
+                self.noise.update(energy)
+            return None
+        
+        self._segment.append(frame)
+        self._duration += duration
+        if energy > self.noise.threshold:
+            self._speech += duration
+            self._silence = 0.0
+        else:
+            self._silence += duration
+        
+        if self._silence >= self.silence_duration or self._duration >= self.max_duration:
+            return self.flush()
+        return None
+    
+    def flush(self) -> Optional[sr.AudioData]:
+        """検出中の発話区間を確定"""
+        if not self._in_speech:
+            return None
+        
+        self._in_speech = False
+        segment, self._segment = self._segment, []
+        if self._speech < self.min_speech_duration:
+            return None
+        return sr.AudioData(b''.join(segment), self.sample_rate, self.sample_width)
+    
+    def _push_pre_roll(self, frame: bytes, duration: float):
+        """プリロール用のフレームを保持"""
+        self._pre_roll_frames.append(frame)
+        self._pre_roll_seconds += duration
+        while len(self._pre_roll_frames) > 1 and self._pre_roll_seconds > self.pre_roll:
+            oldest = self._pre_roll_frames.popleft()
+            self._pre_roll_seconds -= len(oldest) / (self.sample_width * self.sample_rate)
+
+class AudioCapturePipeline:
+    """常時録音パイプライン
+    
+    専用スレッドで入力ソースを読み続け、検出した発話区間をキューに積む。
+    キューが満杯の場合は最も古い発話区間を破棄する。
+    """
+    
+    def __init__(self, source: AudioSource, detector: Optional[VoiceActivityDetector] = None,
+                 max_queue: int = 16):
+        """パイプラインを初期化"""
+        self.source = source
+        self.detector = detector or VoiceActivityDetector()
+        self.dropped = 0
+        
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @classmethod
+    def from_config(cls, source: AudioSource, config: Dict,
+                    phrase_time_limit: float = 10.0) -> 'AudioCapturePipeline':
+        """設定からパイプラインを作成"""
+        noise = NoiseFloorEstimator(
+            adapt_rate=config.get('noise_adapt_rate', 0.05),
+            energy_ratio=config.get('energy_ratio', 3.0),
+            min_energy=config.get('min_energy', 100.0)
+        )
+        detector = VoiceActivityDetector(
+            noise,
+            silence_duration=config.get('silence_duration', 0.8),
+            pre_roll=config.get('pre_roll', 0.3),
+            min_speech_duration=config.get('min_speech_duration', 0.2),
+            max_duration=phrase_time_limit,
+            calibration_duration=config.get('calibration_duration', 0.5)
+        )
+        return cls(source, detector, max_queue=config.get('max_queue', 16))
+    
+    @property
+    def is_running(self) -> bool:
+        """録音スレッドが動作中か"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    @property
+    def is_active(self) -> bool:
+        """録音中、または取り出していない発話区間が残っているか"""
+        return self.is_running or not self._queue.empty()
+    
+    def start(self):
+        """録音スレッドを開始"""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-capture", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None):
+        """録音スレッドを停止"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def wait(self, timeout: Optional[float] = None):
+        """入力ソースの終端まで待機（ファイル入力用）"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def get_utterance(self, timeout: Optional[float] = None) -> Optional[sr.AudioData]:
+        """発話区間を1つ取り出す（タイムアウト時はNone）"""
+        try:
+            if not self.is_running:
+                return self._queue.get_nowait()
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def _run(self):
+        """入力ソースを読み続けて発話区間を検出"""
+        try:
+            self.source.open()
+            self.detector.configure(self.source.sample_rate, self.source.sample_width)
+            logger.info("常時録音を開始しました")
+            
+            while not self._stop.is_set():
+                frame = self.source.read()
+                if not frame:
+                    break
+                self._put(self.detector.process(frame))
+            
+            self._put(self.detector.flush())
+            
+        except Exception as e:
+            logger.error(f"録音エラー: {e}")
+        finally:
+            self.source.close()
+            logger.info("常時録音を終了しました")
+    
+    def _put(self, audio: Optional[sr.AudioData]):
+        """発話区間をキューに積む（満杯なら最も古いものを破棄）"""
+        if audio is None:
+            return
+        while True:
+            try:
+                self._queue.put_nowait(audio)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
@@ -14,26 +14,109 @@
 
 import speech_recognition as sr
 import pyttsx3
-import json
 import logging
 import time
 import threading
-from datetime import datetime
 from typing import Dict, List, Optional
 import re
 import random
+import sys
+from collections import deque
 
-# ログ設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('auto_response.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+from audio_capture import AudioCapturePipeline, AudioSource, MicrophoneSource
+from conversation_history import ConversationHistory, HistoryRecord
+from conversation_log import JsonLinesWriter
+from logging_setup import category_logger, setup_logging
+from tts_cache import TTSAudioCache
+from tts_worker import SpeechJob, TTSWorker
+
+# ログ設定（書式化とファイル出力はバックグラウンドで行う）
+setup_logging('auto_response.log', fmt='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 会話の1ターンごとに出力するログ（configure_categories で間引き・無効化できる）
+listen_logger = category_logger("listen")
+recognition_logger = category_logger("recognition")
+speech_logger = category_logger("speech")
+
+class KeywordMatcher:
+    """キーワード照合用のAho-Corasickオートマトン
+    
+    応答パターンから一度だけ構築し、入力テキストを1パスで走査する。
+    複数の意図のキーワードを含む場合は、パターン定義順で先にある意図を優先する。
+    """
+    
+    NO_MATCH = sys.maxsize
+    
+    def __init__(self, patterns: Dict, default_intent: str = "default"):
+        """オートマトンを構築"""
+        self.default_intent = default_intent
+        self.intents: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 各状態で確定する最優先の意図番号（失敗リンク先の出力も含む）
+        self._output: List[int] = [self.NO_MATCH]
+        
+        for intent, pattern in patterns.items():
+            if intent == default_intent:
+                continue
+            priority = len(self.intents)
+            self.intents.append(intent)
+            for keyword in pattern.get("keywords", []):
+                self._add_keyword(keyword.lower(), priority)
+        
+        self._build_failure_links()
+    
+    def _add_keyword(self, keyword: str, priority: int):
+        """トライにキーワードを追加"""
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(self.NO_MATCH)
+            state = next_state
+        self._output[state] = min(self._output[state], priority)
+    
+    def _build_failure_links(self):
+        """幅優先で失敗リンクを張り、出力を伝播"""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._output[child] = min(self._output[child], self._output[0])
+            queue.append(child)
+        
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = min(self._output[child], self._output[self._fail[child]])
+                queue.append(child)
+    
+    def match(self, text: str) -> str:
+        """テキストを1パスで走査し、最優先の意図を返す"""
+        goto, fail, output = self._goto, self._fail, self._output
+        best = output[0]
+        state = 0
+        
+        for char in text.lower():
+            if best == 0:
+                break
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] < best:
+                best = output[state]
+        
+        if best == self.NO_MATCH:
+            return self.default_intent
+        return self.intents[best]
+
 class AutoResponseSystem:
     """自動認識・自動応答システムのメインクラス"""
     
@@ -41,17 +124,31 @@ class AutoResponseSystem:
         """システムの初期化"""
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
+        self.audio_pipeline: Optional[AudioCapturePipeline] = None
         self.tts_engine = pyttsx3.init()
         
         # 音声合成の設定
         self.setup_tts()
         
+        # 音声合成ワーカー（発話中も認識を続けられるよう再生を別スレッドで行う）
+        self.tts_worker = TTSWorker(self.tts_engine, self._speak_blocking)
+        # 発話の検出で再生を中断するか（スピーカーの音を拾うためヘッドセット使用時のみ推奨）
+        self.barge_in = False
+        
+        # 合成音声キャッシュ（定型の応答を毎回合成し直さない）
+        self.tts_cache: Optional[TTSAudioCache] = TTSAudioCache(self.tts_engine, "tts_cache")
+        
         # 応答パターンの定義
         self.response_patterns = self.load_response_patterns()
         
         # システム状態
         self.is_running = False
-        self.conversation_history = []
+        self.conversation_history = ConversationHistory(maxlen=1000)
+        
+        # 会話ログ（1ターンごとに追記し、異常終了しても失われないようにする）
+        self.conversation_log = JsonLinesWriter(
+            'conversation_log.jsonl', max_bytes=10 * 1024 * 1024, backup_count=5
+        )
         
         logger.info("自動認識・自動応答システムが初期化されました")
     
@@ -128,21 +225,61 @@ class AutoResponseSystem:
         }
         return patterns
     
+    @property
+    def response_patterns(self) -> Dict:
+        """応答パターン"""
+        return self._response_patterns
+    
+    @response_patterns.setter
+    def response_patterns(self, patterns: Dict):
+        """応答パターンを差し替え、キーワード照合器を再構築"""
+        self._response_patterns = patterns
+        self.rebuild_intent_matcher()
+    
+    def rebuild_intent_matcher(self):
+        """キーワード照合器とキャッシュ対象の定型文を再構築（パターンを直接編集した場合に呼び出す）"""
+        self.intent_matcher = KeywordMatcher(self._response_patterns)
+        if self.tts_cache is not None:
+            self.tts_cache.set_templates(self.response_texts())
+    
+    def start_audio_capture(self, source: Optional[AudioSource] = None):
+        """常時録音パイプラインを開始（ソース省略時はマイク）"""
+        if self.audio_pipeline is not None and self.audio_pipeline.is_running:
+            return
+        self.audio_pipeline = AudioCapturePipeline.from_config(
+            source or MicrophoneSource(self.microphone), {}, phrase_time_limit=10
+        )
+        if self.barge_in:
+            self.audio_pipeline.detector.on_speech_start = self.tts_worker.interrupt
+        self.audio_pipeline.start()
+    
+    def listen_for_utterance(self) -> sr.AudioData:
+        """発話を1つ取得"""
+        listen_logger.info("音声を待機中...")
+        
+        if self.audio_pipeline is not None and self.audio_pipeline.is_active:
+            # 常時録音パイプラインで検出済みの発話区間を取り出す
+            audio = self.audio_pipeline.get_utterance(timeout=5)
+            if audio is None:
+                raise sr.WaitTimeoutError("発話区間が検出されませんでした")
+            return audio
+        
+        with self.microphone as source:
+            # 環境ノイズを調整
+            self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+            
+            # 音声を聞く（タイムアウト: 5秒、無音検出: 1秒）
+            return self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
+    
     def recognize_speech(self) -> Optional[str]:
         """音声認識を実行"""
         try:
-            with self.microphone as source:
-                # 環境ノイズを調整
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                logger.info("音声を待機中...")
-                
-                # 音声を聞く（タイムアウト: 5秒、無音検出: 1秒）
-                audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
+            audio = self.listen_for_utterance()
                 
-                # Google音声認識を使用
-                text = self.recognizer.recognize_google(audio, language='ja-JP')
-                logger.info(f"認識結果: {text}")
-                return text
+            # Google音声認識を使用
+            text = self.recognizer.recognize_google(audio, language='ja-JP')
+            recognition_logger.info("認識結果: %s", text)
+            return text
                 
         except sr.WaitTimeoutError:
             logger.warning("音声入力のタイムアウト")
@@ -159,19 +296,7 @@ class AutoResponseSystem:
     
     def analyze_intent(self, text: str) -> str:
         """テキストから意図を分析"""
-        text_lower = text.lower()
-        
-        # 各パターンとのマッチング
-        for intent, pattern in self.response_patterns.items():
-            if intent == "default":
-                continue
-                
-            keywords = pattern.get("keywords", [])
-            for keyword in keywords:
-                if keyword.lower() in text_lower:
-                    return intent
-        
-        return "default"
+        return self.intent_matcher.match(text)
     
     def generate_response(self, text: str, intent: str) -> str:
         """応答を生成"""
@@ -183,29 +308,67 @@ class AutoResponseSystem:
             response = random.choice(responses)
         
         # 会話履歴に追加
-        self.conversation_history.append({
-            "timestamp": datetime.now().isoformat(),
-            "user_input": text,
-            "intent": intent,
-            "response": response
-        })
+        record = HistoryRecord(text, intent, response)
+        self.conversation_history.append(record)
+        self.conversation_log.write(record.to_dict())
         
         return response
     
-    def speak(self, text: str):
-        """音声合成で応答"""
+    def speak(self, text: str, wait: bool = False) -> Optional[SpeechJob]:
+        """音声合成で応答（ワーカー動作中はキューに追加して即座に戻る）"""
+        if not self.tts_worker.is_running:
+            self._speak_blocking(text)
+            return None
+        
+        job = self.tts_worker.say(text)
+        if wait:
+            job.wait()
+        return job
+    
+    def _speak_blocking(self, text: str, emotion: str = "neutral"):
+        """音声合成で応答（再生完了まで待機）"""
         try:
-            logger.info(f"音声出力: {text}")
+            speech_logger.info("音声出力: %s", text)
+            if self._play_cached(text, emotion):
+                return
             self.tts_engine.say(text)
             self.tts_engine.runAndWait()
         except Exception as e:
             logger.error(f"音声合成エラー: {e}")
     
+    def _play_cached(self, text: str, emotion: str) -> bool:
+        """キャッシュした音声で再生（再生できなければ偽）"""
+        if self.tts_cache is None:
+            return False
+        try:
+            return self.tts_cache.play(text, emotion, lambda: self.tts_worker.interrupted)
+        except Exception as e:
+            # 出力デバイスを開けない場合などは以降エンジンで直接再生する
+            logger.warning(f"キャッシュ音声の再生エラー: {e}")
+            self.tts_cache = None
+            return False
+    
+    def response_texts(self) -> List[str]:
+        """起こりうる定型応答の一覧"""
+        texts = [
+            "自動認識・自動応答システムを開始します。何かお話しください。",
+            "システムを終了します。お疲れ様でした。"
+        ]
+        for pattern in self.response_patterns.values():
+            texts.extend(pattern["responses"])
+        return texts
+    
+    def warm_up_tts_cache(self) -> Optional[SpeechJob]:
+        """すべての定型応答を、音声合成ワーカーが発話していない間に事前合成するジョブを追加"""
+        if self.tts_cache is None or not self.tts_worker.is_running:
+            return None
+        steps = self.tts_cache.warm_up_steps((text, "neutral") for text in self.response_texts())
+        return self.tts_worker.run_when_idle(steps, "tts_cache warm-up")
+    
     def save_conversation_log(self):
-        """会話ログを保存"""
+        """会話ログを保存（追記待ちのレコードを書き込んでファイルを閉じる）"""
         try:
-            with open('conversation_log.json', 'w', encoding='utf-8') as f:
-                json.dump(self.conversation_history, f, ensure_ascii=False, indent=2)
+            self.conversation_log.close()
             logger.info("会話ログを保存しました")
         except Exception as e:
             logger.error(f"ログ保存エラー: {e}")
@@ -250,8 +413,15 @@ class AutoResponseSystem:
         self.is_running = True
         
         try:
-            # 開始メッセージ
+            # 音声合成ワーカーを開始
+            self.tts_worker.start()
+            
+            # 開始メッセージ（定型応答はその後、ワーカーが発話していない間に事前合成する）
             self.speak("自動認識・自動応答システムを開始します。何かお話しください。")
+            self.warm_up_tts_cache()
+            
+            # 常時録音を開始
+            self.start_audio_capture()
             
             # 会話処理を開始
             self.process_conversation()
@@ -266,11 +436,18 @@ class AutoResponseSystem:
         logger.info("システムを停止します")
         self.is_running = False
         
+        # 常時録音を停止
+        if self.audio_pipeline is not None:
+            self.audio_pipeline.stop()
+        
         # 会話ログを保存
         self.save_conversation_log()
         
-        # 終了メッセージ
+        # 終了メッセージ（待機中の応答を再生し終えてからワーカーを停止）
         self.speak("システムを終了します。お疲れ様でした。")
+        self.tts_worker.stop()
+        if self.tts_cache is not None:
+            self.tts_cache.close()
 
 def main():
     """メイン関数"""
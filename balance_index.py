@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+アカウント残高のインデックス
+チェーン全体を走査せずに残高を返すため、ブロックの追加ごとに残高を差分で更新する
+
+機能:
+- ブロック単位の残高の更新と巻き戻し（チェーンの再編成に対応）
+- 複数アドレスの残高の一括取得
+- スナップショットの保存と読み込み
+"""
+
+import json
+import os
+import tempfile
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+class BalanceIndex:
+    """ブロックを順に適用して保持するアドレスごとの残高
+    
+    残高はチェーンを先頭から走査した場合と同じ順に加減算するため、
+    Blockchain.get_balance の全件走査と浮動小数点の誤差まで一致する。
+    巻き戻し用に、直近 max_undo ブロックで変更したアドレスの変更前の残高を保持する。
+    それより深い再編成ではチェーンの先頭から作り直す。
+    """
+    
+    def __init__(self, max_undo: int = 100):
+        """空のインデックスを作成"""
+        self.balances: Dict[str, float] = {}
+        self.block_hashes: List[str] = []
+        self.max_undo = max_undo
+        self._undo: Deque[Dict[str, Optional[float]]] = deque(maxlen=max_undo)
+    
+    @property
+    def height(self) -> int:
+        """適用済みのブロック数"""
+        return len(self.block_hashes)
+    
+    def apply_block(self, block) -> None:
+        """ブロックのトランザクションを残高に反映"""
+        balances = self.balances
+        previous: Dict[str, Optional[float]] = {}
+        for transaction in block.transactions:
+            for address, amount in ((transaction.sender, -transaction.amount),
+                                    (transaction.recipient, transaction.amount)):
+                if address not in previous:
+                    previous[address] = balances.get(address)
+                balances[address] = balances.get(address, 0.0) + amount
+        self._undo.append(previous)
+        self.block_hashes.append(block.hash)
+    
+    def rollback(self, height: int) -> None:
+        """残高を height 個のブロックを適用した時点に戻す"""
+        if height < self.height - len(self._undo):
+            raise ValueError(f"巻き戻せるのは直近 {len(self._undo)} ブロックまでです")
+        while self.height > height:
+            for address, balance in self._undo.pop().items():
+                if balance is None:
+                    del self.balances[address]
+                else:
+                    self.balances[address] = balance
+            self.block_hashes.pop()
+    
+    def sync(self, chain) -> int:
+        """チェーンに合わせて更新（分岐点まで巻き戻して新しいブロックを適用し、適用した件数を返す）"""
+        if self.height == len(chain) and (not chain or self.block_hashes[-1] == chain[-1].hash):
+            return 0
+        
+        # 再編成は浅いことが多いため、末尾から共通部分を探す
+        fork = min(self.height, len(chain))
+        while fork > 0 and self.block_hashes[fork - 1] != chain[fork - 1].hash:
+            fork -= 1
+        
+        if fork < self.height - len(self._undo):
+            self.reset()
+            fork = 0
+        else:
+            self.rollback(fork)
+        for block in chain[fork:]:
+            self.apply_block(block)
+        return len(chain) - fork
+    
+    def reset(self) -> None:
+        """空の状態に戻す"""
+        self.balances = {}
+        self.block_hashes = []
+        self._undo.clear()
+    
+    def get(self, address: str) -> float:
+        """アドレスの残高"""
+        return self.balances.get(address, 0.0)
+    
+    def get_many(self, addresses: Iterable[str]) -> Dict[str, float]:
+        """複数のアドレスの残高"""
+        balances = self.balances
+        return {address: balances.get(address, 0.0) for address in addresses}
+    
+    def snapshot(self) -> Dict:
+        """保存用のスナップショット（巻き戻し用の情報は含まない）"""
+        return {
+            'height': self.height,
+            'block_hashes': list(self.block_hashes),
+            'balances': dict(self.balances)
+        }
+    
+    def save(self, path: str) -> None:
+        """スナップショットをJSONファイルに保存（一時ファイルから置き換え）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+    
+    @classmethod
+    def from_snapshot(cls, data: Dict, max_undo: int = 100) -> 'BalanceIndex':
+        """スナップショットから復元（スナップショットより前への巻き戻しは作り直しになる）"""
+        index = cls(max_undo)
+        index.balances = dict(data['balances'])
+        index.block_hashes = list(data['block_hashes'])
+        return index
+    
+    @classmethod
+    def load(cls, path: str, max_undo: int = 100) -> 'BalanceIndex':
+        """JSONファイルのスナップショットから復元"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_snapshot(json.load(f), max_undo)
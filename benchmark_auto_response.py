@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自動認識・自動応答システムのベンチマーク
+マイク・スピーカーなしで主要な処理の所要時間とメモリ使用量を測定し、基準値と比較する
+
+機能:
+- スタブの音声入力・音声認識・音声合成でのシステム構築
+- 件数を指定した合成学習データ（1千〜100万件）
+- ウォームアップを除いた統計値（中央値、p95、p99など）とメモリ使用量のピーク
+- 基準値のJSON保存と前回結果との比較
+
+使い方:
+    python benchmark_auto_response.py --rows 1000,100000 --output baseline.json
+    python benchmark_auto_response.py --rows 1000,100000 --compare baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from unittest.mock import patch
+
+import speech_recognition as sr
+import yaml
+
+from auto_response_system import AutoResponseSystem
+from advanced_auto_response import AdvancedAutoResponseSystem, ConversationContext
+from conversation_log import JsonLinesWriter
+
+BENCHMARKS = (
+    "analyze_intent", "build_corpus", "predict_intent", "analyze_emotion",
+    "db_write", "conversation_write", "full_turn"
+)
+
+# 合成学習データの語彙（意図ごとのキーワードと共通の語）
+INTENT_KEYWORDS = {
+    "greeting": ["こんにちは", "はじめまして", "おはよう", "こんばんは", "hello"],
+    "thanks": ["ありがとう", "感謝", "thanks", "助かりました", "お礼"],
+    "help": ["助けて", "困った", "わからない", "教えて", "help"],
+    "question": ["なぜ", "どうして", "いつ", "どこ", "質問"],
+    "goodbye": ["さようなら", "またね", "お疲れ様", "goodbye", "失礼"]
+}
+FILLER_WORDS = [
+    "今日", "明日", "天気", "仕事", "会議", "予定", "資料", "電話", "メール", "注文",
+    "配送", "料金", "設定", "画面", "ログイン", "パスワード", "アカウント", "予約", "変更", "確認"
+]
+SAMPLE_TEXTS = [
+    "こんにちは", "ありがとう", "助けて", "さようなら", "何ですか？",
+    "おはよう", "お疲れ様", "またね", "困っています", "教えて"
+]
+
+class StubMicrophone:
+    """ベンチマーク用のマイク（録音はしない）"""
+    
+    def __init__(self, *args, **kwargs):
+        pass
+
+class StubTTSEngine:
+    """ベンチマーク用の音声合成エンジン（再生しない）"""
+    
+    def __init__(self):
+        self.properties = {'voices': [], 'voice': None, 'rate': 150, 'volume': 0.8}
+    
+    def getProperty(self, name):
+        return self.properties.get(name)
+    
+    def setProperty(self, name, value):
+        self.properties[name] = value
+    
+    def connect(self, topic, callback):
+        pass
+    
+    def say(self, text):
+        pass
+    
+    def runAndWait(self):
+        pass
+    
+    def stop(self):
+        pass
+
+@dataclass
+class BenchmarkResult:
+    """1つのベンチマークの結果（時間はミリ秒、メモリはKB）"""
+    name: str
+    rows: int
+    iterations: int
+    warmup: int
+    min_ms: float
+    median_ms: float
+    mean_ms: float
+    p95_ms: float
+    p99_ms: float
+    stdev_ms: float
+    ops_per_sec: float
+    peak_memory_kb: float
+    
+    @property
+    def key(self) -> str:
+        """基準値との照合に使うキー"""
+        return f"{self.name}@{self.rows}"
+
+def synthetic_corpus(rows: int, seed: int = 0) -> Iterator[Tuple[str, str, str, float]]:
+    """合成学習データ (入力, 意図, 応答, 信頼度) を生成"""
+    rng = random.Random(seed)
+    intents = list(INTENT_KEYWORDS)
+    for i in range(rows):
+        intent = intents[i % len(intents)]
+        words = [rng.choice(INTENT_KEYWORDS[intent])]
+        words.extend(rng.sample(FILLER_WORDS, rng.randint(1, 4)))
+        # 語彙が件数に応じて増えるよう、識別用の語を混ぜる
+        words.append(f"語{rng.randrange(max(rows // 10, 1))}")
+        rng.shuffle(words)
+        yield " ".join(words), intent, f"{intent}の応答", 1.0
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """ソート済みの値の分位点（線形補間）"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+def measure(name: str, func: Callable[[int], object], rows: int, iterations: int,
+            warmup: int, memory_iterations: int = 20) -> BenchmarkResult:
+    """func(i) を繰り返し実行して統計値を求める
+    
+    ウォームアップ分は集計から除く。メモリのピークは計測の影響を避けるため
+    時間の計測とは別に tracemalloc を有効にして測る。
+    """
+    if iterations < 1:
+        raise ValueError("iterations は1以上を指定してください")
+    for i in range(warmup):
+        func(i)
+    
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        samples = []
+        for i in range(iterations):
+            start = time.perf_counter_ns()
+            func(warmup + i)
+            samples.append((time.perf_counter_ns() - start) / 1e6)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    
+    tracemalloc.start()
+    try:
+        for i in range(min(memory_iterations, iterations)):
+            func(warmup + iterations + i)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return BenchmarkResult(
+        name=name,
+        rows=rows,
+        iterations=iterations,
+        warmup=warmup,
+        min_ms=samples[0],
+        median_ms=percentile(samples, 0.50),
+        mean_ms=mean,
+        p95_ms=percentile(samples, 0.95),
+        p99_ms=percentile(samples, 0.99),
+        stdev_ms=statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        ops_per_sec=1000 / mean if mean else 0.0,
+        peak_memory_kb=peak / 1024
+    )
+
+class BenchmarkHarness:
+    """スタブの入出力でシステムを構築してベンチマークを実行"""
+    
+    def __init__(self, work_dir: str, iterations: int = 200, warmup: int = 20, seed: int = 0,
+                 benchmarks: Sequence[str] = BENCHMARKS):
+        """ベンチマークを初期化"""
+        self.work_dir = work_dir
+        self.iterations = iterations
+        self.warmup = warmup
+        self.seed = seed
+        self.benchmarks = [name for name in BENCHMARKS if name in benchmarks]
+        self._stubs = ExitStack()
+    
+    def __enter__(self) -> 'BenchmarkHarness':
+        # マイクと音声合成エンジンをスタブに差し替える
+        self._stubs.enter_context(patch.object(sr, 'Microphone', StubMicrophone))
+        self._stubs.enter_context(patch('pyttsx3.init', lambda *args, **kwargs: StubTTSEngine()))
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._stubs.close()
+    
+    def write_config(self, rows: int) -> str:
+        """ベンチマーク用の設定ファイルを作成"""
+        config = {
+            'speech': {'language': 'ja-JP', 'timeout': 5, 'phrase_time_limit': 10,
+                       'capture': {'enabled': False}},
+            'tts': {'rate': 150, 'volume': 0.8, 'voice': 'japanese',
+                    'worker': {'enabled': False}, 'cache': {'enabled': False}},
+            'recognition_engines': {'backends': ['stub'], 'stub': {'text': "こんにちは"}},
+            'ml': {'model_path': 'models/', 'confidence_threshold': 0.7,
+                   # 計測中に再学習が走らないようにする
+                   'refit': {'every_rows': 10 ** 9, 'interval_seconds': 10 ** 9,
+                             'drift_threshold': 2.0, 'background': False},
+                   'index': {'path': os.path.join(self.work_dir, f"intent_index_{rows}.npz")}},
+            'logging': {'level': 'WARNING',
+                        'categories': {'recognition': 0, 'speech': 0, 'learning': 0}},
+            'monitoring': {'enabled': False},
+            'response': {'catalog': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'responses.yaml'),
+                         'randomize': False},
+            'database': {'path': os.path.join(self.work_dir, f"benchmark_{rows}.db")}
+        }
+        path = os.path.join(self.work_dir, f"benchmark_{rows}.yaml")
+        with open(path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(config, f, allow_unicode=True)
+        return path
+    
+    def run(self, rows_list: Sequence[int]) -> List[BenchmarkResult]:
+        """指定した学習データ件数ごとにベンチマークを実行"""
+        results = []
+        if "analyze_intent" in self.benchmarks:
+            results.append(self.run_basic())
+        for rows in rows_list:
+            results.extend(self.run_advanced(rows))
+        return results
+    
+    def run_basic(self) -> BenchmarkResult:
+        """基本システムのベンチマーク"""
+        system = AutoResponseSystem()
+        system.conversation_log = JsonLinesWriter(os.path.join(self.work_dir, "conversation_log.jsonl"))
+        try:
+            texts = SAMPLE_TEXTS
+            return measure("analyze_intent", lambda i: system.analyze_intent(texts[i % len(texts)]),
+                           0, self.iterations, self.warmup)
+        finally:
+            system.conversation_log.close()
+    
+    def run_advanced(self, rows: int) -> List[BenchmarkResult]:
+        """高度システムのベンチマーク（学習データ rows 件）"""
+        system = AdvancedAutoResponseSystem(self.write_config(rows))
+        results = []
+        try:
+            system.learning_store.record_many(synthetic_corpus(rows, self.seed))
+            
+            # 学習データの読み込みとコーパス行列の構築（1回のみ）
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter_ns()
+            system.load_learning_data()
+            elapsed = (time.perf_counter_ns() - start) / 1e6
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if "build_corpus" in self.benchmarks:
+                results.append(BenchmarkResult(
+                    "build_corpus", rows, 1, 0, elapsed, elapsed, elapsed, elapsed, elapsed,
+                    0.0, 1000 / elapsed if elapsed else 0.0, peak / 1024
+                ))
+            
+            queries = [text for text, _, _, _ in synthetic_corpus(256, self.seed + 1)] + SAMPLE_TEXTS
+            context = ConversationContext(user_id="benchmark", session_id=f"benchmark_{rows}")
+            audio = sr.AudioData(b"\0\0" * 1600, 16000, 2)
+            
+            def full_turn(i):
+                text, _ = system.recognize_audio(audio)
+                response = system.generate_contextual_response(queries[i % len(queries)], context)
+                system._speak_blocking(response, context.emotion)
+                system.learn_from_interaction(text, context.history[-1].intent, response)
+            
+            def conversation_write(i):
+                system.save_conversation(context, queries[i % len(queries)], "greeting",
+                                         "neutral", 0.9, "応答")
+                system.conversation_writer.flush()
+            
+            cases = {
+                "predict_intent": lambda i: system.predict_intent(queries[i % len(queries)]),
+                "analyze_emotion": lambda i: system.analyze_emotion(queries[i % len(queries)]),
+                "db_write": lambda i: system.learn_from_interaction(
+                    queries[i % len(queries)], "greeting", "応答"),
+                "conversation_write": conversation_write,
+                "full_turn": full_turn
+            }
+            for name, func in cases.items():
+                if name in self.benchmarks:
+                    results.append(measure(name, func, rows, self.iterations, self.warmup))
+        finally:
+            system.stop()
+        return results
+
+def save_baseline(results: List[BenchmarkResult], path: str):
+    """結果を基準値としてJSONに保存"""
+    baseline = {
+        'created_at': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'results': {result.key: asdict(result) for result in results}
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2)
+
+def compare(results: List[BenchmarkResult], baseline: Dict, threshold: float = 0.2) -> List[str]:
+    """基準値と比較し、中央値が threshold を超えて遅くなった項目を返す"""
+    regressions = []
+    previous = baseline.get('results', {})
+    for result in results:
+        before = previous.get(result.key)
+        if before is None or not before['median_ms']:
+            continue
+        change = result.median_ms / before['median_ms'] - 1
+        if change > threshold:
+            regressions.append(
+                f"{result.key}: {before['median_ms']:.3f}ms -> {result.median_ms:.3f}ms ({change:+.0%})"
+            )
+    return regressions
+
+def format_results(results: List[BenchmarkResult], baseline: Optional[Dict] = None) -> str:
+    """結果を表形式の文字列にする"""
+    previous = (baseline or {}).get('results', {})
+    header = f"{'benchmark':<28}{'median ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>11}{'peak KB':>11}{'change':>9}"
+    lines = [header, "-" * 89]
+    for result in results:
+        before = previous.get(result.key)
+        change = ""
+        if before and before['median_ms']:
+            change = f"{result.median_ms / before['median_ms'] - 1:+.0%}"
+        lines.append(
+            f"{result.key:<28}{result.median_ms:>10.3f}{result.p95_ms:>10.3f}{result.p99_ms:>10.3f}"
+            f"{result.ops_per_sec:>11.1f}{result.peak_memory_kb:>11.1f}{change:>9}"
+        )
+    return "\n".join(lines)
+
+def positive_int(value: str) -> int:
+    """1以上の整数の引数"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"1以上の整数を指定してください: {value}")
+    return number
+
+def non_negative_int(value: str) -> int:
+    """0以上の整数の引数"""
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"0以上の整数を指定してください: {value}")
+    return number
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="自動認識・自動応答システムのベンチマーク")
+    parser.add_argument('--rows', default="1000",
+                        help="学習データの件数（カンマ区切りで複数指定、例: 1000,100000,1000000）")
+    parser.add_argument('--iterations', type=positive_int, default=200, help="計測回数（1以上）")
+    parser.add_argument('--warmup', type=non_negative_int, default=20, help="ウォームアップ回数")
+    parser.add_argument('--seed', type=int, default=0, help="合成データの乱数シード")
+    parser.add_argument('--benchmarks', default=",".join(BENCHMARKS),
+                        help="実行するベンチマーク（カンマ区切り）")
+    parser.add_argument('--output', help="結果を基準値として保存するJSONファイル")
+    parser.add_argument('--compare', help="比較する基準値のJSONファイル")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="性能低下とみなす中央値の増加率（0.2 = 20%%）")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """メイン関数（性能低下があれば1を返す）"""
+    args = parse_args(argv)
+    rows_list = [int(value) for value in args.rows.split(",") if value]
+    benchmarks = [name.strip() for name in args.benchmarks.split(",") if name.strip()]
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    
+    print("=== 自動認識・自動応答システム ベンチマーク ===")
+    with tempfile.TemporaryDirectory() as work_dir:
+        with BenchmarkHarness(work_dir, args.iterations, args.warmup, args.seed, benchmarks) as harness:
+            results = harness.run(rows_list)
+    
+    print(format_results(results, baseline))
+    
+    if args.output:
+        save_baseline(results, args.output)
+        print(f"\n基準値を保存しました: {args.output}")
+    
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n性能低下を検出しました:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("\n性能低下はありません")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+並列マイニング（プルーフ・オブ・ワーク）
+ナンス空間を区間に分けて複数のプロセスで探索し、最初に有効なナンスが見つかった時点で他の探索を打ち切る
+
+機能:
+- ミッドステート（ヘッダーのハッシュ途中状態）からのハッシュ計算
+- ハッシュ値と目標値の数値比較
+- プロセスプールによるナンスの並列探索
+- 発見時の他のワーカーの打ち切り
+- ハッシュレートの計測
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ワーカーが打ち切りを確認する間隔（試行回数）
+CANCEL_CHECK_INTERVAL = 4096
+
+# 難易度の上限（SHA-256 のハッシュは16進で64桁）
+MAX_DIFFICULTY = 64
+
+# ワーカープロセスの打ち切り通知（プロセスの起動時に設定）
+_cancel_event = None
+
+def _init_worker(cancel_event):
+    """ワーカープロセスの初期化"""
+    global _cancel_event
+    _cancel_event = cancel_event
+
+def check_difficulty(difficulty: int) -> None:
+    """難易度が 1 から MAX_DIFFICULTY の範囲の整数か確認"""
+    if not isinstance(difficulty, int) or not 1 <= difficulty <= MAX_DIFFICULTY:
+        raise ValueError(f"難易度は 1 から {MAX_DIFFICULTY} の整数で指定してください: {difficulty!r}")
+
+def difficulty_target(difficulty: int) -> int:
+    """難易度に対応する目標値（16進で先頭 difficulty 桁が0のハッシュは、数値としてこれより小さい）"""
+    check_difficulty(difficulty)
+    return 1 << (256 - 4 * difficulty)
+
+def meets_target(block_hash: str, difficulty: int) -> bool:
+    """ハッシュ（16進）が難易度の条件を満たすか"""
+    return int(block_hash, 16) < difficulty_target(difficulty)
+
+def search_nonce(header: bytes, target: int, start: int,
+                 stop: int) -> Tuple[Optional[int], Optional[str], int]:
+    """[start, stop) のナンスを順に試す
+    
+    ヘッダーまでを入力したハッシュの途中状態を複製し、ナンスの部分だけを追加して計算する。
+    (ナンス, ハッシュ, 試行回数) を返す。見つからないか打ち切られた場合、ナンスとハッシュは None。
+    """
+    midstate = hashlib.sha256(header)
+    from_bytes = int.from_bytes
+    for chunk_start in range(start, stop, CANCEL_CHECK_INTERVAL):
+        if _cancel_event is not None and _cancel_event.is_set():
+            return None, None, chunk_start - start
+        for nonce in range(chunk_start, min(chunk_start + CANCEL_CHECK_INTERVAL, stop)):
+            state = midstate.copy()
+            state.update(b"%d" % nonce)
+            digest = state.digest()
+            if from_bytes(digest, 'big') < target:
+                return nonce, digest.hex(), nonce - start + 1
+    return None, None, stop - start
+
+@dataclass
+class MiningResult:
+    """マイニングの結果"""
+    nonce: int
+    hash: str
+    attempts: int
+    elapsed: float
+    
+    @property
+    def hashrate(self) -> float:
+        """1秒あたりのハッシュ計算回数"""
+        return self.attempts / self.elapsed if self.elapsed > 0 else 0.0
+
+class ParallelMiner:
+    """複数のプロセスでナンスを探索するマイナー（Block.mine_block の代わりに使う）
+    
+    ナンスは chunk_size 件ずつの区間に分け、空いたワーカーに小さい順に割り当てる。
+    有効なナンスが見つかると、他のワーカーは CANCEL_CHECK_INTERVAL 回以内に探索を打ち切る。
+    プロセスプールは最初のマイニングで作成し、close() まで使い回す。
+    """
+    
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 50000):
+        """マイナーを初期化（workers を省略するとCPUコア数）"""
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.last_result: Optional[MiningResult] = None
+        
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cancel_event = None
+    
+    def __enter__(self) -> 'ParallelMiner':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def mine(self, block, difficulty: int) -> MiningResult:
+        """ブロックをマイニングし、block.nonce と block.hash を設定"""
+        target = difficulty_target(difficulty)
+        header = block.header_prefix()
+        executor = self._get_executor()
+        logger.info(f"ブロック {block.index} の並列マイニング開始（{self.workers} プロセス）...")
+        
+        start_time = time.perf_counter()
+        # mine_block と同じく現在のナンスの次から探索する
+        next_start = block.nonce + 1
+        pending = set()
+        found: Optional[Tuple[int, str]] = None
+        attempts = 0
+        try:
+            while found is None:
+                # 各ワーカーに次の区間が待機しているよう、ワーカー数の2倍の区間を投入しておく
+                while len(pending) < self.workers * 2:
+                    pending.add(executor.submit(
+                        search_nonce, header, target, next_start, next_start + self.chunk_size
+                    ))
+                    next_start += self.chunk_size
+                
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    nonce, digest, tried = future.result()
+                    attempts += tried
+                    if nonce is not None and (found is None or nonce < found[0]):
+                        found = (nonce, digest)
+        finally:
+            attempts += self._cancel(pending)
+        
+        elapsed = time.perf_counter() - start_time
+        block.nonce, block.hash = found
+        result = MiningResult(nonce=found[0], hash=found[1], attempts=attempts, elapsed=elapsed)
+        self.last_result = result
+        
+        logger.info(
+            f"ブロック {block.index} のマイニング完了: {elapsed:.2f}秒"
+            f"（{attempts} 回, {result.hashrate / 1000:.1f} kH/s）"
+        )
+        logger.info(f"ハッシュ: {block.hash}")
+        return result
+    
+    def close(self):
+        """プロセスプールを終了"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """プロセスプール（初回のみ作成）"""
+        if self._executor is None:
+            self._cancel_event = multiprocessing.Event()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self._cancel_event,)
+            )
+        return self._executor
+    
+    def _cancel(self, futures: Iterable[Future]) -> int:
+        """探索中の区間を打ち切り、打ち切るまでの試行回数を返す"""
+        self._cancel_event.set()
+        futures = list(futures)
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        self._cancel_event.clear()
+        return sum(
+            future.result()[2] for future in futures
+            if not future.cancelled() and future.exception() is None
+        )
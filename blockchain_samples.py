@@ -28,6 +28,12 @@ import requests
 from urllib.parse import urlparse
 import uuid
 
+# マイニング・マークルツリー・残高インデックス
+from balance_index import BalanceIndex
+from chain_validator import ChainValidator, ValidationReport
+from blockchain_mining import ParallelMiner, check_difficulty, difficulty_target, search_nonce
+from merkle_tree import MerkleProof, MerkleTree, verify_proof
+
 # ログ設定
 import logging
 logging.basicConfig(level=logging.INFO)
@@ -67,22 +73,86 @@ class Block:
     nonce: int = 0
     hash: str = ""
     
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Block':
+        """辞書形式（asdict の結果やノードから受け取ったJSON）から復元"""
+        return cls(
+            index=data['index'],
+            timestamp=data['timestamp'],
+            transactions=[Transaction(**tx) for tx in data['transactions']],
+            previous_hash=data['previous_hash'],
+            nonce=data['nonce'],
+            hash=data['hash']
+        )
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        """属性を設定（トランザクションの列を置き換えたらマークルツリーのキャッシュを破棄）"""
+        if name == 'transactions':
+            self.__dict__.pop('_merkle_tree', None)
+        object.__setattr__(self, name, value)
+    
+    def __getstate__(self) -> Dict:
+        """pickle する状態（並列検証でプロセス間に送るときはマークルツリーのキャッシュを除く）"""
+        state = self.__dict__.copy()
+        state.pop('_merkle_tree', None)
+        return state
+    
+    def merkle_tree(self) -> MerkleTree:
+        """トランザクションのマークルツリー（包含証明用にキャッシュする）
+        
+        キャッシュは transactions を置き換えたときとヘッダーのハッシュを計算したときに作り直す。
+        トランザクションをその場で書き換えた場合は invalidate_merkle_tree() を呼ぶ。
+        """
+        tree = self.__dict__.get('_merkle_tree')
+        if tree is None:
+            tree = self._build_merkle_tree()
+        return tree
+    
+    def invalidate_merkle_tree(self) -> None:
+        """マークルツリーのキャッシュを破棄"""
+        self.__dict__.pop('_merkle_tree', None)
+    
+    def _build_merkle_tree(self) -> MerkleTree:
+        """現在のトランザクションからマークルツリーを作り、キャッシュする"""
+        tree = MerkleTree([tx.calculate_hash() for tx in self.transactions])
+        self.__dict__['_merkle_tree'] = tree
+        return tree
+    
+    def merkle_root(self) -> str:
+        """トランザクションのマークルルート"""
+        return self.merkle_tree().root
+    
+    def transaction_proof(self, tx_index: int) -> MerkleProof:
+        """tx_index 番目のトランザクションがこのブロックに含まれることの包含証明"""
+        return self.merkle_tree().proof(tx_index)
+    
+    def header_prefix(self) -> bytes:
+        """ブロックヘッダーのナンスより前の部分（ハッシュはこの後にナンスを続けて計算する）
+        
+        マークルルートはキャッシュを使わず現在のトランザクションから計算するため、
+        検証では書き換えられたトランザクションも検出できる。
+        """
+        merkle_root = self._build_merkle_tree().root
+        return f"{self.index}{self.timestamp}{self.previous_hash}{merkle_root}".encode()
+    
     def calculate_hash(self) -> str:
         """ブロックのハッシュを計算"""
-        block_string = f"{self.index}{self.timestamp}{self.previous_hash}{self.nonce}"
-        for tx in self.transactions:
-            block_string += tx.calculate_hash()
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        return hashlib.sha256(self.header_prefix() + str(self.nonce).encode()).hexdigest()
     
     def mine_block(self, difficulty: int) -> None:
         """ブロックをマイニング（プルーフ・オブ・ワーク）"""
-        target = "0" * difficulty
         logger.info(f"ブロック {self.index} のマイニング開始...")
         
         start_time = time.time()
-        while self.hash[:difficulty] != target:
-            self.nonce += 1
-            self.hash = self.calculate_hash()
+        # ヘッダーとマークルルートはナンスによらないため、探索の前に一度だけ計算する
+        header = self.header_prefix()
+        target = difficulty_target(difficulty)
+        nonce = None
+        start = self.nonce + 1
+        while nonce is None:
+            nonce, block_hash, _ = search_nonce(header, target, start, start + 1_000_000)
+            start += 1_000_000
+        self.nonce, self.hash = nonce, block_hash
         
         end_time = time.time()
         logger.info(f"ブロック {self.index} のマイニング完了: {end_time - start_time:.2f}秒")
@@ -146,14 +216,34 @@ class Wallet:
 class Blockchain:
     """ブロックチェーンクラス"""
     
-    def __init__(self, difficulty: int = 4):
-        """ブロックチェーンを初期化"""
+    def __init__(self, difficulty: int = 4, mining: Optional[Dict] = None,
+                 validation: Optional[Dict] = None):
+        """ブロックチェーンを初期化
+        
+        mining はマイニングの設定（例: {'parallel': True, 'workers': 4, 'chunk_size': 50000}）。
+        parallel が真なら複数プロセスの ParallelMiner、偽なら Block.mine_block でマイニングする。
+        validation はチェーンの検証の設定（例: {'workers': 4, 'parallel_threshold': 1000, 'batch_size': 256}）。
+        difficulty が 1 から 64 の範囲外なら ValueError。
+        """
+        check_difficulty(difficulty)
         self.chain: List[Block] = []
         self.difficulty = difficulty
         self.pending_transactions: List[Transaction] = []
         self.mining_reward = 100.0
         self.nodes = set()
         
+        # アドレスごとの残高（ブロックの追加ごとに更新）
+        self.balance_index = BalanceIndex()
+        
+        # チェーンの検証（検証済みの高さを記憶し、新しいブロックだけを検証）
+        self.validation_config = validation or {}
+        self.validator = ChainValidator(**self.validation_config)
+        
+        mining = mining or {}
+        self.miner: Optional[ParallelMiner] = None
+        if mining.get('parallel', False):
+            self.miner = ParallelMiner(mining.get('workers'), mining.get('chunk_size', 50000))
+        
         # ジェネシスブロックを作成
         self.create_genesis_block()
     
@@ -173,10 +263,24 @@ class Blockchain:
             previous_hash="0"
         )
         
-        genesis_block.mine_block(self.difficulty)
+        self.mine_block(genesis_block)
         self.chain.append(genesis_block)
+        self.balance_index.sync(self.chain)
         logger.info("ジェネシスブロックが作成されました")
     
+    def mine_block(self, block: Block) -> None:
+        """設定に応じた方法でブロックをマイニング"""
+        if self.miner is not None:
+            self.miner.mine(block, self.difficulty)
+        else:
+            block.mine_block(self.difficulty)
+    
+    def close(self) -> None:
+        """マイニング・検証用のプロセスプールを終了"""
+        if self.miner is not None:
+            self.miner.close()
+        self.validator.close()
+    
     def get_latest_block(self) -> Block:
         """最新のブロックを取得"""
         return self.chain[-1]
@@ -222,10 +326,17 @@ class Blockchain:
         )
         
         # ブロックをマイニング
-        block.mine_block(self.difficulty)
+        self.mine_block(block)
         
-        # チェーンに追加
+        # チェーンに追加し、前回の検証以降に追加されたブロックだけを検証
         self.chain.append(block)
+        report = self.validate_chain()
+        if not report.valid:
+            self.chain.pop()
+            logger.error(f"ブロック {block.index} を追加できません")
+            return
+        # 残高を更新（チェーンが置き換えられていれば分岐点まで巻き戻してから反映）
+        self.balance_index.sync(self.chain)
         
         # 保留中のトランザクションをクリア
         self.pending_transactions = []
@@ -233,35 +344,40 @@ class Blockchain:
         logger.info(f"ブロック {block.index} がチェーンに追加されました")
     
     def get_balance(self, address: str) -> float:
-        """アドレスの残高を計算"""
-        balance = 0.0
+        """アドレスの残高を取得"""
+        self.balance_index.sync(self.chain)
+        return self.balance_index.get(address)
         
-        for block in self.chain:
-            for transaction in block.transactions:
-                if transaction.sender == address:
-                    balance -= transaction.amount
-                if transaction.recipient == address:
-                    balance += transaction.amount
+    def get_balances(self, addresses: List[str]) -> Dict[str, float]:
+        """複数のアドレスの残高を一括で取得"""
+        self.balance_index.sync(self.chain)
+        return self.balance_index.get_many(addresses)
         
-        return balance
+    def save_balance_snapshot(self, path: str) -> None:
+        """残高のスナップショットを保存"""
+        self.balance_index.sync(self.chain)
+        self.balance_index.save(path)
+    
+    def load_balance_snapshot(self, path: str) -> None:
+        """保存した残高のスナップショットを読み込み、その後に追加されたブロックを反映"""
+        self.balance_index = BalanceIndex.load(path, self.balance_index.max_undo)
+        self.balance_index.sync(self.chain)
     
     def is_chain_valid(self) -> bool:
-        """チェーンの有効性を検証"""
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i - 1]
+        """チェーンの有効性を検証（検証済みのブロックも含めて全体を検証）"""
+        return self.validate_chain(full=True).valid
             
-            # ハッシュの検証
-            if current_block.hash != current_block.calculate_hash():
-                logger.error(f"ブロック {i} のハッシュが無効です")
-                return False
-            
-            # 前のブロックとの連結を検証
-            if current_block.previous_hash != previous_block.hash:
-                logger.error(f"ブロック {i} の前のブロックハッシュが無効です")
-                return False
-        
-        return True
+    def validate_chain(self, full: bool = False) -> ValidationReport:
+        """チェーンを検証し、検証結果を返す
+        
+        full が偽なら前回の検証以降に追加されたブロックだけを検証する（マイニング時の確認用）。
+        検証済みのブロックは末尾を除いて書き換えられていないものとして扱うため、
+        書き換えを検出するには full=True で検証する。
+        """
+        report = self.validator.validate(self.chain, self.difficulty, full=full)
+        if not report.valid:
+            logger.error(report.reason)
+        return report
     
     def add_node(self, address: str) -> None:
         """ノードを追加"""
@@ -275,21 +391,36 @@ class Blockchain:
         longest_chain = None
         max_length = len(self.chain)
         
+        # 他のノードのチェーンは自分のチェーンと無関係に全体を検証する
+        peer_validator = ChainValidator(**self.validation_config)
+        
         for node in network:
             try:
                 response = requests.get(f'http://{node}/chain')
                 if response.status_code == 200:
-                    length = response.json()['length']
-                    chain = response.json()['chain']
+                    data = response.json()
                     
-                    if length > max_length and self.is_chain_valid():
-                        max_length = length
-                        longest_chain = chain
+                    # 申告された長さは解析を省くためだけに使い、比較は受け取ったチェーンの長さで行う
+                    if data['length'] > max_length:
+                        chain = [Block.from_dict(block) for block in data['chain']]
+                        if len(chain) <= max_length:
+                            logger.error(
+                                f"ノード {node} のチェーンの長さ {len(chain)} が申告された長さ {data['length']} と異なります"
+                            )
+                            continue
+                        report = peer_validator.validate(chain, self.difficulty, full=True)
+                        if report.valid:
+                            max_length = len(chain)
+                            longest_chain = chain
+                        else:
+                            logger.error(f"ノード {node} のチェーンが無効です: {report.reason}")
             except Exception as e:
                 logger.error(f"ノード {node} との通信エラー: {e}")
                 continue
+        peer_validator.close()
         
         if longest_chain:
+            # 残高は次の取得時に分岐点から更新される
             self.chain = longest_chain
             return True
         
@@ -434,9 +565,16 @@ def demo_basic_blockchain():
     blockchain.mine_pending_transactions(alice.address)
     
     # 残高を表示
-    print(f"\nAlice の残高: {blockchain.get_balance(alice.address):.2f}")
-    print(f"Bob の残高: {blockchain.get_balance(bob.address):.2f}")
-    print(f"Charlie の残高: {blockchain.get_balance(charlie.address):.2f}")
+    balances = blockchain.get_balances([alice.address, bob.address, charlie.address])
+    print(f"\nAlice の残高: {balances[alice.address]:.2f}")
+    print(f"Bob の残高: {balances[bob.address]:.2f}")
+    print(f"Charlie の残高: {balances[charlie.address]:.2f}")
+    
+    # トランザクションの包含証明（ブロックのマークルルートと証明だけで検証できる）
+    block = blockchain.get_latest_block()
+    proof = block.transaction_proof(0)
+    print(f"\n包含証明のハッシュ数: {len(proof.siblings)}")
+    print(f"包含証明の検証: {verify_proof(proof, block.merkle_root())}")
     
     # チェーンの有効性を検証
     print(f"\nチェーンの有効性: {blockchain.is_chain_valid()}")
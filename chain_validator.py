@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+チェーンの検証
+検証済みの高さを記憶して新しいブロックだけを検証し、長いチェーンのハッシュの再計算は複数のプロセスで行う
+
+機能:
+- 前回検証した高さからの差分検証
+- 連結（インデックス・前のブロックのハッシュ）とハッシュ・プルーフ・オブ・ワークの段階ごとの検証
+- プロセスプールによるハッシュの並列検証
+- 最初に無効になる高さを含む検証結果
+"""
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from blockchain_mining import meets_target
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ValidationReport:
+    """チェーンの検証結果
+    
+    stage は無効と判定した段階（"linkage"、"hash"、"proof_of_work"）。
+    checked_from より前のブロックは前回までに検証済みのため検証していない。
+    """
+    valid: bool
+    length: int
+    checked_from: int
+    first_invalid_height: Optional[int] = None
+    stage: Optional[str] = None
+    reason: str = ""
+    elapsed: float = 0.0
+    
+    def to_dict(self) -> Dict:
+        """辞書形式に変換"""
+        return asdict(self)
+
+def check_linkage(chain: Sequence, start: int, stop: int) -> Optional[Tuple[int, str, str]]:
+    """[start, stop) のブロックのインデックスと前のブロックのハッシュを検証（最初の無効なブロックを返す）"""
+    for height in range(start, stop):
+        block = chain[height]
+        if block.index != height:
+            return height, "linkage", f"ブロック {height} のインデックスが {block.index} です"
+        if height > 0 and block.previous_hash != chain[height - 1].hash:
+            return height, "linkage", f"ブロック {height} の前のブロックハッシュが無効です"
+    return None
+
+def check_hashes(blocks: Sequence, start: int, difficulty: int) -> Optional[Tuple[int, str, str]]:
+    """高さ start から続くブロックのハッシュとプルーフ・オブ・ワークを検証（最初の無効なブロックを返す）"""
+    for offset, block in enumerate(blocks):
+        height = start + offset
+        if block.hash != block.calculate_hash():
+            return height, "hash", f"ブロック {height} のハッシュが無効です"
+        if not meets_target(block.hash, difficulty):
+            return height, "proof_of_work", f"ブロック {height} のハッシュが難易度 {difficulty} を満たしていません"
+    return None
+
+class ChainValidator:
+    """チェーンの差分・並列検証
+    
+    検証に成功すると、その長さと末尾のハッシュを記憶する。次回は同じ位置のブロックのハッシュを
+    計算し直して一致すれば、それより後のブロックだけを検証する（full=True で全体を検証）。
+    差分検証は末尾より前の検証済みのブロックが書き換えられていないことを前提にするため、
+    自分で追加したブロックの確認に使い、チェーン全体の有効性は full=True で確認する。
+    検証は連結（順に比較するだけで軽い）、ハッシュとプルーフ・オブ・ワーク（ブロックごとに独立）の順に行い、
+    後者は parallel_threshold 個以上のブロックがあれば batch_size 個ずつプロセスプールで検証する。
+    プロセスプールが使えなくなった場合は、残りのブロックを直列で検証する。
+    """
+    
+    def __init__(self, workers: Optional[int] = None, parallel_threshold: int = 1000,
+                 batch_size: int = 256):
+        """検証器を初期化（workers を省略するとCPUコア数、1ならプロセスプールを使わない）"""
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        self.batch_size = batch_size
+        
+        self.verified_height = 0
+        self._verified_tip: Optional[str] = None
+        self._verified_difficulty: Optional[int] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    def validate(self, chain: Sequence, difficulty: int, full: bool = False) -> ValidationReport:
+        """チェーンを検証"""
+        start_time = time.perf_counter()
+        start = 0 if full else self._resume_height(chain, difficulty)
+        
+        # 連結を先に検証し、ハッシュは最初の連結の誤りより前のブロックだけを検証する
+        failure = check_linkage(chain, start, len(chain))
+        stop = failure[0] if failure is not None else len(chain)
+        hash_failure = self._check_hashes(chain, start, stop, difficulty)
+        if hash_failure is not None:
+            failure = hash_failure
+        
+        report = ValidationReport(valid=failure is None, length=len(chain), checked_from=start)
+        if failure is not None:
+            report.first_invalid_height, report.stage, report.reason = failure
+            # 無効なブロックの前までは検証済みとして記憶する
+            self._remember(chain[:report.first_invalid_height], difficulty)
+        else:
+            self._remember(chain, difficulty)
+        report.elapsed = time.perf_counter() - start_time
+        return report
+    
+    def reset(self) -> None:
+        """検証済みの高さを忘れる"""
+        self.verified_height = 0
+        self._verified_tip = None
+        self._verified_difficulty = None
+    
+    def close(self) -> None:
+        """プロセスプールを終了"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def _resume_height(self, chain: Sequence, difficulty: int) -> int:
+        """検証済みの部分がそのまま残っていれば、その長さ（残っていなければ0）
+        
+        検証済みの末尾のブロックは記録されたハッシュではなく、ハッシュを計算し直して比較する。
+        """
+        height = self.verified_height
+        if (height == 0 or difficulty != self._verified_difficulty or len(chain) < height
+                or chain[height - 1].hash != self._verified_tip
+                or chain[height - 1].calculate_hash() != self._verified_tip):
+            return 0
+        return height
+    
+    def _remember(self, verified: Sequence, difficulty: int) -> None:
+        """検証済みの範囲を記憶"""
+        self.verified_height = len(verified)
+        self._verified_tip = verified[-1].hash if verified else None
+        self._verified_difficulty = difficulty
+    
+    def _check_hashes(self, chain: Sequence, start: int, stop: int,
+                      difficulty: int) -> Optional[Tuple[int, str, str]]:
+        """[start, stop) のブロックのハッシュとプルーフ・オブ・ワークを検証"""
+        if stop - start < self.parallel_threshold or self.workers == 1:
+            return check_hashes(chain[start:stop], start, difficulty)
+        
+        batches: List[int] = list(range(start, stop, self.batch_size))
+        futures = []
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            for batch in batches:
+                futures.append(self._executor.submit(
+                    check_hashes, chain[batch:min(batch + self.batch_size, stop)], batch, difficulty
+                ))
+        except Exception as e:
+            return self._check_hashes_serially(e, futures, chain, start, stop, difficulty)
+        
+        # 結果はバッチの順に確認し、最初の無効なブロックが見つかれば残りのバッチは取り消す
+        failure = None
+        for batch, future in zip(batches, futures):
+            if failure is not None:
+                future.cancel()
+                continue
+            try:
+                failure = future.result()
+            except Exception as e:
+                return self._check_hashes_serially(e, futures, chain, batch, stop, difficulty)
+        return failure
+    
+    def _check_hashes_serially(self, error: Exception, futures: Sequence, chain: Sequence,
+                               start: int, stop: int, difficulty: int) -> Optional[Tuple[int, str, str]]:
+        """プロセスプールのエラー（BrokenProcessPool など）の後、[start, stop) を直列で検証
+        
+        プロセスプールは破棄し、次の並列検証で作り直す。
+        """
+        logger.error(f"並列検証エラー（直列で検証します）: {error}")
+        for future in futures:
+            future.cancel()
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return check_hashes(chain[start:stop], start, difficulty)
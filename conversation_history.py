@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会話履歴
+長時間稼働してもメモリが増え続けないよう、直近の会話だけを保持するリングバッファ
+
+機能:
+- スロット化した会話レコード（ラベルはインターン、時刻はエポック秒）
+- 件数上限付きのリングバッファと、あふれたレコードの退避
+- 直近の意図のO(1)検索
+"""
+
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+class HistoryRecord:
+    """会話履歴の1件分"""
+    
+    __slots__ = ('timestamp', 'user_input', 'intent', 'emotion', 'response')
+    
+    def __init__(self, user_input: str, intent: str, response: str,
+                 emotion: Optional[str] = None, timestamp: Optional[float] = None):
+        """レコードを作成（意図・感情のラベルは同じ文字列オブジェクトを共有する）"""
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.user_input = user_input
+        self.intent = sys.intern(intent) if intent else intent
+        self.emotion = sys.intern(emotion) if emotion else emotion
+        self.response = response
+    
+    def to_dict(self) -> Dict:
+        """辞書に変換（時刻はISO形式）"""
+        record = {
+            'timestamp': datetime.fromtimestamp(self.timestamp).isoformat(),
+            'user_input': self.user_input,
+            'intent': self.intent
+        }
+        if self.emotion is not None:
+            record['emotion'] = self.emotion
+        record['response'] = self.response
+        return record
+    
+    def __repr__(self) -> str:
+        return f"HistoryRecord(intent={self.intent!r}, user_input={self.user_input!r})"
+
+class ConversationHistory:
+    """件数上限付きの会話履歴
+    
+    上限を超えると最も古いレコードを on_evict に渡して破棄する。
+    直近 recent_window 件の意図は件数を数えておき、has_recent_intent で定数時間で調べる。
+    """
+    
+    def __init__(self, maxlen: int = 100, recent_window: int = 3,
+                 on_evict: Optional[Callable[[HistoryRecord], None]] = None):
+        """履歴を初期化"""
+        if maxlen < recent_window:
+            raise ValueError("maxlen は recent_window 以上にしてください")
+        self.maxlen = maxlen
+        self.recent_window = recent_window
+        self.on_evict = on_evict
+        self.total = 0
+        
+        self._records: Deque[HistoryRecord] = deque()
+        self._recent: Deque[str] = deque()
+        self._recent_counts: Dict[str, int] = {}
+    
+    def append(self, record: HistoryRecord):
+        """レコードを追加（上限を超えた分は退避）"""
+        self._records.append(record)
+        self.total += 1
+        
+        self._recent.append(record.intent)
+        self._recent_counts[record.intent] = self._recent_counts.get(record.intent, 0) + 1
+        if len(self._recent) > self.recent_window:
+            intent = self._recent.popleft()
+            count = self._recent_counts[intent] - 1
+            if count:
+                self._recent_counts[intent] = count
+            else:
+                del self._recent_counts[intent]
+        
+        if len(self._records) > self.maxlen:
+            evicted = self._records.popleft()
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+    
+    def has_recent_intent(self, intent: str) -> bool:
+        """直近 recent_window 件に同じ意図があるか"""
+        return intent in self._recent_counts
+    
+    def last(self) -> Optional[HistoryRecord]:
+        """最新のレコード"""
+        return self._records[-1] if self._records else None
+    
+    def to_dicts(self) -> List[Dict]:
+        """保持しているレコードを辞書のリストに変換"""
+        return [record.to_dict() for record in self._records]
+    
+    def clear(self):
+        """履歴を消去（退避はしない）"""
+        self._records.clear()
+        self._recent.clear()
+        self._recent_counts.clear()
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        return iter(self._records)
+    
+    def __getitem__(self, index: int) -> HistoryRecord:
+        return self._records[index]
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会話ログ（JSON Lines）
+1ターンごとに1行を追記し、終了時に全件を書き直さなくても会話が残るようにする
+
+機能:
+- バッファ付きの追記（件数・経過時間でフラッシュ）
+- サイズ・経過時間によるローテーション
+- ローテーションしたファイルのgzip圧縮と世代数の上限
+- ファイル全体を読み込まない逐次読み出し
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class JsonLinesWriter:
+    """JSON Lines形式の追記ログ
+    
+    write() はバッファに積むだけで、buffer_records 件たまるか、
+    最初の未書き込みレコードから flush_interval 秒経過した時点でまとめて書き込む。
+    ファイルが max_bytes を超えるか rotate_interval 秒経過したら
+    「名前.日時.jsonl」にリネームし、compress が真ならバックグラウンドでgzip圧縮する。
+    """
+    
+    def __init__(self, path: str, buffer_records: int = 32, flush_interval: float = 1.0,
+                 max_bytes: Optional[int] = 10 * 1024 * 1024,
+                 rotate_interval: Optional[float] = None,
+                 compress: bool = True, backup_count: Optional[int] = None):
+        """ログを初期化"""
+        self.path = Path(path)
+        self.buffer_records = buffer_records
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.compress = compress
+        self.backup_count = backup_count
+        
+        self.written = 0
+        self.rotations = 0
+        
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._compressors: List[threading.Thread] = []
+        self._file = None
+        self._size = 0
+        self._opened_at = 0.0
+    
+    def write(self, record: Dict):
+        """レコードを1件追加"""
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.buffer_records:
+                self._flush_locked()
+            elif self._timer is None and self.flush_interval > 0:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self):
+        """バッファのレコードを書き込む"""
+        with self._lock:
+            self._flush_locked()
+    
+    def rotate(self):
+        """現在のファイルを切り替える"""
+        with self._lock:
+            self._flush_locked()
+            self._rotate_locked()
+    
+    def close(self):
+        """バッファを書き込んでファイルを閉じ、圧縮の完了を待つ"""
+        with self._lock:
+            self._flush_locked()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            compressors, self._compressors = self._compressors, []
+        for thread in compressors:
+            thread.join()
+    
+    def segments(self) -> List[Path]:
+        """ローテーション済みのファイル（古い順）"""
+        return rotated_segments(self.path)
+    
+    def _flush_locked(self):
+        """バッファのレコードを書き込む（ロック取得済み）"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        
+        data = "".join(self._buffer).encode('utf-8')
+        count = len(self._buffer)
+        self._buffer.clear()
+        
+        try:
+            if self._file is None:
+                self._open()
+            elif self._should_rotate(len(data)):
+                self._rotate_locked()
+                self._open()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self.written += count
+        except Exception as e:
+            logger.error(f"会話ログ書き込みエラー: {e}")
+    
+    def _open(self):
+        """現在のファイルを追記モードで開く"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._size = self._file.tell()
+        self._opened_at = time.time()
+    
+    def _should_rotate(self, pending: int) -> bool:
+        """ローテーションが必要か"""
+        if self._size == 0:
+            return False
+        if self.max_bytes is not None and self._size + pending > self.max_bytes:
+            return True
+        return (self.rotate_interval is not None
+                and time.time() - self._opened_at >= self.rotate_interval)
+    
+    def _rotate_locked(self):
+        """現在のファイルをリネームし、必要なら圧縮（ロック取得済み）"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            return
+        
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        target = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        os.replace(self.path, target)
+        self.rotations += 1
+        
+        if self.compress:
+            thread = threading.Thread(target=self._compress, args=(target,),
+                                      name="conversation-log-gzip", daemon=True)
+            thread.start()
+            self._compressors = [t for t in self._compressors if t.is_alive()] + [thread]
+        else:
+            self._remove_old_segments()
+    
+    def _compress(self, path: Path):
+        """ローテーションしたファイルをgzip圧縮"""
+        try:
+            temp_path = path.with_name(path.name + ".gz.tmp")
+            with open(path, 'rb') as src, gzip.open(temp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(temp_path, path.with_name(path.name + ".gz"))
+            os.unlink(path)
+        except Exception as e:
+            logger.error(f"会話ログ圧縮エラー: {e}")
+        with self._lock:
+            self._remove_old_segments()
+    
+    def _remove_old_segments(self):
+        """世代数の上限を超えた古いファイルを削除"""
+        if self.backup_count is None:
+            return
+        segments = rotated_segments(self.path)
+        for old in segments[:max(0, len(segments) - self.backup_count)]:
+            try:
+                old.unlink()
+            except OSError as e:
+                logger.error(f"会話ログ削除エラー: {e}")
+
+def rotated_segments(path) -> List[Path]:
+    """ローテーション済みのファイル（古い順、圧縮中の一時ファイルは除く）"""
+    path = Path(path)
+    if not path.parent.exists():
+        return []
+    prefix = f"{path.stem}."
+    segments = [
+        p for p in path.parent.iterdir()
+        if p.name.startswith(prefix) and p != path
+        and (p.name.endswith(path.suffix) or p.name.endswith(path.suffix + ".gz"))
+    ]
+    # 圧縮の直後（圧縮前のファイルを削除する前）は両方が存在するため、圧縮済みの方だけを残す
+    names = {p.name for p in segments}
+    segments = [p for p in segments if p.name + ".gz" not in names]
+    # 日時を含むファイル名の辞書順は作成順と一致する
+    return sorted(segments, key=lambda p: p.name.replace(".gz", ""))
+
+def read_records(path, include_rotated: bool = True) -> Iterator[Dict]:
+    """ログを1件ずつ読み出す（ローテーション済みのファイルから古い順）
+    
+    異常終了で途中まで書かれた行は読み飛ばす。
+    """
+    path = Path(path)
+    files = rotated_segments(path) if include_rotated else []
+    if path.exists():
+        files.append(path)
+    
+    for file_path in files:
+        if not file_path.exists() and file_path.suffix != ".gz":
+            # 一覧の取得後に圧縮された
+            file_path = file_path.with_name(file_path.name + ".gz")
+        opener = gzip.open if file_path.suffix == ".gz" else open
+        try:
+            with opener(file_path, 'rt', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"会話ログの不正な行を読み飛ばしました: {file_path}:{line_number}")
+        except FileNotFoundError:
+            # 世代数の上限により削除された
+            continue
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+意図予測用の近似最近傍インデックス
+学習データが数百万件に増えても、全件との類似度計算をせずに候補を絞り込む
+
+機能:
+- ランダム超平面による局所性鋭敏型ハッシュ（コサイン類似度用）
+- 近傍バケットの探索（マルチプローブ）
+- 1件ずつの追加
+- ディスクへの保存と読み込み
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Optional
+
+# インデックスを作成・読み込むときに読み込む
+from startup_profile import lazy_import
+
+np = lazy_import('numpy')
+
+class IntentIndex:
+    """TF-IDFベクトルの局所性鋭敏型ハッシュ（SimHash）インデックス
+    
+    各テーブルは bits 個のランダム超平面のどちら側にあるかをビット列にしたキーで行を分類する。
+    検索ではクエリと同じキー（probes が真ならキーを1ビット反転したものも）のバケットに
+    入っている行を候補とし、max_candidates を超える場合は一致したバケットの多い行を優先する。
+    候補の類似度の計算は呼び出し側が行う。行番号はコーパスでの位置で、追加は末尾に限る。
+    
+    バケットはキー順に並べた行番号の配列と、キーごとの開始位置の配列で表す
+    （開始位置の配列は tables * 2**bits 要素）。
+    """
+    
+    # 追加された行はこの件数ごとにバケットへ併合する
+    TAIL_LIMIT = 1024
+    
+    def __init__(self, n_features: int, tables: int = 8, bits: int = 20, probes: bool = True,
+                 max_candidates: int = 1000, seed: int = 0, fingerprint: str = ""):
+        """空のインデックスを作成"""
+        if not 1 <= bits <= 24:
+            raise ValueError("bits は1から24の範囲で指定してください")
+        self.n_features = n_features
+        self.tables = tables
+        self.bits = bits
+        self.probes = probes
+        self.max_candidates = max_candidates
+        self.seed = seed
+        self.fingerprint = fingerprint
+        
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_features, tables * bits)).astype(np.float32)
+        self._weights = np.int64(1) << np.arange(bits, dtype=np.int64)
+        # テーブル番号をキーの上位ビットに入れ、全テーブルのバケットを1つの配列で扱う
+        self._table_offsets = np.arange(tables, dtype=np.int64) << bits
+        # 1ビット反転の探索用マスク（先頭は反転なし）
+        self._flips = np.concatenate(([0], self._weights)).astype(np.int64)
+        
+        self._rows = 0
+        self._order = np.empty(0, dtype=np.int32)
+        self._starts = np.zeros((tables << bits) + 1, dtype=np.int32)
+        self._tail = np.empty((self.TAIL_LIMIT, tables), dtype=np.int64)
+        self._tail_count = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return self._rows + self._tail_count
+    
+    @classmethod
+    def build(cls, matrix, chunk_size: int = 65536, **options) -> 'IntentIndex':
+        """コーパス行列（行がL2正規化済みの疎行列）からインデックスを構築"""
+        index = cls(matrix.shape[1], **options)
+        if matrix.shape[0]:
+            keys = np.vstack([
+                index._hash(np.asarray(matrix[start:start + chunk_size] @ index._planes))
+                for start in range(0, matrix.shape[0], chunk_size)
+            ])
+            index._insert(keys)
+        return index
+    
+    def add(self, columns: np.ndarray, weights: np.ndarray):
+        """1行分のベクトル（非ゼロの列番号と値）を末尾に追加"""
+        keys = self._hash_one(columns, weights)
+        with self._lock:
+            self._tail[self._tail_count] = keys
+            self._tail_count += 1
+            if self._tail_count >= self.TAIL_LIMIT:
+                self._merge_tail()
+    
+    def candidates(self, columns: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """クエリベクトルと同じバケット（および近傍バケット）にある行番号（昇順）"""
+        keys = self._hash_one(columns, weights)
+        flips = self._flips if self.probes else self._flips[:1]
+        probe_keys = (keys[:, None] ^ flips[None, :]).ravel()
+        
+        with self._lock:
+            lo = self._starts[probe_keys]
+            # 大きなバケットは先頭の max_candidates 件だけを読み、
+            # 同じキーのバケットだけで足りる場合は近傍バケットを読まない
+            lengths = np.minimum(self._starts[probe_keys + 1] - lo, self.max_candidates)
+            if lengths[::len(flips)].sum() >= self.max_candidates:
+                lengths.reshape(self.tables, len(flips))[:, 1:] = 0
+            rows = self._order[_ranges(lo, lengths)]
+            if self._tail_count:
+                tail = self._tail[:self._tail_count]
+                matched = np.isin(tail, probe_keys).sum(axis=1)
+                tail_rows = np.repeat(np.arange(self._rows, self._rows + len(tail)), matched)
+                rows = np.concatenate((rows, tail_rows))
+        
+        if len(rows) == 0:
+            return rows
+        rows, counts = np.unique(rows, return_counts=True)
+        if len(rows) > self.max_candidates:
+            keep = np.argpartition(-counts, self.max_candidates - 1)[:self.max_candidates]
+            rows = np.sort(rows[keep])
+        return rows
+    
+    def save(self, path: str):
+        """インデックスをファイルに保存（一時ファイルから置き換え）"""
+        with self._lock:
+            self._merge_tail()
+            order, starts = self._order, self._starts
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.npz', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f, order=order, starts=starts,
+                    params=np.array([self.n_features, self.tables, self.bits, self.seed]),
+                    fingerprint=np.array(self.fingerprint)
+                )
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+    
+    @classmethod
+    def load(cls, path: str, n_features: int, fingerprint: str, **options) -> Optional['IntentIndex']:
+        """保存したインデックスを読み込む（パラメーターや照合用の値が異なる場合は None）"""
+        if not os.path.exists(path):
+            return None
+        index = cls(n_features, fingerprint=fingerprint, **options)
+        with np.load(path) as data:
+            params = [int(value) for value in data['params']]
+            if (params != [n_features, index.tables, index.bits, index.seed]
+                    or str(data['fingerprint']) != fingerprint):
+                return None
+            index._order = data['order']
+            index._starts = data['starts']
+        index._rows = len(index._order) // index.tables
+        return index
+    
+    def _hash(self, projected: np.ndarray) -> np.ndarray:
+        """超平面への射影からテーブルごとのキーを作成"""
+        signs = (projected > 0).reshape(-1, self.tables, self.bits)
+        return (signs * self._weights).sum(axis=2) | self._table_offsets
+    
+    def _hash_one(self, columns: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """1行分のベクトルのテーブルごとのキー"""
+        return self._hash(weights @ self._planes[columns])[0]
+    
+    def _insert(self, keys: np.ndarray):
+        """行番号 self._rows 以降の行のキーをバケットに追加"""
+        rows = np.repeat(np.arange(self._rows, self._rows + len(keys), dtype=np.int32), self.tables)
+        keys = keys.ravel()
+        order = np.argsort(keys, kind='stable')
+        # 同じキーの中では行番号順になるよう、既存の行の後ろに挿入する
+        self._order = np.insert(self._order, self._starts[keys[order] + 1], rows[order])
+        counts = np.bincount(keys, minlength=len(self._starts) - 1)
+        self._starts[1:] += np.cumsum(counts, dtype=np.int64).astype(np.int32)
+        self._rows += len(keys) // self.tables
+    
+    def _merge_tail(self):
+        """追加された行をバケットに併合（ロック取得済み）"""
+        if not self._tail_count:
+            return
+        self._insert(self._tail[:self._tail_count].copy())
+        self._tail_count = 0
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """[start, start + length) の範囲を連結した位置の配列"""
+    total = int(lengths.sum())
+    offsets = np.cumsum(lengths) - lengths
+    return np.repeat(starts - offsets, lengths) + np.arange(total)
+
+def vectorizer_fingerprint(vectorizer, rows: int, last_row_id: int) -> str:
+    """ベクトライザーの語彙・IDFとコーパスの範囲から、保存したインデックスの照合用の値を作成"""
+    digest = hashlib.sha1()
+    for term, column in sorted(vectorizer.vocabulary_.items()):
+        digest.update(f"{term}\t{column}\n".encode('utf-8'))
+    digest.update(np.asarray(vectorizer.idf_, dtype=np.float64).tobytes())
+    digest.update(f"{rows}:{last_row_id}".encode('utf-8'))
+    return digest.hexdigest()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ログ出力の設定
+ログレコードをキューに積むだけで呼び出し元に戻り、書式化とファイル出力はバックグラウンドで行う
+
+機能:
+- キュー経由のログ出力（QueueHandler / QueueListener）
+- 書式化をバックグラウンドスレッドに遅延
+- 会話処理で頻繁に出力するログのカテゴリ別の間引き・無効化
+"""
+
+import atexit
+import itertools
+import logging
+import logging.handlers
+import queue
+import threading
+from typing import Dict, Optional, Union
+
+CATEGORY_PREFIX = "auto_response"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+_lock = threading.Lock()
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """書式化せずにレコードをキューに積むハンドラー
+    
+    標準の QueueHandler は呼び出し元のスレッドでメッセージを書式化するため、
+    例外情報のテキスト化だけを行い、メッセージの組み立てはリスナー側に任せる。
+    ログの引数は書式化されるまで参照されるため、変更されうるオブジェクトを渡さないこと。
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """例外情報だけをテキストにしてレコードを返す"""
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class SamplingFilter(logging.Filter):
+    """一定の割合だけレコードを通すフィルター（rate=0.1 なら10件に1件）"""
+    
+    def __init__(self, rate: float):
+        """フィルターを初期化"""
+        super().__init__()
+        self.interval = max(1, round(1 / rate))
+        self._counter = itertools.count()
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        return next(self._counter) % self.interval == 0
+
+def category_logger(category: str) -> logging.Logger:
+    """カテゴリのロガー（configure_categories で間引き・無効化できる）"""
+    return logging.getLogger(f"{CATEGORY_PREFIX}.{category}")
+
+def setup_logging(log_file: str, level: Union[int, str] = logging.INFO,
+                  fmt: str = '%(asctime)s - %(levelname)s - %(message)s') -> logging.handlers.QueueListener:
+    """キュー経由のログ出力を設定（設定済みの場合は既存のリスナーを返す）"""
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return _listener
+        
+        formatter = logging.Formatter(fmt)
+        handlers = [
+            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        root = logging.getLogger()
+        root.setLevel(level)
+        _handler = LazyQueueHandler(log_queue)
+        root.addHandler(_handler)
+        
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+def configure_categories(categories: Dict[str, Union[bool, float]]):
+    """カテゴリごとの出力割合を設定
+    
+    値が false または 0 のカテゴリは無効化し（ログレコードも作成しない）、
+    0 から 1 の値のカテゴリはその割合に間引く。true または 1 はすべて出力する。
+    """
+    for category, rate in categories.items():
+        logger = category_logger(category)
+        for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+            logger.removeFilter(existing)
+        
+        rate = float(rate)
+        if rate <= 0:
+            logger.setLevel(logging.CRITICAL + 1)
+            continue
+        logger.setLevel(logging.NOTSET)
+        if rate < 1:
+            logger.addFilter(SamplingFilter(rate))
+
+def shutdown_logging():
+    """キューに残ったログを出力してリスナーを停止"""
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
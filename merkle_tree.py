@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+マークルツリー
+ブロックのトランザクションのハッシュから、ブロックヘッダーに入れるマークルルートを計算する
+
+機能:
+- マークルルートの計算
+- トランザクションの包含証明（O(log n) 個のハッシュ）の作成
+- ブロック全体を使わない包含証明の検証（SPV）
+"""
+
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+# トランザクションがない場合のマークルルート
+EMPTY_ROOT = "0" * 64
+
+def hash_pair(left: bytes, right: bytes) -> bytes:
+    """隣り合う2つのノードから親ノードのハッシュを計算（葉のハッシュと区別するため先頭に 0x01 を付ける）"""
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+@dataclass(frozen=True)
+class MerkleProof:
+    """トランザクションの包含証明
+    
+    siblings は葉から根に向かう各段の兄弟ノード（16進のハッシュ, 兄弟が左側か）。
+    兄弟のない段（奇数個の段の最後のノード）は含まない。
+    """
+    leaf: str
+    index: int
+    siblings: Tuple[Tuple[str, bool], ...]
+    
+    def to_dict(self) -> Dict:
+        """辞書形式に変換"""
+        return {
+            'leaf': self.leaf,
+            'index': self.index,
+            'siblings': [[sibling, is_left] for sibling, is_left in self.siblings]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MerkleProof':
+        """辞書形式から復元"""
+        return cls(
+            leaf=data['leaf'],
+            index=data['index'],
+            siblings=tuple((sibling, bool(is_left)) for sibling, is_left in data['siblings'])
+        )
+
+class MerkleTree:
+    """葉（16進のハッシュ）の列から作るマークルツリー
+    
+    奇数個の段では最後のノードをそのまま上の段に上げる。
+    末尾を複製しないため、末尾のトランザクションを重複させた列が同じルートになることはない。
+    全段のノードを保持し、ルートと包含証明は再計算せずに返す。
+    """
+    
+    def __init__(self, leaves: Sequence[str]):
+        """ツリーを構築"""
+        self.leaves: List[str] = list(leaves)
+        self.levels: List[List[bytes]] = [[bytes.fromhex(leaf) for leaf in self.leaves]]
+        level = self.levels[0]
+        while len(level) > 1:
+            level = [
+                hash_pair(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                for i in range(0, len(level), 2)
+            ]
+            self.levels.append(level)
+        self.root = level[0].hex() if level else EMPTY_ROOT
+    
+    def __len__(self) -> int:
+        return len(self.leaves)
+    
+    def proof(self, index: int) -> MerkleProof:
+        """index 番目の葉の包含証明"""
+        if not 0 <= index < len(self.leaves):
+            raise IndexError(f"葉の番号が範囲外です: {index}")
+        siblings = []
+        position = index
+        for level in self.levels[:-1]:
+            sibling = position ^ 1
+            if sibling < len(level):
+                siblings.append((level[sibling].hex(), sibling < position))
+            position //= 2
+        return MerkleProof(leaf=self.leaves[index], index=index, siblings=tuple(siblings))
+
+def merkle_root(leaves: Sequence[str]) -> str:
+    """葉（16進のハッシュ）の列からマークルルートを計算"""
+    return MerkleTree(leaves).root
+
+def verify_proof(proof: MerkleProof, root: str) -> bool:
+    """包含証明の葉からルートを計算し、指定したマークルルートと一致するか"""
+    try:
+        node = bytes.fromhex(proof.leaf)
+        for sibling, is_left in proof.siblings:
+            sibling_bytes = bytes.fromhex(sibling)
+            node = hash_pair(sibling_bytes, node) if is_left else hash_pair(node, sibling_bytes)
+    except ValueError:
+        return False
+    return node.hex() == root
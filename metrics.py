@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+処理段階ごとの計測
+会話の1ターンの各処理にかかった時間を集計し、Prometheus形式のテキストやJSONで出力する
+
+機能:
+- レイテンシのヒストグラム（p50/p95/p99）
+- 呼び出し回数・エラー回数のカウンター
+- 実行中の件数のゲージ
+- Prometheus形式のHTTPエンドポイントと定期的なJSON出力
+"""
+
+import bisect
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 0.5ミリ秒から約46秒まで、√2 倍ずつのバケット境界（秒）
+DEFAULT_BUCKETS = tuple(0.0005 * 2 ** (i / 2) for i in range(34))
+
+class LatencyHistogram:
+    """固定バケットのレイテンシヒストグラム
+    
+    分位点はバケット内の線形補間で推定する（誤差はバケット幅以内）。
+    """
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """ヒストグラムを初期化"""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def observe(self, seconds: float):
+        """1件の所要時間を記録"""
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def quantile(self, q: float) -> float:
+        """分位点の推定値（秒）"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self.max)
+            cumulative += bucket_count
+        return self.max
+
+class StageStats:
+    """1つの処理段階の計測値"""
+    
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """計測値を初期化"""
+        self.latency = LatencyHistogram(buckets)
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+
+class MetricsRegistry:
+    """処理段階ごとの計測値の登録先"""
+    
+    def __init__(self, namespace: str = "auto_response", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """登録先を初期化"""
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.started_at = time.time()
+        self._stages: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """with ブロックの所要時間を記録"""
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats(self.buckets)
+            stats.in_flight += 1
+        
+        start_time = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start_time
+            with self._lock:
+                stats.in_flight -= 1
+                stats.calls += 1
+                if failed:
+                    stats.errors += 1
+                stats.latency.observe(elapsed)
+    
+    def observe(self, stage: str, seconds: float):
+        """計測済みの所要時間を記録"""
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats(self.buckets)
+            stats.calls += 1
+            stats.latency.observe(seconds)
+    
+    def stages(self) -> List[str]:
+        """記録のある処理段階"""
+        with self._lock:
+            return sorted(self._stages)
+    
+    def snapshot(self) -> Dict:
+        """計測値の要約（JSON出力用、時間はミリ秒）"""
+        with self._lock:
+            stages = {}
+            for name, stats in sorted(self._stages.items()):
+                latency = stats.latency
+                stages[name] = {
+                    'calls': stats.calls,
+                    'errors': stats.errors,
+                    'in_flight': stats.in_flight,
+                    'mean_ms': latency.sum / latency.count * 1000 if latency.count else 0.0,
+                    'p50_ms': latency.quantile(0.50) * 1000,
+                    'p95_ms': latency.quantile(0.95) * 1000,
+                    'p99_ms': latency.quantile(0.99) * 1000,
+                    'max_ms': latency.max * 1000
+                }
+        return {
+            'timestamp': time.time(),
+            'uptime_seconds': time.time() - self.started_at,
+            'stages': stages
+        }
+    
+    def to_prometheus(self) -> str:
+        """Prometheusのテキスト形式で出力"""
+        prefix = self.namespace
+        lines = [
+            f"# HELP {prefix}_stage_latency_seconds Latency of each conversation stage.",
+            f"# TYPE {prefix}_stage_latency_seconds histogram"
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for name, stats in stages:
+                latency = stats.latency
+                cumulative = 0
+                for bound, bucket_count in zip(latency.buckets, latency.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{prefix}_stage_latency_seconds_bucket{{stage="{name}",le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_latency_seconds_bucket{{stage="{name}",le="+Inf"}} {latency.count}')
+                lines.append(f'{prefix}_stage_latency_seconds_sum{{stage="{name}"}} {latency.sum:.9g}')
+                lines.append(f'{prefix}_stage_latency_seconds_count{{stage="{name}"}} {latency.count}')
+            
+            for metric, kind, help_text, attr in (
+                ("stage_calls_total", "counter", "Completed calls of each stage.", 'calls'),
+                ("stage_errors_total", "counter", "Calls of each stage that raised.", 'errors'),
+                ("stage_in_flight", "gauge", "Calls of each stage currently running.", 'in_flight')
+            ):
+                lines.append(f"# HELP {prefix}_{metric} {help_text}")
+                lines.append(f"# TYPE {prefix}_{metric} {kind}")
+                for name, stats in stages:
+                    lines.append(f'{prefix}_{metric}{{stage="{name}"}} {getattr(stats, attr)}')
+        return "\n".join(lines) + "\n"
+    
+    def dump_json(self, path: str):
+        """要約をJSONファイルに書き出す（一時ファイルから置き換え）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+def timed_method(stage: str) -> Callable:
+    """メソッドの所要時間を self.metrics に記録するデコレーター"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timed(stage):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+class MetricsExporter:
+    """計測値の出力（HTTPエンドポイントと定期的なJSON出力）
+    
+    port を指定すると /metrics でPrometheus形式、/metrics.json でJSONを返す。
+    json_path を指定すると interval 秒ごとにJSONファイルを書き出す。
+    """
+    
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: Optional[int] = None,
+                 json_path: Optional[str] = None, interval: float = 60.0):
+        """出力を初期化"""
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.json_path = json_path
+        self.interval = interval
+        
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+    
+    @property
+    def server_address(self):
+        """HTTPサーバーの待ち受けアドレス（ポート0を指定した場合の確認用）"""
+        return self._server.server_address if self._server is not None else None
+    
+    def start(self):
+        """HTTPサーバーとJSON出力を開始"""
+        self._stop.clear()
+        if self.port is not None:
+            self._server = ThreadingHTTPServer((self.host, self.port), self._handler_class())
+            self._server.daemon_threads = True
+            self._spawn(self._server.serve_forever, "metrics-http")
+            logger.info(f"メトリクスを公開しました: http://{self.host}:{self.server_address[1]}/metrics")
+        if self.json_path is not None:
+            self._spawn(self._dump_loop, "metrics-dump")
+    
+    def stop(self):
+        """HTTPサーバーとJSON出力を停止（最後にもう一度JSONを書き出す）"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.json_path is not None:
+            self._dump()
+    
+    def _spawn(self, target: Callable, name: str):
+        """バックグラウンドスレッドを開始"""
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+    
+    def _dump_loop(self):
+        """一定間隔でJSONを書き出す"""
+        while not self._stop.wait(self.interval):
+            self._dump()
+    
+    def _dump(self):
+        """JSONを書き出す"""
+        try:
+            self.registry.dump_json(self.json_path)
+        except Exception as e:
+            logger.error(f"メトリクス出力エラー: {e}")
+    
+    def _handler_class(self):
+        """リクエストハンドラーのクラス"""
+        registry = self.registry
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry.to_prometheus().encode('utf-8')
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(registry.snapshot(), ensure_ascii=False).encode('utf-8')
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                # アクセスログは出力しない
+                pass
+        
+        return MetricsHandler
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+応答カタログ
+応答テンプレートを設定ファイルから一度だけ読み込み、意図・感情・文脈ごとの応答文を事前に組み立てる
+
+機能:
+- 言語・意図ごとの応答テンプレート（YAML）
+- 感情に応じた前置き・文脈に応じた追加文を組み込んだ応答文の事前生成
+- 重み付きの応答選択
+- 設定ファイルの変更検知による再読み込み
+"""
+
+import bisect
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTENT = "default"
+
+# 設定ファイルがない場合の応答テンプレート
+DEFAULT_CATALOG = {
+    'default_language': "ja",
+    'languages': {
+        'ja': {
+            'emotion_prefixes': {
+                'positive': "素晴らしいですね！",
+                'negative': "お困りのようですね。",
+                'neutral': ""
+            },
+            'follow_up': " 先ほどの件についても、何かご質問はございますか？",
+            'intents': {
+                'greeting': [
+                    "こんにちは！お疲れ様です。",
+                    "はじめまして！何かお手伝いできることはありますか？",
+                    "おはようございます！今日も一日頑張りましょう。"
+                ],
+                'thanks': [
+                    "どういたしまして！お役に立てて嬉しいです。",
+                    "こちらこそ、ありがとうございます。",
+                    "お気軽にご相談ください。"
+                ],
+                'help': [
+                    "お手伝いさせていただきます。どのようなことでお困りですか？",
+                    "心配いりません。一緒に解決しましょう。",
+                    "サポートいたします。詳しく教えてください。"
+                ],
+                'question': [
+                    "良い質問ですね。詳しく調べてお答えします。",
+                    "その件について確認いたします。",
+                    "興味深いご質問です。検討して回答いたします。"
+                ],
+                'goodbye': [
+                    "お疲れ様でした！またお会いしましょう。",
+                    "さようなら！良い一日をお過ごしください。",
+                    "また次回お会いできるのを楽しみにしています。"
+                ],
+                DEFAULT_INTENT: [
+                    "理解いたしました。他に何かお手伝いできることはありますか？"
+                ]
+            }
+        }
+    }
+}
+
+@dataclass(frozen=True)
+class ResponseChoices:
+    """組み立て済みの応答文と重みの累積和"""
+    texts: Tuple[str, ...]
+    cumulative: Tuple[float, ...]
+    best: str
+    
+    def sample(self, rng: random.Random) -> str:
+        """重みに従って応答文を1つ選ぶ"""
+        point = rng.random() * self.cumulative[-1]
+        index = bisect.bisect_right(self.cumulative, point)
+        return self.texts[min(index, len(self.texts) - 1)]
+
+class ResponseCatalog:
+    """応答カタログ
+    
+    (言語, 意図, 感情, 追加文の有無) ごとの応答文を読み込み時に組み立てておき、
+    応答時は辞書を1回引いて重み付きで選ぶだけにする。
+    path を指定した場合は reload_interval 秒ごとに更新時刻を確認し、
+    変更されていれば再読み込みする（読み込みに失敗した場合は以前の内容を使い続ける）。
+    """
+    
+    def __init__(self, path: Optional[str] = None, reload_interval: float = 5.0,
+                 include_emotion: bool = True, include_context: bool = True,
+                 randomize: bool = True, rng: Optional[random.Random] = None):
+        """カタログを初期化"""
+        self.path = path
+        self.reload_interval = reload_interval
+        self.include_emotion = include_emotion
+        self.include_context = include_context
+        self.randomize = randomize
+        self.rng = rng or random.Random()
+        
+        self._state: Tuple[Dict[Tuple[str, str, str, bool], ResponseChoices], str] = ({}, "ja")
+        self.reload_count = 0
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        
+        self.compile(DEFAULT_CATALOG)
+        if path is not None:
+            self.reload_if_changed(force=True)
+    
+    @property
+    def index(self) -> Dict[Tuple[str, str, str, bool], ResponseChoices]:
+        """(言語, 意図, 感情, 追加文の有無) から応答文の選択肢への索引"""
+        return self._state[0]
+    
+    @property
+    def default_language(self) -> str:
+        """対応していない言語の場合に使用する言語"""
+        return self._state[1]
+    
+    @property
+    def languages(self) -> List[str]:
+        """読み込み済みの言語"""
+        return sorted({key[0] for key in self.index})
+    
+    def intents(self, language: Optional[str] = None) -> List[str]:
+        """読み込み済みの意図"""
+        language = language or self.default_language
+        return sorted({key[1] for key in self.index if key[0] == language} - {DEFAULT_INTENT})
+    
+    def compile(self, catalog: Dict):
+        """カタログの内容から応答文の索引を組み立てて差し替える"""
+        index = {}
+        for language, entry in (catalog.get('languages') or {}).items():
+            prefixes = dict(entry.get('emotion_prefixes') or {})
+            prefixes.setdefault('neutral', "")
+            follow_up = entry.get('follow_up', "")
+            
+            for intent, templates in (entry.get('intents') or {}).items():
+                texts, weights = self._parse_templates(templates)
+                if not texts:
+                    continue
+                for emotion, prefix in prefixes.items():
+                    for with_follow_up in (False, True):
+                        suffix = follow_up if with_follow_up else ""
+                        variants = tuple(f"{prefix or ''} {text}{suffix}".strip() for text in texts)
+                        index[(language, intent, emotion, with_follow_up)] = self._choices(variants, weights)
+            
+            if (language, DEFAULT_INTENT, "neutral", False) not in index:
+                raise ValueError(f"言語 {language} に {DEFAULT_INTENT} の応答が定義されていません")
+        
+        default_language = catalog.get('default_language', "ja")
+        if (default_language, DEFAULT_INTENT, "neutral", False) not in index:
+            raise ValueError(f"デフォルト言語 {default_language} の応答が定義されていません")
+        
+        # 索引全体を1回の代入で差し替える（応答中のスレッドは古い索引を最後まで使う）
+        self._state = (index, default_language)
+    
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """設定ファイルが変更されていれば再読み込み"""
+        if self.path is None:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+        
+        try:
+            mtime = os.stat(self.path).st_mtime
+            if not force and mtime == self._mtime:
+                return False
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.compile(yaml.safe_load(f) or {})
+            self._mtime = mtime
+            self.reload_count += 1
+            logger.info(f"応答カタログを読み込みました: {self.path}")
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"応答カタログの読み込みエラー: {e}")
+            return False
+    
+    def choose(self, intent: str, emotion: str = "neutral", language: Optional[str] = None,
+               follow_up: bool = False) -> str:
+        """意図・感情・文脈に応じた応答文を選ぶ"""
+        self.reload_if_changed()
+        
+        index, default_language = self._state
+        if not self.include_emotion:
+            emotion = "neutral"
+        follow_up = follow_up and self.include_context
+        if language is None or (language, DEFAULT_INTENT, "neutral", False) not in index:
+            language = default_language
+        
+        choices = (index.get((language, intent, emotion, follow_up))
+                   or index.get((language, intent, "neutral", follow_up))
+                   or index.get((language, DEFAULT_INTENT, emotion, follow_up))
+                   or index[(language, DEFAULT_INTENT, "neutral", follow_up)])
+        if not self.randomize:
+            return choices.best
+        return choices.sample(self.rng)
+    
+    def all_texts(self, language: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+        """組み立て済みのすべての (応答文, 感情)（language を指定するとその言語の応答文だけ）"""
+        for (text_language, intent, emotion, follow_up), choices in self.index.items():
+            if language is not None and text_language != language:
+                continue
+            for text in choices.texts:
+                yield text, emotion
+    
+    def _parse_templates(self, templates) -> Tuple[List[str], List[float]]:
+        """テンプレート（文字列または {text, weight}）の一覧を解析"""
+        texts, weights = [], []
+        for template in templates or []:
+            if isinstance(template, str):
+                text, weight = template, 1.0
+            else:
+                text, weight = template['text'], float(template.get('weight', 1.0))
+            if weight > 0:
+                texts.append(text)
+                weights.append(weight)
+        return texts, weights
+    
+    def _choices(self, texts: Tuple[str, ...], weights: List[float]) -> ResponseChoices:
+        """重みの累積和を求めて選択肢を作成"""
+        cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        best = texts[max(range(len(weights)), key=weights.__getitem__)]
+        return ResponseChoices(texts, tuple(cumulative), best)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音声認識バックエンド
+複数の認識エンジンを共通インターフェースで扱い、並列に実行して最良の結果を選ぶ
+
+機能:
+- 認識バックエンドの共通インターフェース
+- オンライン（Google）とオフライン（Vosk、Whisper、Sphinx）の実装
+- テスト用のスタブ実装
+- バックエンドごとのタイムアウト付き並列実行
+"""
+
+import abc
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class RecognitionResult:
+    """音声認識の結果"""
+    engine: str
+    text: str
+    confidence: float
+
+class RecognizerBackend(abc.ABC):
+    """音声認識バックエンドの基底クラス（recognize を実装していないサブクラスは生成時にエラーになる）"""
+    
+    name = "base"
+    
+    def __init__(self, timeout: float = 5.0):
+        """バックエンドを初期化"""
+        self.timeout = timeout
+    
+    @abc.abstractmethod
+    def recognize(self, audio: sr.AudioData, language: str) -> Optional[RecognitionResult]:
+        """音声データをテキストに変換（認識できない場合はNone）"""
+
+class GoogleBackend(RecognizerBackend):
+    """Google音声認識（ネットワークが必要）"""
+    
+    name = "google"
+    
+    def __init__(self, timeout: float = 5.0, api_key: Optional[str] = None,
+                 confidence: float = 0.8):
+        """バックエンドを初期化"""
+        super().__init__(timeout)
+        self.api_key = api_key or None
+        self.confidence = confidence
+        self.recognizer = sr.Recognizer()
+        self.recognizer.operation_timeout = timeout
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> Optional[RecognitionResult]:
+        """Google音声認識で変換"""
+        try:
+            text = self.recognizer.recognize_google(audio, key=self.api_key, language=language)
+        except sr.UnknownValueError:
+            return None
+        return RecognitionResult(self.name, text, self.confidence)
+
+class SphinxBackend(RecognizerBackend):
+    """CMU Sphinx音声認識（オフライン、pocketsphinxが必要）"""
+    
+    name = "sphinx"
+    
+    # model_path のディレクトリの構成（speech_recognition の pocketsphinx-data/<言語> と同じ）
+    MODEL_FILES = ("acoustic-model", "language-model.lm.bin", "pronounciation-dictionary.dict")
+    
+    def __init__(self, timeout: float = 5.0, language: Optional[str] = None,
+                 confidence: float = 0.5, model_path: Optional[str] = None):
+        """バックエンドを初期化（model_path を指定すると、その音響モデル・言語モデル・辞書を使う）"""
+        super().__init__(timeout)
+        self.language = language
+        self.confidence = confidence
+        self.model = None
+        if model_path:
+            self.model = tuple(os.path.join(model_path, name) for name in self.MODEL_FILES)
+            missing = [path for path in self.model if not os.path.exists(path)]
+            if missing:
+                raise FileNotFoundError(f"Sphinxモデルが見つかりません: {', '.join(missing)}")
+        self.recognizer = sr.Recognizer()
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> Optional[RecognitionResult]:
+        """Sphinxで変換"""
+        try:
+            text = self.recognizer.recognize_sphinx(audio, language=self.model or self.language or language)
+        except sr.UnknownValueError:
+            return None
+        return RecognitionResult(self.name, text, self.confidence)
+
+class VoskBackend(RecognizerBackend):
+    """Vosk音声認識（オフライン、ローカルモデルを使用）"""
+    
+    name = "vosk"
+    SAMPLE_RATE = 16000
+    
+    def __init__(self, model_path: str, timeout: float = 5.0):
+        """モデルを読み込んでバックエンドを初期化"""
+        super().__init__(timeout)
+        import vosk
+        
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> Optional[RecognitionResult]:
+        """Voskで変換（単語ごとの信頼度の平均を信頼度とする）"""
+        recognizer = self._vosk.KaldiRecognizer(self.model, self.SAMPLE_RATE)
+        recognizer.SetWords(True)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2))
+        result = json.loads(recognizer.FinalResult())
+        
+        text = result.get('text', '').replace(' ', '')
+        if not text:
+            return None
+        words = result.get('result', [])
+        confidence = sum(w['conf'] for w in words) / len(words) if words else 0.0
+        return RecognitionResult(self.name, text, confidence)
+
+class WhisperBackend(RecognizerBackend):
+    """Whisper音声認識（オフライン、ローカルモデルを使用）"""
+    
+    name = "whisper"
+    SAMPLE_RATE = 16000
+    
+    def __init__(self, model: str = "base", timeout: float = 10.0):
+        """モデルを読み込んでバックエンドを初期化"""
+        super().__init__(timeout)
+        import whisper
+        
+        self.model = whisper.load_model(model)
+        self._lock = threading.Lock()
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> Optional[RecognitionResult]:
+        """Whisperで変換（セグメントの平均対数尤度から信頼度を求める）"""
+        raw = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        
+        with self._lock:
+            result = self.model.transcribe(samples, language=language.split('-')[0], fp16=False)
+        
+        text = result.get('text', '').strip()
+        segments = result.get('segments', [])
+        if not text or not segments:
+            return None
+        confidence = float(np.exp(np.mean([s['avg_logprob'] for s in segments])))
+        return RecognitionResult(self.name, text, min(confidence, 1.0))
+
+class StubBackend(RecognizerBackend):
+    """固定の結果を返すスタブ（テスト用）"""
+    
+    name = "stub"
+    
+    def __init__(self, text: Optional[str] = None, confidence: float = 1.0,
+                 delay: float = 0.0, timeout: float = 5.0, name: Optional[str] = None):
+        """スタブを初期化"""
+        super().__init__(timeout)
+        self.text = text
+        self.confidence = confidence
+        self.delay = delay
+        if name:
+            self.name = name
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> Optional[RecognitionResult]:
+        """待機後に固定の結果を返す"""
+        if self.delay:
+            time.sleep(self.delay)
+        if self.text is None:
+            return None
+        return RecognitionResult(self.name, self.text, self.confidence)
+
+BACKENDS = {
+    'google': GoogleBackend,
+    'sphinx': SphinxBackend,
+    'vosk': VoskBackend,
+    'whisper': WhisperBackend,
+    'stub': StubBackend
+}
+
+def create_backends(config: Dict) -> List[RecognizerBackend]:
+    """recognition_engines 設定からバックエンドを作成
+    
+    backends を省略した場合は primary のみを使用する。
+    読み込みに失敗したバックエンド（モデル未配置など）はスキップする。
+    バックエンドが受け付けない設定項目は警告を出して無視する。
+    """
+    names = config.get('backends') or [config.get('primary', 'google')]
+    default_timeout = config.get('timeout', 5.0)
+    
+    backends = []
+    for name in names:
+        try:
+            backend_class = BACKENDS[name]
+            accepted = inspect.signature(backend_class.__init__).parameters
+            options = dict(config.get(name) or {})
+            unknown = sorted(key for key in options if key not in accepted or key == 'self')
+            if unknown:
+                logger.warning(f"音声認識バックエンド {name} が対応していない設定項目を無視します: {', '.join(unknown)}")
+                for key in unknown:
+                    del options[key]
+            options.setdefault('timeout', default_timeout)
+            backends.append(backend_class(**options))
+        except Exception as e:
+            logger.error(f"音声認識バックエンド {name} の初期化エラー: {e}")
+    return backends
+
+class ParallelRecognizer:
+    """複数の音声認識バックエンドを並列に実行
+    
+    信頼度の閾値を超えた結果が最初に返った時点でそれを採用する。
+    閾値を超える結果がない場合は、各バックエンドのタイムアウトまで待って
+    最も信頼度の高い結果を返す。タイムアウトしたバックエンドの結果は無視する。
+    """
+    
+    def __init__(self, backends: List[RecognizerBackend], confidence_threshold: float = 0.0,
+                 max_workers: Optional[int] = None):
+        """並列認識器を初期化"""
+        self.backends = backends
+        self.confidence_threshold = confidence_threshold
+        # タイムアウトしたバックエンドがスレッドを占有しても次の発話を処理できるよう余裕を持たせる
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or max(2, len(backends) * 2),
+            thread_name_prefix="recognizer"
+        )
+    
+    def recognize(self, audio: sr.AudioData, language: str) -> Optional[RecognitionResult]:
+        """すべてのバックエンドで認識し、最良の結果を返す"""
+        start_time = time.monotonic()
+        deadlines = {}
+        for backend in self.backends:
+            future = self._executor.submit(backend.recognize, audio, language)
+            deadlines[future] = (backend, start_time + backend.timeout)
+        
+        best: Optional[RecognitionResult] = None
+        pending = set(deadlines)
+        while pending:
+            now = time.monotonic()
+            expired = {f for f in pending if deadlines[f][1] <= now}
+            for future in expired:
+                logger.warning(f"音声認識バックエンド {deadlines[future][0].name} がタイムアウトしました")
+            pending -= expired
+            if not pending:
+                break
+            
+            timeout = min(deadlines[f][1] for f in pending) - now
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"音声認識バックエンド {deadlines[future][0].name} のエラー: {e}")
+                    continue
+                if result is None:
+                    continue
+                if result.confidence >= self.confidence_threshold:
+                    return result
+                if best is None or result.confidence > best.confidence:
+                    best = result
+        
+        return best
+    
+    def shutdown(self):
+        """実行中の認識を待たずにスレッドプールを停止"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
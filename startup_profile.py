@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時間の計測と遅延読み込み
+重い依存モジュールや音声デバイスを最初に使われるまで読み込まず、起動時の内訳を記録する
+
+機能:
+- 最初の属性参照でインポートするモジュール（lazy_import）
+- 最初の参照で一度だけ生成する属性（lazy_component）
+- インポート・初期化の所要時間の記録と起動プロファイルの表示
+- インポート時間の予算の確認
+"""
+
+import importlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class StartupProfile:
+    """起動時の処理の所要時間の記録
+    
+    種類は "import"（起動時のインポート）、"lazy_import"（初回参照時のインポート）、
+    "component"（初回参照時の生成）、"phase"（初期化の各段階）。
+    """
+    
+    def __init__(self):
+        """記録を初期化"""
+        self.entries: List[Tuple[str, str, float]] = []
+        self._lock = threading.Lock()
+    
+    def record(self, kind: str, name: str, seconds: float):
+        """所要時間を1件記録"""
+        with self._lock:
+            self.entries.append((kind, name, seconds))
+    
+    @contextmanager
+    def measure(self, kind: str, name: str) -> Iterator[None]:
+        """with ブロックの所要時間を記録"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(kind, name, time.perf_counter() - start_time)
+    
+    def total(self, kind: Optional[str] = None) -> float:
+        """所要時間の合計（秒）"""
+        with self._lock:
+            return sum(seconds for k, _, seconds in self.entries if kind is None or k == kind)
+    
+    def loaded(self, kind: str) -> List[str]:
+        """記録のある名前（記録順）"""
+        with self._lock:
+            return [name for k, name, _ in self.entries if k == kind]
+    
+    def to_dict(self) -> Dict:
+        """記録を辞書に変換（時間はミリ秒）"""
+        with self._lock:
+            entries = list(self.entries)
+        return {
+            'entries': [
+                {'kind': kind, 'name': name, 'ms': seconds * 1000} for kind, name, seconds in entries
+            ],
+            'totals_ms': {
+                kind: sum(s for k, _, s in entries if k == kind) * 1000
+                for kind in dict.fromkeys(k for k, _, _ in entries)
+            }
+        }
+    
+    def report(self) -> str:
+        """起動プロファイルを表形式の文字列にする（所要時間の長い順）"""
+        with self._lock:
+            entries = sorted(self.entries, key=lambda entry: entry[2], reverse=True)
+        lines = [f"{'kind':<12}{'name':<44}{'ms':>10}", "-" * 66]
+        for kind, name, seconds in entries:
+            lines.append(f"{kind:<12}{name:<44}{seconds * 1000:>10.1f}")
+        lines.append("-" * 66)
+        for kind in dict.fromkeys(k for k, _, _ in entries):
+            lines.append(f"{'total':<12}{kind:<44}{self.total(kind) * 1000:>10.1f}")
+        return "\n".join(lines)
+    
+    def check_budget(self, budget_ms: Optional[float], kind: str = "import") -> bool:
+        """所要時間の合計が予算内か（超えた場合は警告を出力）"""
+        if budget_ms is None:
+            return True
+        elapsed_ms = self.total(kind) * 1000
+        if elapsed_ms <= budget_ms:
+            return True
+        slowest = max(
+            ((name, seconds) for k, name, seconds in self.entries if k == kind),
+            key=lambda entry: entry[1]
+        )
+        logger.warning(
+            f"起動時間が予算を超えました: {kind} {elapsed_ms:.0f}ms > {budget_ms:.0f}ms"
+            f"（最も遅い項目: {slowest[0]} {slowest[1] * 1000:.0f}ms）"
+        )
+        return False
+
+# プロセス全体の起動プロファイル
+PROFILE = StartupProfile()
+
+class LazyModule:
+    """最初の属性参照でインポートするモジュール
+    
+    属性は毎回インポート済みのモジュールから取得するため、
+    unittest.mock.patch などによる差し替えもそのまま反映される。
+    """
+    
+    def __init__(self, name: str):
+        """モジュール名だけを記録"""
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+    
+    def _load(self):
+        """モジュールをインポート（初回のみ所要時間を記録）"""
+        module = self._module
+        if module is not None:
+            return module
+        with self._lock:
+            if self._module is None:
+                with PROFILE.measure("lazy_import", self._name):
+                    self.__dict__['_module'] = importlib.import_module(self._name)
+            return self._module
+    
+    @property
+    def is_loaded(self) -> bool:
+        """インポート済みか"""
+        return self._module is not None
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+    
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._load(), attr, value)
+    
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    """最初に属性を参照したときにインポートするモジュール"""
+    return LazyModule(name)
+
+class lazy_component:
+    """最初に参照されたときに一度だけ生成する属性
+    
+    生成した値はインスタンスの __dict__ に保存するため、2回目以降の参照は通常の属性と同じ速さになる。
+    代入すれば生成せずに値を差し替えられる。生成中は同じインスタンスの他のスレッドを待たせる。
+    """
+    
+    def __init__(self, factory: Callable[[Any], Any]):
+        """生成関数を登録"""
+        self.factory = factory
+        self.name = factory.__name__
+        self.__doc__ = factory.__doc__
+    
+    def __set_name__(self, owner, name: str):
+        self.name = name
+        self.qualname = f"{owner.__name__}.{name}"
+    
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        lock = obj.__dict__.get('_component_lock')
+        if lock is None:
+            lock = obj.__dict__.setdefault('_component_lock', threading.RLock())
+        with lock:
+            if self.name not in obj.__dict__:
+                with PROFILE.measure("component", getattr(self, 'qualname', self.name)):
+                    obj.__dict__[self.name] = self.factory(obj)
+        return obj.__dict__[self.name]
+
+def is_loaded(obj, name: str) -> bool:
+    """lazy_component の属性が生成済み（または代入済み）か"""
+    return name in obj.__dict__
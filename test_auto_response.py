@@ -6,16 +6,35 @@
 
 import unittest
 import tempfile
+import gzip
+import json
 import os
 import sqlite3
+import subprocess
 from unittest.mock import Mock, patch
 import sys
 
+from sklearn.feature_extraction.text import TfidfVectorizer
+
 # テスト対象のモジュールをインポート
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from auto_response_system import AutoResponseSystem
-from advanced_auto_response import AdvancedAutoResponseSystem
+from benchmark_auto_response import BenchmarkHarness, compare, parse_args, save_baseline, main as run_benchmarks
+from audio_capture import AudioCapturePipeline, AudioSource, WaveFileSource
+from speech_backends import ParallelRecognizer, RecognizerBackend, StubBackend, create_backends
+from conversation_history import ConversationHistory, HistoryRecord
+from conversation_log import JsonLinesWriter, read_records
+from logging_setup import category_logger, configure_categories
+from intent_index import IntentIndex
+from metrics import MetricsExporter, MetricsRegistry
+from response_catalog import ResponseCatalog
+from startup_profile import PROFILE, StartupProfile, is_loaded, lazy_import
+from tts_cache import TTSAudioCache
+from tts_worker import TTSWorker
+from advanced_auto_response import (
+    AdvancedAutoResponseSystem, ConversationContext, IntentCorpus, RefitScheduler, SessionScheduler
+)
 
 class TestAutoResponseSystem(unittest.TestCase):
     """基本的な自動応答システムのテスト"""
@@ -23,6 +42,17 @@ class TestAutoResponseSystem(unittest.TestCase):
     def setUp(self):
         """テスト前の準備"""
         self.system = AutoResponseSystem()
+        
+        # 会話ログは一時ディレクトリに書き込む
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.system.conversation_log = JsonLinesWriter(
+            os.path.join(self.temp_dir.name, "conversation_log.jsonl")
+        )
+    
+    def tearDown(self):
+        """テスト後のクリーンアップ"""
+        self.system.conversation_log.close()
+        self.temp_dir.cleanup()
     
     def test_initialization(self):
         """初期化テスト"""
@@ -49,6 +79,23 @@ class TestAutoResponseSystem(unittest.TestCase):
         intent = self.system.analyze_intent("不明なテキスト")
         self.assertEqual(intent, "default")
     
+    def test_intent_matcher_priority(self):
+        """キーワード照合器の優先順位と再構築テスト"""
+        # 複数の意図にマッチする場合はパターン定義順で先の意図を優先
+        intent = self.system.analyze_intent("ありがとう、こんにちは")
+        self.assertEqual(intent, "greeting")
+        
+        # パターンを差し替えると照合器が再構築される
+        patterns = self.system.load_response_patterns()
+        patterns["weather"] = {"keywords": ["天気"], "responses": ["晴れです。"]}
+        self.system.response_patterns = patterns
+        self.assertEqual(self.system.analyze_intent("今日の天気"), "weather")
+        
+        # パターンを直接編集した場合は明示的に再構築
+        self.system.response_patterns["weather"]["keywords"].append("雨")
+        self.system.rebuild_intent_matcher()
+        self.assertEqual(self.system.analyze_intent("雨が降る"), "weather")
+    
     def test_generate_response(self):
         """応答生成テスト"""
         # 挨拶の応答テスト
@@ -61,6 +108,16 @@ class TestAutoResponseSystem(unittest.TestCase):
         self.assertIsInstance(response, str)
         self.assertGreater(len(response), 0)
     
+    def test_conversation_log(self):
+        """会話ログの追記テスト"""
+        self.system.generate_response("こんにちは", "greeting")
+        self.system.generate_response("ありがとう", "thanks")
+        self.system.save_conversation_log()
+        
+        records = list(read_records(self.system.conversation_log.path))
+        self.assertEqual([r['intent'] for r in records], ["greeting", "thanks"])
+        self.assertEqual(records[0]['user_input'], "こんにちは")
+    
     def test_response_patterns(self):
         """応答パターンテスト"""
         patterns = self.system.response_patterns
@@ -114,6 +171,13 @@ database:
     
     def tearDown(self):
         """テスト後のクリーンアップ"""
+        # バックグラウンド処理とデータベース接続を停止
+        self.system.session_scheduler.shutdown()
+        self.system.speech_recognizer.shutdown()
+        self.system.refit_scheduler.stop()
+        self.system.conversation_writer.stop()
+        self.system.db.close_all()
+        
         # 一時ファイルを削除
         os.unlink(self.temp_config.name)
         if os.path.exists(self.temp_db.name):
@@ -130,6 +194,50 @@ database:
         self.assertIsNotNone(self.system.vectorizer)
         self.assertIsNotNone(self.system.sentiment_analyzer)
     
+    def test_tts_warm_up_runs_on_worker(self):
+        """定型応答の事前合成は音声合成ワーカーで認識言語の応答だけを対象に行う"""
+        engine = FakeSpeechEngine()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            self.system.tts_cache = TTSAudioCache(engine, temp_dir, player=Mock())
+            self.system.tts_engine = engine
+            self.system.tts_worker = TTSWorker(engine, engine.speak)
+            self.assertIsNone(self.system.warm_up_tts_cache())
+            
+            self.system.tts_worker.start()
+            try:
+                job = self.system.warm_up_tts_cache()
+                self.assertTrue(job.wait(timeout=5))
+            finally:
+                self.system.tts_worker.stop()
+        
+        ja_texts = {text for text, _ in self.system.response_catalog.all_texts("ja")}
+        en_texts = {text for text, _ in self.system.response_catalog.all_texts("en")} - ja_texts
+        self.assertEqual(self.system.response_language(), "ja")
+        self.assertTrue(ja_texts <= set(engine.rendered))
+        self.assertFalse(en_texts & set(engine.rendered))
+    
+    def test_components_created_on_first_use(self):
+        """音声・感情分析の部品は最初に使うまで生成しない"""
+        for name in ('recognizer', 'microphone', 'tts_engine', 'tts_worker', 'sentiment_analyzer'):
+            self.assertFalse(is_loaded(self.system, name), name)
+        
+        analyzer = self.system.sentiment_analyzer
+        self.assertTrue(is_loaded(self.system, 'sentiment_analyzer'))
+        self.assertIs(self.system.sentiment_analyzer, analyzer)
+        self.assertIn("AdvancedAutoResponseSystem.sentiment_analyzer", PROFILE.loaded("component"))
+        self.assertFalse(is_loaded(self.system, 'tts_engine'))
+    
+    def test_recognize_audio(self):
+        """音声認識バックエンド経由の認識テスト"""
+        import speech_recognition as sr
+        
+        self.system.speech_recognizer = ParallelRecognizer(
+            [StubBackend("こんにちは", confidence=0.9)], confidence_threshold=0.7
+        )
+        text, confidence = self.system.recognize_audio(sr.AudioData(b"\0\0", 16000, 2))
+        self.assertEqual(text, "こんにちは")
+        self.assertEqual(confidence, 0.9)
+    
     def test_analyze_emotion(self):
         """感情分析テスト"""
         # ポジティブなテキスト
@@ -156,6 +264,49 @@ database:
         self.assertGreaterEqual(confidence, 0.0)
         self.assertLessEqual(confidence, 1.0)
     
+    def test_intent_corpus_incremental_update(self):
+        """コーパス行列の追加更新と再学習テスト"""
+        before = len(self.system.intent_corpus)
+        vectorizer = self.system.vectorizer
+        
+        self.system.learn_from_interaction("ありがとう", "thanks", "どういたしまして！", 1.0)
+        
+        # 追加時はベクトライザーを再学習せず、行だけを追加する
+        self.assertIs(self.system.vectorizer, vectorizer)
+        self.assertEqual(len(self.system.intent_corpus), before + 1)
+        self.assertEqual(self.system.intent_corpus.matrix.shape[0], before + 1)
+        
+        intent, confidence = self.system.predict_intent("ありがとう")
+        self.assertEqual(intent, "thanks")
+        self.assertAlmostEqual(confidence, 1.0)
+        
+        # 明示的な再学習でコーパス全体を再構築
+        self.system.refit_vectorizer()
+        self.assertIsNot(self.system.vectorizer, vectorizer)
+        self.assertEqual(len(self.system.intent_corpus), before + 1)
+    
+    def test_refit_scheduler_triggers(self):
+        """再学習スケジューラーのトリガーテスト"""
+        self.system.refit_scheduler.stop()
+        self.system.refit_scheduler = RefitScheduler(
+            self.system.refit_vectorizer, every_rows=2, interval_seconds=0,
+            drift_threshold=0.9, background=False
+        )
+        scheduler = self.system.refit_scheduler
+        
+        # 既知の語彙のみの追加では行数の閾値まで再学習しない
+        self.system.learn_from_interaction("こんにちは", "greeting", "こんにちは！", 1.0)
+        self.assertEqual(scheduler.refit_count, 0)
+        self.system.learn_from_interaction("ありがとう", "thanks", "どういたしまして！", 1.0)
+        self.assertEqual(scheduler.refit_count, 1)
+        self.assertEqual(self.system.intent_corpus.pending_rows, 0)
+        self.assertEqual(len(self.system.intent_corpus), 2)
+        
+        # 語彙外の単語が多い場合はドリフト率で再学習
+        self.system.learn_from_interaction("天気予報", "weather", "晴れです。", 1.0)
+        self.assertEqual(scheduler.refit_count, 2)
+        self.assertEqual(self.system.predict_intent("天気予報")[0], "weather")
+    
     def test_database_operations(self):
         """データベース操作テスト"""
         # 会話コンテキストを作成
@@ -174,6 +325,7 @@ database:
         self.system.save_conversation(
             context, "テスト入力", "test_intent", "neutral", 0.8, "テスト応答"
         )
+        self.system.conversation_writer.flush()
         
         # データベースから確認
         conn = sqlite3.connect(self.system.db_path)
@@ -184,6 +336,155 @@ database:
         
         self.assertGreater(count, 0)
     
+    def test_concurrent_writes(self):
+        """複数スレッドからの同時書き込みテスト"""
+        import threading
+        
+        errors = []
+        
+        def write_conversations(session_id):
+            context = ConversationContext(user_id='test_user', session_id=session_id)
+            try:
+                for i in range(20):
+                    self.system.save_conversation(
+                        context, f"入力{i}", "test_intent", "neutral", 0.8, "テスト応答"
+                    )
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=write_conversations, args=(f"session_{n}",))
+                   for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.system.conversation_writer.flush()
+        
+        self.assertEqual(errors, [])
+        
+        # WALモードで全件が書き込まれていることを確認
+        conn = self.system.db.connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        self.assertEqual(count, 160)
+    
+    def test_conversation_writer(self):
+        """ライトビハインド書き込みテスト"""
+        writer = self.system.conversation_writer
+        context = ConversationContext(user_id='test_user', session_id='test_session')
+        
+        for i in range(50):
+            self.system.save_conversation(
+                context, f"入力{i}", "test_intent", "neutral", 0.8, "テスト応答"
+            )
+        
+        # 停止時にキューに残った行もすべて書き込まれる
+        writer.stop()
+        stats = writer.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['written'], 50)
+        self.assertEqual(stats['failed'], 0)
+        self.assertGreater(stats['batches'], 0)
+        self.assertGreaterEqual(stats['max_flush_ms'], stats['avg_flush_ms'])
+        
+        # 停止後は同期的に書き込む
+        self.system.save_conversation(
+            context, "停止後の入力", "test_intent", "neutral", 0.8, "テスト応答"
+        )
+        self.assertEqual(writer.stats()['sync_writes'], 1)
+        
+        conn = self.system.db.connection()
+        count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        self.assertEqual(count, 51)
+    
+    def test_concurrent_sessions(self):
+        """複数セッションの並行処理テスト"""
+        import asyncio
+        import threading
+        import time
+        
+        self.system.session_scheduler = SessionScheduler(
+            max_sessions=2, stage_workers={'stt': 4}
+        )
+        self.system.is_running = True
+        
+        lock = threading.Lock()
+        state = {'running': 0, 'peak': 0}
+        
+        def recognize(session_id):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            time.sleep(0.1)
+            with lock:
+                state['running'] -= 1
+            return "さようなら", 0.9
+        
+        with patch.object(self.system, 'recognize_speech_advanced', side_effect=recognize), \
+             patch.object(self.system, 'predict_intent', return_value=("goodbye", 1.0)), \
+             patch.object(self.system, 'speak_advanced'):
+            asyncio.run(self.system.run_sessions([f"session_{n}" for n in range(4)]))
+        
+        # 同時実行数の上限を守りつつ、すべてのセッションが完了する
+        self.assertEqual(state['peak'], 2)
+        self.assertEqual(self.system.active_sessions, {})
+        self.system.conversation_writer.flush()
+        conn = self.system.db.connection()
+        count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        self.assertEqual(count, 4)
+    
+    def test_cancel_session(self):
+        """セッションのキャンセルテスト"""
+        import asyncio
+        
+        self.system.is_running = True
+        
+        async def run():
+            task = self.system.start_session("session_cancel")
+            await asyncio.sleep(0.2)
+            self.assertIn("session_cancel", self.system.active_sessions)
+            self.assertTrue(self.system.cancel_session("session_cancel"))
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        
+        with patch.object(self.system, 'recognize_speech_advanced', return_value=(None, 0.0)):
+            asyncio.run(run())
+        
+        self.assertEqual(self.system.active_sessions, {})
+        self.assertFalse(self.system.cancel_session("session_cancel"))
+    
+    def test_process_batch(self):
+        """バッチ推論テスト"""
+        self.system.learn_from_interaction("こんにちは", "greeting", "こんにちは！", 1.0)
+        self.system.learn_from_interaction("ありがとう", "thanks", "どういたしまして！", 1.0)
+        
+        texts = ["こんにちは", "ありがとう", "I am very happy!"]
+        results = self.system.process_batch(texts)
+        
+        # 1件ずつの推論と同じ結果になる
+        self.assertEqual(len(results), 3)
+        for text, result in zip(texts, results):
+            intent, confidence = self.system.predict_intent(text)
+            emotion, emotion_confidence = self.system.analyze_emotion(text)
+            self.assertEqual(result.intent, intent)
+            self.assertAlmostEqual(result.intent_confidence, confidence)
+            self.assertEqual(result.emotion, emotion)
+            self.assertAlmostEqual(result.emotion_confidence, emotion_confidence)
+            self.assertGreater(len(result.response), 0)
+        
+        # 指定したコンテキストの履歴が更新される
+        contexts = [ConversationContext(user_id='batch_user', session_id=f"s{n}") for n in range(2)]
+        self.system.process_batch(["こんにちは", "ありがとう"], contexts)
+        self.assertEqual(contexts[0].history[-1].intent, "greeting")
+        self.assertEqual(contexts[1].history[-1].intent, "thanks")
+        
+        with self.assertRaises(ValueError):
+            self.system.process_batch(["こんにちは"], contexts)
+        
+        conn = self.system.db.connection()
+        count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        self.assertEqual(count, 5)
+    
     def test_learn_from_interaction(self):
         """学習機能テスト"""
         # 学習データを追加
@@ -197,6 +498,835 @@ database:
         conn.close()
         
         self.assertGreater(count, 0)
+    
+    def test_learning_store_deduplicates(self):
+        """同じ入力の学習は出現回数と信頼度にまとめるテスト"""
+        before = len(self.system.intent_corpus)
+        self.system.learn_from_interaction("ありがとう", "thanks", "どういたしまして！", 1.0)
+        self.system.learn_from_interaction("ありがとう！", "thanks", "どういたしまして。", 0.5)
+        self.system.learn_from_interaction(" ＡＲＩＧＡＴＯ ", "thanks", "どういたしまして。", 1.0)
+        self.system.learn_from_interaction("arigato", "thanks", "どういたしまして。", 1.0)
+        
+        self.assertEqual(len(self.system.intent_corpus), before + 2)
+        conn = self.system.db.connection()
+        rows = conn.execute(
+            "SELECT input_text, hit_count, confidence, response FROM learning_data ORDER BY id"
+        ).fetchall()
+        self.assertEqual([row[:2] for row in rows], [("ありがとう", 2), (" ＡＲＩＧＡＴＯ ", 2)])
+        self.assertAlmostEqual(rows[0][2], 0.75)
+        self.assertEqual(rows[0][3], "どういたしまして。")
+        self.assertEqual(self.system.learning_store.stats(), {'rows': 2, 'hits': 4})
+        
+        # 意図が異なれば別の行
+        self.system.learn_from_interaction("ありがとう", "greeting", "こんにちは！", 1.0)
+        self.assertEqual(self.system.learning_store.stats()['rows'], 3)
+    
+    def test_learning_store_migration_and_prune(self):
+        """既存のデータベースの移行と保持方針による削除テスト"""
+        self.system.db.close_all()
+        os.unlink("test_conversations.db")
+        
+        # 重複除去以前の形式の学習データ
+        conn = sqlite3.connect("test_conversations.db")
+        conn.execute("""
+            CREATE TABLE learning_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                input_text TEXT NOT NULL,
+                intent TEXT NOT NULL,
+                response TEXT NOT NULL,
+                confidence REAL DEFAULT 1.0,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.executemany(
+            "INSERT INTO learning_data (input_text, intent, response, confidence, created_at) VALUES (?, ?, ?, ?, ?)",
+            [("こんにちは", "greeting", "やあ", 1.0, "2020-01-01 00:00:00"),
+             ("こんにちは。", "greeting", "やあ", 0.5, "2020-01-02 00:00:00"),
+             ("さようなら", "goodbye", "またね", 1.0, "2020-01-01 00:00:00"),
+             ("助けて", "help", "はい", 0.2, "2999-01-01 00:00:00"),
+             ("教えて", "help", "はい", 1.0, "2999-01-01 00:00:00")]
+        )
+        conn.commit()
+        conn.close()
+        
+        self.system.init_database()
+        conn = self.system.db.connection()
+        rows = conn.execute(
+            "SELECT input_text, hit_count, confidence, last_seen FROM learning_data ORDER BY id"
+        ).fetchall()
+        self.assertEqual([row[:2] for row in rows],
+                         [("こんにちは", 2), ("さようなら", 1), ("助けて", 1), ("教えて", 1)])
+        self.assertAlmostEqual(rows[0][2], 0.75)
+        self.assertEqual(rows[0][3], "2020-01-02 00:00:00")
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(learning_data)")}
+        self.assertTrue({"idx_learning_hash_intent", "idx_learning_intent"} <= indexes)
+        self.assertNotIn("idx_learning_hash_intent_migrate", indexes)
+        
+        # 古い行と信頼度の低い行を削除し、残りを上限まで減らす
+        # （出現回数が min_hits 以上の行は max_age_days × min_hits 日まで残す）
+        store = self.system.learning_store
+        conn.execute("UPDATE learning_data SET last_seen = datetime('now', '-45 days') WHERE input_text = 'こんにちは'")
+        self.assertEqual(store.prune(max_age_days=30, min_hits=2, min_confidence=0.5), 2)
+        self.assertEqual(store.prune(max_rows=1), 1)
+        remaining = conn.execute("SELECT input_text FROM learning_data").fetchall()
+        self.assertEqual(remaining, [("こんにちは",)])
+        
+        # 何度も出現した行でも、長く出現していなければ削除する
+        conn.execute("UPDATE learning_data SET hit_count = 5, last_seen = datetime('now', '-400 days')")
+        self.assertEqual(store.prune(max_age_days=180, min_hits=2), 1)
+        self.assertEqual(store.stats()['rows'], 0)
+
+class TestAudioCapture(unittest.TestCase):
+    """常時録音パイプラインのテスト"""
+    
+    def setUp(self):
+        """テスト用のWAVファイルを作成（無音と2つの発話）"""
+        import math
+        import random
+        import struct
+        import wave
+        
+        rate = 16000
+        
+        def noise(seconds):
+            return [random.randint(-30, 30) for _ in range(int(rate * seconds))]
+        
+        def tone(seconds):
+            return [int(3000 * math.sin(2 * math.pi * 440 * i / rate))
+                    for i in range(int(rate * seconds))]
+        
+        samples = noise(0.6) + tone(0.5) + noise(1.0) + tone(0.4) + noise(1.0)
+        
+        self.temp_wav = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+        self.temp_wav.close()
+        with wave.open(self.temp_wav.name, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(rate)
+            wav.writeframes(struct.pack(f"<{len(samples)}h", *samples))
+    
+    def tearDown(self):
+        """テスト後のクリーンアップ"""
+        os.unlink(self.temp_wav.name)
+    
+    def test_detects_utterances_from_file(self):
+        """WAVファイルからの発話区間検出テスト"""
+        pipeline = AudioCapturePipeline.from_config(WaveFileSource(self.temp_wav.name), {})
+        pipeline.start()
+        pipeline.wait(timeout=10)
+        
+        segments = []
+        while True:
+            audio = pipeline.get_utterance(timeout=0)
+            if audio is None:
+                break
+            segments.append(audio)
+        
+        # 2つの発話区間が、プリロールと末尾の無音を含む長さで検出される
+        self.assertEqual(len(segments), 2)
+        durations = [len(a.frame_data) / (a.sample_width * a.sample_rate) for a in segments]
+        self.assertGreater(durations[0], 0.5)
+        self.assertLess(durations[0], 1.7)
+        self.assertGreater(durations[1], 0.4)
+        self.assertEqual(pipeline.dropped, 0)
+    
+    def test_incomplete_source_rejected(self):
+        """read を実装していない入力ソースは生成時にエラーになる"""
+        class IncompleteSource(AudioSource):
+            pass
+        
+        with self.assertRaises(TypeError):
+            IncompleteSource()
+    
+    def test_recognize_speech_from_pipeline(self):
+        """常時録音パイプライン経由の音声認識テスト"""
+        system = AutoResponseSystem()
+        system.start_audio_capture(WaveFileSource(self.temp_wav.name))
+        system.audio_pipeline.wait(timeout=10)
+        
+        with patch.object(system.recognizer, 'recognize_google', return_value="こんにちは"):
+            self.assertEqual(system.recognize_speech(), "こんにちは")
+            self.assertEqual(system.recognize_speech(), "こんにちは")
+            # 発話区間を使い切ったらマイクでの待ち受けに戻る
+            with patch.object(system, 'microphone', side_effect=OSError):
+                self.assertIsNone(system.recognize_speech())
+
+class TestSpeechBackends(unittest.TestCase):
+    """音声認識バックエンドのテスト"""
+    
+    def setUp(self):
+        """テスト用の音声データを作成"""
+        import speech_recognition as sr
+        self.audio = sr.AudioData(b"\0\0" * 1600, 16000, 2)
+    
+    def test_first_result_above_threshold(self):
+        """閾値を超えた最初の結果を採用するテスト"""
+        import time
+        
+        recognizer = ParallelRecognizer([
+            StubBackend("低信頼度", confidence=0.3, name="fast"),
+            StubBackend("高信頼度", confidence=0.9, delay=0.05, name="medium"),
+            StubBackend("遅い結果", confidence=1.0, delay=2.0, name="slow")
+        ], confidence_threshold=0.7)
+        
+        start_time = time.monotonic()
+        result = recognizer.recognize(self.audio, "ja-JP")
+        elapsed = time.monotonic() - start_time
+        recognizer.shutdown()
+        
+        self.assertEqual(result.engine, "medium")
+        self.assertEqual(result.text, "高信頼度")
+        self.assertLess(elapsed, 1.0)
+    
+    def test_timeout_and_best_below_threshold(self):
+        """タイムアウトと閾値未満の結果のテスト"""
+        recognizer = ParallelRecognizer([
+            StubBackend("結果A", confidence=0.4, name="a"),
+            StubBackend("結果B", confidence=0.6, delay=0.05, name="b"),
+            StubBackend("遅い結果", confidence=1.0, delay=1.0, timeout=0.2, name="slow"),
+            StubBackend(None, name="empty")
+        ], confidence_threshold=0.7)
+        
+        # 閾値を超える結果がなければ、タイムアウト内の最も信頼度の高い結果を返す
+        result = recognizer.recognize(self.audio, "ja-JP")
+        recognizer.shutdown()
+        self.assertEqual(result.engine, "b")
+    
+    def test_create_backends(self):
+        """設定からのバックエンド作成テスト"""
+        with self.assertLogs('speech_backends', level='WARNING') as logs:
+            backends = create_backends({
+                'backends': ['stub', 'unknown'],
+                'timeout': 3,
+                'stub': {'text': "こんにちは", 'unused_option': 1}
+            })
+        
+        # 未知のバックエンドはスキップし、対応しない設定項目は警告を出して無視する
+        self.assertEqual(len(backends), 1)
+        self.assertEqual(backends[0].text, "こんにちは")
+        self.assertEqual(backends[0].timeout, 3)
+        self.assertTrue(any("unused_option" in line for line in logs.output))
+    
+    def test_sphinx_model_path(self):
+        """Sphinxは model_path のモデルで認識し、モデルがなければスキップする"""
+        with tempfile.TemporaryDirectory() as model_dir:
+            self.assertEqual(create_backends({'backends': ['sphinx'], 'sphinx': {'model_path': model_dir}}), [])
+            
+            os.mkdir(os.path.join(model_dir, "acoustic-model"))
+            for name in ("language-model.lm.bin", "pronounciation-dictionary.dict"):
+                open(os.path.join(model_dir, name), 'w').close()
+            backend, = create_backends({'backends': ['sphinx'], 'sphinx': {'model_path': model_dir}})
+            backend.recognizer = Mock()
+            backend.recognizer.recognize_sphinx.return_value = "こんにちは"
+            result = backend.recognize(self.audio, "ja-JP")
+        
+        self.assertEqual(result.text, "こんにちは")
+        model = backend.recognizer.recognize_sphinx.call_args.kwargs['language']
+        self.assertEqual(model[0], os.path.join(model_dir, "acoustic-model"))
+    
+    def test_incomplete_backend_rejected(self):
+        """recognize を実装していないバックエンドは生成時にエラーになる"""
+        class IncompleteBackend(RecognizerBackend):
+            name = "incomplete"
+        
+        with self.assertRaises(TypeError):
+            IncompleteBackend()
+
+class FakeSpeechEngine:
+    """単語ごとに started-word を通知する音声合成エンジンのスタブ"""
+    
+    def __init__(self, word_delay=0.01):
+        self.word_delay = word_delay
+        self.callbacks = {}
+        self.spoken = []
+        self.rendered = []
+        self.properties = {'voice': "ja", 'rate': 150, 'volume': 0.8}
+        self._stopped = False
+    
+    def getProperty(self, name):
+        return self.properties[name]
+    
+    def setProperty(self, name, value):
+        self.properties[name] = value
+    
+    def save_to_file(self, text, path):
+        """無音のWAVファイルに合成する"""
+        import wave
+        
+        self.rendered.append(text)
+        with wave.open(path, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(16000)
+            wav.writeframes(b"\0\0" * 1600)
+    
+    def runAndWait(self):
+        pass
+    
+    def connect(self, topic, callback):
+        self.callbacks[topic] = callback
+    
+    def stop(self):
+        self._stopped = True
+    
+    def speak(self, text, emotion="neutral"):
+        """単語ごとに待機しながら再生する（stop で中断）"""
+        import time
+        
+        self._stopped = False
+        words = text.split()
+        for i, word in enumerate(words):
+            self.callbacks['started-word'](None, i, len(word))
+            if self._stopped:
+                return
+            time.sleep(self.word_delay)
+        self.spoken.append(text)
+
+class TestTTSWorker(unittest.TestCase):
+    """音声合成ワーカーのテスト"""
+    
+    def setUp(self):
+        """ワーカーを作成"""
+        self.engine = FakeSpeechEngine()
+        self.worker = TTSWorker(self.engine, self.engine.speak)
+        self.worker.start()
+    
+    def tearDown(self):
+        """ワーカーを停止"""
+        self.worker.stop(drain=False)
+    
+    def test_jobs_run_in_order_without_blocking(self):
+        """キューに追加したジョブが順に再生されるテスト"""
+        import time
+        
+        start_time = time.monotonic()
+        jobs = [self.worker.say(f"応答 {i} です") for i in range(3)]
+        self.assertLess(time.monotonic() - start_time, 0.02)
+        
+        self.assertTrue(jobs[-1].wait(timeout=2))
+        self.assertEqual(self.engine.spoken, [f"応答 {i} です" for i in range(3)])
+        self.assertFalse(any(job.interrupted for job in jobs))
+    
+    def test_interrupt(self):
+        """割り込みで再生中と待機中のジョブが中断されるテスト"""
+        long_job = self.worker.say(" ".join(["長い"] * 200))
+        pending = self.worker.say("次の応答")
+        while not self.worker.is_speaking:
+            pass
+        
+        self.worker.interrupt()
+        self.assertTrue(long_job.wait(timeout=1))
+        self.assertTrue(pending.wait(timeout=1))
+        self.assertTrue(long_job.interrupted)
+        self.assertTrue(pending.interrupted)
+        self.assertEqual(self.engine.spoken, [])
+        
+        # 割り込み後の発話は通常どおり再生される
+        self.assertTrue(self.worker.say("再開").wait(timeout=1))
+        self.assertEqual(self.engine.spoken, ["再開"])
+    
+    def test_stop_timeout(self):
+        """時間内に停止しなければワーカーを動作中のまま残し、二重に起動しない"""
+        import time
+        
+        worker = TTSWorker(self.engine, self.engine.speak, max_queue=1)
+        worker.start()
+        thread = worker._thread
+        try:
+            worker.say(" ".join(["長い"] * 200))
+            while not worker.is_speaking:
+                pass
+            worker.say("待機中")
+            
+            # キューが満杯でも timeout で戻る
+            start_time = time.monotonic()
+            worker.stop(timeout=0.05)
+            self.assertLess(time.monotonic() - start_time, 0.5)
+            self.assertTrue(worker.is_running)
+            worker.start()
+            self.assertIs(worker._thread, thread)
+        finally:
+            worker.stop(drain=False, timeout=2)
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(worker.is_running)
+    
+    def test_idle_jobs(self):
+        """発話の合間に進める処理は発話を優先し、割り込みでは破棄されず、停止時に打ち切られる"""
+        import itertools
+        import time
+        
+        progress = []
+        def steps(count):
+            for i in count:
+                progress.append(i)
+                time.sleep(0.01)
+                yield i
+        
+        long_job = self.worker.say(" ".join(["長い"] * 200))
+        while not self.worker.is_speaking:
+            pass
+        job = self.worker.run_when_idle(steps(range(5)))
+        speech = self.worker.say("応答 です")
+        self.worker.interrupt()
+        self.assertTrue(long_job.wait(timeout=1))
+        self.assertTrue(speech.interrupted)
+        self.assertTrue(job.wait(timeout=1))
+        self.assertFalse(job.interrupted)
+        self.assertEqual(progress, list(range(5)))
+        
+        # 発話が追加されると、処理の途中でも先に再生する
+        progress.clear()
+        job = self.worker.run_when_idle(steps(itertools.count()))
+        while not progress:
+            pass
+        speech = self.worker.say("割り込み です")
+        self.assertTrue(speech.wait(timeout=1))
+        self.assertEqual(self.engine.spoken, ["割り込み です"])
+        self.assertFalse(job.done.is_set())
+        
+        self.worker.stop(timeout=1)
+        self.assertTrue(job.done.is_set())
+        self.assertTrue(job.interrupted)
+    
+    def test_system_speak_returns_immediately(self):
+        """システムの音声出力がワーカー経由で即座に戻るテスト"""
+        system = AutoResponseSystem()
+        system.tts_worker.stop()
+        system.tts_worker = self.worker
+        
+        job = system.speak("こんにちは 元気 です")
+        self.assertIsNotNone(job)
+        self.assertTrue(job.wait(timeout=1))
+        self.assertEqual(self.engine.spoken, ["こんにちは 元気 です"])
+
+class TestTTSAudioCache(unittest.TestCase):
+    """合成音声キャッシュのテスト"""
+    
+    def setUp(self):
+        """一時ディレクトリにキャッシュを作成"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.engine = FakeSpeechEngine()
+        self.player = Mock()
+        self.cache = TTSAudioCache(self.engine, self.temp_dir.name, max_items=2, player=self.player)
+    
+    def tearDown(self):
+        """一時ディレクトリを削除"""
+        self.temp_dir.cleanup()
+    
+    def test_memory_and_disk_tiers(self):
+        """メモリ・ディスクの各段からの取得テスト"""
+        first = self.cache.get_or_render("こんにちは")
+        self.assertEqual(self.cache.get_or_render("こんにちは"), first)
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+        self.assertEqual(self.engine.rendered, ["こんにちは"])
+        
+        # LRUから追い出されてもディスクから読み込む
+        self.cache.get_or_render("ありがとう")
+        self.cache.get_or_render("さようなら")
+        self.assertEqual(self.cache.get_or_render("こんにちは"), first)
+        self.assertEqual(self.cache.disk_hits, 1)
+        
+        # 別のインスタンスからもディスクの音声を再利用する
+        cache = TTSAudioCache(self.engine, self.temp_dir.name)
+        self.assertIsNotNone(cache.get_or_render("ありがとう"))
+        self.assertEqual(cache.misses, 0)
+        self.assertEqual(len(self.engine.rendered), 3)
+    
+    def test_key_depends_on_voice_settings(self):
+        """音声設定ごとにキャッシュが分かれるテスト"""
+        key = self.cache.key("こんにちは", "neutral")
+        self.assertNotEqual(key, self.cache.key("こんにちは", "positive"))
+        self.engine.setProperty('rate', 160)
+        self.assertNotEqual(key, self.cache.key("こんにちは", "neutral"))
+    
+    def test_warm_up_and_play(self):
+        """ウォームアップ後は合成せずに再生するテスト"""
+        rates = {"neutral": 150, "positive": 160}
+        items = [("こんにちは", "neutral"), ("素晴らしいですね！", "positive")]
+        prepare = lambda emotion: self.engine.setProperty('rate', rates[emotion])
+        
+        self.assertEqual(self.cache.warm_up(items, prepare), 2)
+        self.assertEqual(self.cache.warm_up(items, prepare), 0)
+        
+        self.engine.setProperty('rate', 160)
+        self.assertTrue(self.cache.play("素晴らしいですね！", "positive"))
+        self.player.play.assert_called_once()
+        self.assertEqual(len(self.engine.rendered), 2)
+    
+    def test_only_templates_are_cached(self):
+        """定型文以外は合成・保存せずにエンジンでの再生に任せる"""
+        self.cache.set_templates(["こんにちは"])
+        self.assertFalse(self.cache.play("今日は15時に会議があります"))
+        self.assertEqual(self.engine.rendered, [])
+        self.assertTrue(self.cache.play("こんにちは"))
+        self.assertEqual(self.engine.rendered, ["こんにちは"])
+    
+    def test_disk_limit(self):
+        """ディスク上のファイル数の上限を超えたら最終利用の古い順に削除"""
+        cache = TTSAudioCache(self.engine, self.temp_dir.name, player=self.player, max_disk_items=2)
+        for i, text in enumerate(["一", "二", "三"]):
+            cache.get_or_render(text)
+            path = cache._path(cache.key(text))
+            os.utime(path, (i, i))
+        
+        files = sorted(os.listdir(self.temp_dir.name))
+        self.assertEqual(len(files), 2)
+        self.assertNotIn(f"{cache.key('一')}.wav", files)
+
+class TestConversationLog(unittest.TestCase):
+    """会話ログ（JSON Lines）のテスト"""
+    
+    def setUp(self):
+        """一時ディレクトリを作成"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "log.jsonl")
+    
+    def tearDown(self):
+        """一時ディレクトリを削除"""
+        self.temp_dir.cleanup()
+    
+    def test_buffered_flush(self):
+        """件数と経過時間によるフラッシュのテスト"""
+        import time
+        
+        writer = JsonLinesWriter(self.path, buffer_records=3, flush_interval=0.05)
+        writer.write({'n': 0})
+        writer.write({'n': 1})
+        self.assertFalse(os.path.exists(self.path))
+        writer.write({'n': 2})
+        self.assertEqual(writer.written, 3)
+        
+        writer.write({'n': 3})
+        time.sleep(0.3)
+        self.assertEqual([r['n'] for r in read_records(self.path)], [0, 1, 2, 3])
+        writer.close()
+    
+    def test_rotation_and_compression(self):
+        """ローテーション・圧縮・世代数の上限と逐次読み出しのテスト"""
+        writer = JsonLinesWriter(self.path, buffer_records=1, max_bytes=200, backup_count=3)
+        for i in range(30):
+            writer.write({'n': i, 'text': "会話ログ"})
+        writer.close()
+        
+        segments = writer.segments()
+        self.assertGreater(writer.rotations, 3)
+        self.assertEqual(len(segments), 3)
+        self.assertTrue(all(p.name.endswith(".jsonl.gz") for p in segments))
+        
+        # 削除された古い世代を除き、順序どおりに読み出せる
+        numbers = [r['n'] for r in read_records(self.path)]
+        self.assertEqual(numbers, list(range(numbers[0], 30)))
+        
+        # 異常終了で途中まで書かれた行は読み飛ばす
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"n": 30, "te')
+        self.assertEqual([r['n'] for r in read_records(self.path, include_rotated=False)][-1], 29)
+        
+        # 圧縮済みのファイルと圧縮前のファイルが同時に存在しても重複して読み出さない
+        with gzip.open(segments[-1], 'rb') as f:
+            plain = segments[-1].with_name(segments[-1].name[:-len(".gz")])
+            plain.write_bytes(f.read())
+        self.assertEqual(writer.segments(), segments)
+        self.assertEqual([r['n'] for r in read_records(self.path)], numbers)
+
+class TestLoggingSetup(unittest.TestCase):
+    """ログ出力設定のテスト"""
+    
+    def setUp(self):
+        """カテゴリのロガーに記録用のハンドラーを追加"""
+        import logging
+        
+        self.records = []
+        self.logger = category_logger("test")
+        self.handler = logging.Handler()
+        self.handler.emit = self.records.append
+        self.logger.addHandler(self.handler)
+    
+    def tearDown(self):
+        """ハンドラーと設定を元に戻す"""
+        self.logger.removeHandler(self.handler)
+        configure_categories({"test": 1.0})
+    
+    def test_sampling_and_disable(self):
+        """カテゴリごとの間引きと無効化のテスト"""
+        configure_categories({"test": 0.25})
+        for i in range(8):
+            self.logger.info("記録 %d", i)
+        self.assertEqual([r.getMessage() for r in self.records], ["記録 0", "記録 4"])
+        
+        # 無効化したカテゴリはレコード自体を作成しない
+        configure_categories({"test": False})
+        self.assertFalse(self.logger.isEnabledFor(20))
+        
+        configure_categories({"test": True})
+        self.logger.info("記録")
+        self.assertEqual(len(self.records), 3)
+
+class TestMetrics(unittest.TestCase):
+    """処理段階ごとの計測のテスト"""
+    
+    def test_stage_latency(self):
+        """分位点・カウンター・ゲージのテスト"""
+        registry = MetricsRegistry()
+        for i in range(1, 101):
+            registry.observe("nlp", i / 1000)
+        
+        with self.assertRaises(RuntimeError):
+            with registry.timed("db"):
+                self.assertEqual(registry.snapshot()['stages']['db']['in_flight'], 1)
+                raise RuntimeError("失敗")
+        
+        stages = registry.snapshot()['stages']
+        self.assertAlmostEqual(stages['nlp']['p50_ms'], 50, delta=50 * 0.2)
+        self.assertAlmostEqual(stages['nlp']['p99_ms'], 99, delta=99 * 0.2)
+        self.assertEqual(stages['nlp']['max_ms'], 100)
+        self.assertEqual((stages['db']['calls'], stages['db']['errors'], stages['db']['in_flight']), (1, 1, 0))
+        
+        text = registry.to_prometheus()
+        self.assertIn('auto_response_stage_latency_seconds_count{stage="nlp"} 100', text)
+        self.assertIn('auto_response_stage_latency_seconds_bucket{stage="nlp",le="+Inf"} 100', text)
+        self.assertIn('auto_response_stage_errors_total{stage="db"} 1', text)
+    
+    def test_exporter(self):
+        """HTTPエンドポイントとJSON出力のテスト"""
+        import json
+        import urllib.request
+        
+        registry = MetricsRegistry()
+        registry.observe("tts", 0.2)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            json_path = os.path.join(temp_dir, "metrics.json")
+            exporter = MetricsExporter(registry, port=0, json_path=json_path, interval=60)
+            exporter.start()
+            try:
+                url = f"http://127.0.0.1:{exporter.server_address[1]}/metrics"
+                with urllib.request.urlopen(url, timeout=5) as response:
+                    self.assertIn('stage="tts"', response.read().decode('utf-8'))
+            finally:
+                exporter.stop()
+            
+            # 停止時に最後の計測値を書き出す
+            with open(json_path, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['stages']['tts']['calls'], 1)
+
+class TestConversationHistory(unittest.TestCase):
+    """会話履歴のテスト"""
+    
+    def test_bounded_history(self):
+        """上限を超えたレコードの退避と直近の意図の検索テスト"""
+        evicted = []
+        history = ConversationHistory(maxlen=5, recent_window=3, on_evict=evicted.append)
+        
+        for i in range(8):
+            intent = "greeting" if i < 4 else "thanks"
+            history.append(HistoryRecord(f"入力{i}", intent, "応答", "neutral"))
+        
+        self.assertEqual(len(history), 5)
+        self.assertEqual(history.total, 8)
+        self.assertEqual([r.user_input for r in evicted], ["入力0", "入力1", "入力2"])
+        self.assertEqual(history[0].user_input, "入力3")
+        self.assertEqual(history.last().user_input, "入力7")
+        
+        # 直近3件はすべて thanks
+        self.assertTrue(history.has_recent_intent("thanks"))
+        self.assertFalse(history.has_recent_intent("greeting"))
+        
+        # ラベルはインターンされ、辞書変換では時刻がISO形式になる
+        self.assertIs(history[1].intent, history[2].intent)
+        self.assertIn("T", history.to_dicts()[-1]['timestamp'])
+
+class TestIntentIndex(unittest.TestCase):
+    """意図予測の近似最近傍インデックスのテスト"""
+    
+    def setUp(self):
+        """テスト前の準備"""
+        words = ["今日", "明日", "天気", "仕事", "会議", "予定", "資料", "電話", "注文", "料金"]
+        self.texts = [f"{words[i % 10]} {words[(i * 3 + 1) % 10]} 語{i}" for i in range(400)]
+        self.intents = [f"intent{i % 5}" for i in range(400)]
+        self.vectorizer = TfidfVectorizer().fit(self.texts)
+    
+    def test_candidates_and_persistence(self):
+        """候補の検索、追加、保存と読み込みテスト"""
+        corpus = IntentCorpus(self.vectorizer, tuple(self.texts[:300]), tuple(self.intents[:300]))
+        corpus.index = IntentIndex.build(corpus.matrix, tables=4, bits=10, fingerprint="v1")
+        for text, intent in zip(self.texts[300:], self.intents[300:]):
+            corpus.add(text, intent)
+        self.assertEqual(len(corpus.index), 400)
+        
+        # 1件ずつのベクトル化は transform と一致する
+        columns, weights = corpus.vectorize(self.texts[0])
+        expected = self.vectorizer.transform([self.texts[0]])
+        self.assertEqual(sorted(zip(columns, weights)), sorted(zip(expected.indices, expected.data)))
+        
+        # 学習データと同じテキストは、追加した行も含めて候補に入る
+        for row in (10, 350):
+            self.assertIn(row, corpus.index.candidates(*corpus.vectorize(self.texts[row])))
+            self.assertEqual(corpus.best_match(self.texts[row]),
+                             corpus.best_match(self.texts[row], exact=True))
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "index.npz")
+            corpus.index.save(path)
+            n_features = corpus.matrix.shape[1]
+            loaded = IntentIndex.load(path, n_features, "v1", tables=4, bits=10)
+            self.assertEqual(len(loaded), 400)
+            query = corpus.vectorize(self.texts[350])
+            self.assertEqual(list(loaded.candidates(*query)), list(corpus.index.candidates(*query)))
+            
+            # 学習データやパラメーターが異なれば再利用しない
+            self.assertIsNone(IntentIndex.load(path, n_features, "v2", tables=4, bits=10))
+            self.assertIsNone(IntentIndex.load(path, n_features, "v1", tables=4, bits=12))
+    
+    def test_exact_fallback(self):
+        """候補がない場合の全件検索テスト"""
+        corpus = IntentCorpus(self.vectorizer, tuple(self.texts), tuple(self.intents))
+        # 空のインデックスでは候補が見つからず、全件検索の結果を返す
+        corpus.index = IntentIndex(corpus.matrix.shape[1], tables=2, bits=8)
+        self.assertEqual(corpus.best_match(self.texts[42]), (self.intents[42], 1.0))
+        self.assertEqual(corpus.best_match("未知の語"), (self.intents[0], 0.0))
+
+class TestResponseCatalog(unittest.TestCase):
+    """応答カタログのテスト"""
+    
+    CATALOG = """
+default_language: "ja"
+languages:
+  ja:
+    emotion_prefixes:
+      positive: "いいですね！"
+    follow_up: " ほかにありますか？"
+    intents:
+      greeting:
+        - text: "こんにちは"
+          weight: 9
+        - text: "やあ"
+          weight: 1
+      default:
+        - "なるほど"
+"""
+
+    def setUp(self):
+        """一時的なカタログファイルを作成"""
+        import random
+        
+        self.temp_file = tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False,
+                                                     encoding='utf-8')
+        self.temp_file.write(self.CATALOG)
+        self.temp_file.close()
+        self.catalog = ResponseCatalog(self.temp_file.name, reload_interval=0,
+                                       rng=random.Random(0))
+    
+    def tearDown(self):
+        """一時ファイルを削除"""
+        os.unlink(self.temp_file.name)
+    
+    def test_variants(self):
+        """感情・文脈・言語ごとの応答の組み立てテスト"""
+        self.catalog.randomize = False
+        self.assertEqual(self.catalog.choose("greeting"), "こんにちは")
+        self.assertEqual(self.catalog.choose("greeting", "positive"), "いいですね！ こんにちは")
+        self.assertEqual(self.catalog.choose("greeting", "negative", follow_up=True),
+                         "こんにちは ほかにありますか？")
+        # 未知の意図・言語はデフォルトの応答と言語を使う
+        self.assertEqual(self.catalog.choose("unknown", language="fr"), "なるほど")
+    
+    def test_weighted_sampling(self):
+        """重み付きの応答選択テスト"""
+        from collections import Counter
+        
+        counts = Counter(self.catalog.choose("greeting") for _ in range(2000))
+        self.assertEqual(set(counts), {"こんにちは", "やあ"})
+        self.assertAlmostEqual(counts["こんにちは"] / 2000, 0.9, delta=0.03)
+    
+    def test_hot_reload(self):
+        """ファイル変更時の再読み込みテスト"""
+        with open(self.temp_file.name, 'a', encoding='utf-8') as f:
+            f.write('''
+  en:
+    intents:
+      default:
+        - "I see"
+''')
+        os.utime(self.temp_file.name, (0, os.stat(self.temp_file.name).st_mtime + 1))
+        self.assertEqual(self.catalog.choose("help", language="en"), "I see")
+        self.assertEqual(self.catalog.languages, ["en", "ja"])
+        
+        # 不正な内容に変更された場合は以前の内容を使い続ける
+        with open(self.temp_file.name, 'w', encoding='utf-8') as f:
+            f.write("languages: {ja: {intents: {}}}")
+        os.utime(self.temp_file.name, (0, os.stat(self.temp_file.name).st_mtime + 2))
+        self.assertEqual(self.catalog.choose("help", language="en"), "I see")
+        self.assertEqual(self.catalog.reload_count, 2)
+
+class TestStartupProfile(unittest.TestCase):
+    """起動時間の計測と遅延読み込みのテスト"""
+    
+    def test_import_does_not_load_heavy_modules(self):
+        """モジュールの読み込みだけでは音声・数値計算・機械学習のライブラリを読み込まない"""
+        code = (
+            "import sys; before = set(sys.modules); import advanced_auto_response; "
+            "print('\\n'.join(sorted(set(sys.modules) - before)))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, timeout=120,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        loaded = {name.split('.')[0] for name in result.stdout.split()}
+        for heavy in ('speech_recognition', 'pyttsx3', 'pyaudio', 'numpy', 'scipy', 'sklearn', 'nltk'):
+            self.assertNotIn(heavy, loaded)
+    
+    def test_lazy_module_and_budget(self):
+        """初回参照時のインポートと予算の確認"""
+        profile = StartupProfile()
+        profile.record("import", "a", 0.2)
+        profile.record("import", "b", 0.1)
+        self.assertAlmostEqual(profile.total("import"), 0.3)
+        self.assertTrue(profile.check_budget(500))
+        with self.assertLogs('startup_profile', level='WARNING') as logs:
+            self.assertFalse(profile.check_budget(100))
+        self.assertIn("a 200ms", logs.output[0])
+        self.assertIn("import", profile.report())
+        
+        module = lazy_import('colorsys')
+        self.assertEqual(module.rgb_to_hsv(0, 0, 0), (0, 0, 0))
+        self.assertTrue(module.is_loaded)
+        self.assertIn('colorsys', PROFILE.loaded("lazy_import"))
+
+class TestBenchmark(unittest.TestCase):
+    """ベンチマークのテスト"""
+    
+    def test_results_and_baseline(self):
+        """結果の保存と基準値との比較"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with BenchmarkHarness(temp_dir, iterations=5, warmup=1,
+                                  benchmarks=["build_corpus", "predict_intent", "db_write"]) as harness:
+                results = harness.run([200])
+            
+            self.assertEqual([r.key for r in results],
+                             ["build_corpus@200", "predict_intent@200", "db_write@200"])
+            predict = results[1]
+            self.assertEqual(predict.iterations, 5)
+            self.assertLessEqual(predict.min_ms, predict.median_ms)
+            self.assertLessEqual(predict.median_ms, predict.p99_ms)
+            
+            path = os.path.join(temp_dir, "baseline.json")
+            save_baseline(results, path)
+            with open(path, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            self.assertEqual(compare(results, baseline), [])
+            
+            # 基準値より大幅に遅ければ性能低下として報告する
+            baseline['results']["predict_intent@200"]['median_ms'] = predict.median_ms / 2
+            regressions = compare(results, baseline, threshold=0.2)
+            self.assertEqual(len(regressions), 1)
+            self.assertTrue(regressions[0].startswith("predict_intent@200"))
+    
+    def test_rejects_zero_iterations(self):
+        """計測回数が0の場合は引数の解析時にエラーにする"""
+        with patch('sys.stderr'), self.assertRaises(SystemExit):
+            parse_args(['--iterations', '0'])
+        self.assertEqual(parse_args(['--iterations', '1', '--warmup', '0']).iterations, 1)
 
 class TestIntegration(unittest.TestCase):
     """統合テスト"""
@@ -204,6 +1334,10 @@ class TestIntegration(unittest.TestCase):
     def test_basic_system_integration(self):
         """基本システムの統合テスト"""
         system = AutoResponseSystem()
+        temp_dir = tempfile.TemporaryDirectory()
+        system.conversation_log = JsonLinesWriter(os.path.join(temp_dir.name, "log.jsonl"))
+        self.addCleanup(temp_dir.cleanup)
+        self.addCleanup(system.conversation_log.close)
         
         # 意図分析と応答生成の統合テスト
         test_cases = [
@@ -243,6 +1377,7 @@ database:
 """)
         temp_config.close()
         
+        system = None
         try:
             system = AdvancedAutoResponseSystem(temp_config.name)
             
@@ -261,75 +1396,13 @@ database:
             
         finally:
             # クリーンアップ
+            if system is not None:
+                system.refit_scheduler.stop()
+                system.db.close_all()
             os.unlink(temp_config.name)
             if os.path.exists("test_integration.db"):
                 os.unlink("test_integration.db")
 
-def run_performance_test():
-    """パフォーマンステスト"""
-    import time
-    
-    print("=== パフォーマンステスト ===")
-    
-    # 基本システムのテスト
-    print("基本システムのテスト...")
-    system = AutoResponseSystem()
-    
-    test_texts = [
-        "こんにちは", "ありがとう", "助けて", "さようなら", "何ですか？",
-        "おはよう", "お疲れ様", "またね", "困っています", "教えて"
-    ]
-    
-    start_time = time.time()
-    for text in test_texts:
-        intent = system.analyze_intent(text)
-        response = system.generate_response(text, intent)
-    end_time = time.time()
-    
-    print(f"基本システム処理時間: {end_time - start_time:.4f}秒")
-    print(f"1回あたりの平均時間: {(end_time - start_time) / len(test_texts):.4f}秒")
-    
-    # 高度システムのテスト
-    print("\n高度システムのテスト...")
-    temp_config = tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False)
-    temp_config.write("""
-speech:
-  language: "ja-JP"
-  timeout: 5
-  phrase_time_limit: 10
-tts:
-  rate: 150
-  volume: 0.8
-  voice: "japanese"
-ml:
-  model_path: "models/"
-  confidence_threshold: 0.7
-database:
-  path: "test_performance.db"
-""")
-    temp_config.close()
-    
-    try:
-        advanced_system = AdvancedAutoResponseSystem(temp_config.name)
-        
-        # 学習データを追加
-        for text in test_texts:
-            advanced_system.learn_from_interaction(text, "test_intent", "test_response", 1.0)
-        
-        start_time = time.time()
-        for text in test_texts:
-            intent, confidence = advanced_system.predict_intent(text)
-            emotion, emotion_conf = advanced_system.analyze_emotion(text)
-        end_time = time.time()
-        
-        print(f"高度システム処理時間: {end_time - start_time:.4f}秒")
-        print(f"1回あたりの平均時間: {(end_time - start_time) / len(test_texts):.4f}秒")
-        
-    finally:
-        os.unlink(temp_config.name)
-        if os.path.exists("test_performance.db"):
-            os.unlink("test_performance.db")
-
 if __name__ == "__main__":
     print("=== 自動認識・自動応答システム テストスイート ===")
     print()
@@ -340,7 +1413,8 @@ if __name__ == "__main__":
     
     print("\n" + "="*50)
     
-    # パフォーマンステストを実行
-    run_performance_test()
+    # ベンチマークを実行（性能低下があれば終了コードで通知）
+    status = run_benchmarks(['--rows', '1000', '--iterations', '50'])
     
     print("\nテスト完了！")
+    sys.exit(status)
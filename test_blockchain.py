@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ブロックチェーンのテストスクリプト
+"""
+
+import unittest
+import copy
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+from unittest.mock import Mock, patch
+
+# テスト対象のモジュールをインポート
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import blockchain_mining
+from balance_index import BalanceIndex
+from blockchain_mining import MAX_DIFFICULTY, ParallelMiner, difficulty_target, meets_target, search_nonce
+from blockchain_samples import Block, Blockchain, Transaction
+from chain_validator import ChainValidator
+from merkle_tree import EMPTY_ROOT, MerkleProof, MerkleTree, hash_pair, merkle_root, verify_proof
+
+def make_block(index: int = 1, transactions: int = 3, previous_hash: str = "0" * 64) -> Block:
+    """テスト用のブロック（マイニング前）"""
+    return Block(
+        index=index,
+        timestamp=1700000000.0 + index,
+        transactions=[Transaction(f"user{i}", f"user{i + 1}", float(i + 1), 1700000000.0 + i)
+                      for i in range(transactions)],
+        previous_hash=previous_hash
+    )
+
+class TestDifficulty(unittest.TestCase):
+    """難易度と目標値のテスト"""
+    
+    def test_target_matches_leading_zeros(self):
+        """先頭 difficulty 桁が0のハッシュだけが条件を満たす"""
+        self.assertEqual(difficulty_target(1), 1 << 252)
+        self.assertTrue(meets_target("0" + "f" * 63, 1))
+        self.assertFalse(meets_target("1" + "0" * 63, 1))
+        self.assertTrue(meets_target("000" + "f" * 61, 3))
+        self.assertFalse(meets_target("00" + "1" + "0" * 61, 3))
+        self.assertEqual(difficulty_target(MAX_DIFFICULTY), 1)
+        self.assertTrue(meets_target("0" * 64, MAX_DIFFICULTY))
+        self.assertFalse(meets_target("0" * 63 + "1", MAX_DIFFICULTY))
+    
+    def test_out_of_range_rejected(self):
+        """範囲外の難易度はエラー"""
+        for difficulty in (0, -1, MAX_DIFFICULTY + 1, 2.5):
+            with self.assertRaises(ValueError):
+                difficulty_target(difficulty)
+        with self.assertRaises(ValueError):
+            Blockchain(difficulty=0)
+
+class TestParallelMiner(unittest.TestCase):
+    """ナンスの探索と並列マイニングのテスト"""
+    
+    def test_search_nonce_finds_first_valid_nonce(self):
+        """探索結果は区間内で最初に条件を満たすナンスと一致する"""
+        header = make_block().header_prefix()
+        target = difficulty_target(2)
+        expected = next(
+            (nonce, digest) for nonce in range(10, 100000)
+            for digest in [hashlib.sha256(header + str(nonce).encode()).hexdigest()]
+            if int(digest, 16) < target
+        )
+        nonce, digest, attempts = search_nonce(header, target, 10, 100000)
+        self.assertEqual((nonce, digest), expected)
+        self.assertEqual(attempts, nonce - 10 + 1)
+        
+        # 見つからなければ区間全体を試行した回数を返す
+        self.assertEqual(search_nonce(header, 0, 0, 5000), (None, None, 5000))
+    
+    def test_search_nonce_stops_when_cancelled(self):
+        """打ち切りの通知があれば探索を始めずに終える"""
+        event = threading.Event()
+        event.set()
+        with patch.object(blockchain_mining, '_cancel_event', event):
+            self.assertEqual(search_nonce(b"header", 0, 0, 10 ** 9), (None, None, 0))
+    
+    def test_parallel_mining(self):
+        """並列マイニングで有効なナンスを見つけ、プロセスプールを使い回す"""
+        with ParallelMiner(workers=2, chunk_size=2000) as miner:
+            for index in (1, 2):
+                block = make_block(index)
+                result = miner.mine(block, 3)
+                self.assertEqual(block.nonce, result.nonce)
+                self.assertEqual(block.hash, block.calculate_hash())
+                self.assertTrue(block.hash.startswith("000"))
+                self.assertGreaterEqual(result.attempts, result.nonce)
+                self.assertFalse(miner._cancel_event.is_set())
+            self.assertIs(miner.last_result, result)
+    
+    def test_cancel_stops_running_search(self):
+        """打ち切ると実行中の探索も途中で終わる"""
+        with ParallelMiner(workers=1) as miner:
+            future = miner._get_executor().submit(search_nonce, b"header", 0, 0, 10 ** 9)
+            # ワーカーが探索を始めるまで待つ
+            while not future.running():
+                time.sleep(0.01)
+            time.sleep(0.1)
+            attempts = miner._cancel([future])
+            self.assertTrue(future.done())
+            self.assertLess(attempts, 10 ** 9)
+            self.assertEqual(future.result()[:2], (None, None))
+
+class TestMerkleTree(unittest.TestCase):
+    """マークルツリーと包含証明のテスト"""
+    
+    def setUp(self):
+        """テスト用の葉"""
+        self.leaves = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(5)]
+    
+    def test_odd_leaf_is_promoted(self):
+        """奇数個の段では最後のノードを複製せずに上の段に上げる"""
+        nodes = [bytes.fromhex(leaf) for leaf in self.leaves[:3]]
+        expected = hash_pair(hash_pair(nodes[0], nodes[1]), nodes[2]).hex()
+        self.assertEqual(merkle_root(self.leaves[:3]), expected)
+        self.assertNotEqual(merkle_root(self.leaves[:3]), merkle_root(self.leaves[:3] + self.leaves[2:3]))
+        self.assertEqual(merkle_root(self.leaves[:1]), self.leaves[0])
+        self.assertEqual(merkle_root([]), EMPTY_ROOT)
+    
+    def test_proof_round_trip(self):
+        """すべての葉の包含証明が辞書形式を経由しても検証できる"""
+        tree = MerkleTree(self.leaves)
+        for index in range(len(self.leaves)):
+            proof = MerkleProof.from_dict(json.loads(json.dumps(tree.proof(index).to_dict())))
+            self.assertEqual(proof, tree.proof(index))
+            self.assertTrue(verify_proof(proof, tree.root))
+        # 兄弟のない段は証明に含まない
+        self.assertEqual(len(tree.proof(4).siblings), 1)
+        
+        forged = MerkleProof(self.leaves[1], 0, tree.proof(0).siblings)
+        self.assertFalse(verify_proof(forged, tree.root))
+        self.assertFalse(verify_proof(MerkleProof("xyz", 0, ()), tree.root))
+        with self.assertRaises(IndexError):
+            tree.proof(5)
+    
+    def test_block_caches_tree(self):
+        """ブロックはツリーをキャッシュし、トランザクションの変更時だけ作り直す"""
+        block = make_block(transactions=5)
+        tree = block.merkle_tree()
+        with patch.object(Transaction, 'calculate_hash', side_effect=AssertionError):
+            self.assertIs(block.merkle_tree(), tree)
+            self.assertTrue(verify_proof(block.transaction_proof(3), block.merkle_root()))
+        
+        block.transactions = block.transactions[:2]
+        self.assertEqual(len(block.merkle_tree()), 2)
+        
+        # その場での書き換えは明示的に破棄する
+        root = block.merkle_root()
+        block.transactions[0].amount = 1000.0
+        self.assertEqual(block.merkle_root(), root)
+        block.invalidate_merkle_tree()
+        self.assertNotEqual(block.merkle_root(), root)
+    
+    def test_block_hash_uses_current_transactions(self):
+        """ブロックのハッシュはキャッシュによらず現在のトランザクションから計算する"""
+        block = make_block()
+        block.mine_block(1)
+        self.assertEqual(block.hash, block.calculate_hash())
+        block.transactions[0].amount = 1000.0
+        self.assertNotEqual(block.hash, block.calculate_hash())
+
+def make_branch(base, start: int, length: int, tag: str) -> list:
+    """base[:start] に length 個のブロックを続けたチェーン（ハッシュは tag で区別する）"""
+    chain = list(base[:start])
+    for index in range(start, start + length):
+        block = Block(index, float(index), [Transaction("0", f"{tag}{index % 3}", 10.0 * index, float(index)),
+                                            Transaction(f"{tag}{index % 3}", "shop", 1.5, float(index))],
+                      chain[-1].hash if chain else "0")
+        block.hash = f"{tag}-{index}"
+        chain.append(block)
+    return chain
+
+def scan_balances(chain) -> dict:
+    """チェーン全体を走査して計算した残高"""
+    balances = {}
+    for block in chain:
+        for tx in block.transactions:
+            balances[tx.sender] = balances.get(tx.sender, 0.0) - tx.amount
+            balances[tx.recipient] = balances.get(tx.recipient, 0.0) + tx.amount
+    return balances
+
+class TestBalanceIndex(unittest.TestCase):
+    """残高インデックスのテスト"""
+    
+    def setUp(self):
+        """分岐する2本のチェーン"""
+        self.main = make_branch([], 0, 6, "a")
+        self.fork = make_branch(self.main, 3, 5, "b")
+    
+    def test_sync_follows_fork(self):
+        """分岐点まで巻き戻して新しいブロックを適用する"""
+        index = BalanceIndex()
+        self.assertEqual(index.sync(self.main), 6)
+        self.assertEqual(index.sync(self.main), 0)
+        self.assertEqual(index.balances, scan_balances(self.main))
+        
+        self.assertEqual(index.sync(self.fork), 5)
+        self.assertEqual(index.block_hashes, [block.hash for block in self.fork])
+        self.assertEqual(index.balances, scan_balances(self.fork))
+        # 分岐後のブロックだけに出てくるアドレスは巻き戻すと消える
+        self.assertIn("b0", index.balances)
+        index.sync(self.main)
+        self.assertNotIn("b0", index.balances)
+        self.assertEqual(index.get_many(["a0", "nobody"]),
+                         {"a0": scan_balances(self.main)["a0"], "nobody": 0.0})
+    
+    def test_deep_fork_rebuilds(self):
+        """巻き戻し用の情報より深い分岐はチェーンの先頭から作り直す"""
+        index = BalanceIndex(max_undo=2)
+        index.sync(self.main)
+        with self.assertRaises(ValueError):
+            index.rollback(3)
+        self.assertEqual(index.sync(self.fork), len(self.fork))
+        self.assertEqual(index.balances, scan_balances(self.fork))
+    
+    def test_snapshot_after_fork(self):
+        """分岐後に保存したスナップショットから続きを反映できる"""
+        index = BalanceIndex()
+        index.sync(self.main)
+        index.sync(self.fork)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "balances.json")
+            index.save(path)
+            self.assertEqual(os.listdir(temp_dir), ["balances.json"])
+            restored = BalanceIndex.load(path)
+        self.assertEqual(restored.snapshot(), index.snapshot())
+        
+        longer = make_branch(self.fork, len(self.fork), 2, "b")
+        self.assertEqual(restored.sync(longer), 2)
+        self.assertEqual(restored.balances, scan_balances(longer))
+        # スナップショットより前の分岐点へは巻き戻せないため作り直す
+        self.assertEqual(restored.sync(self.main), len(self.main))
+        self.assertEqual(restored.balances, scan_balances(self.main))
+
+def make_chain(length: int, difficulty: int = 1) -> list:
+    """マイニング済みのブロックを連結したチェーン"""
+    chain = []
+    for index in range(length):
+        block = make_block(index, transactions=2, previous_hash=chain[-1].hash if chain else "0")
+        block.mine_block(difficulty)
+        chain.append(block)
+    return chain
+
+class WorkerCrash:
+    """ワーカープロセスで復元するとプロセスを終了させるオブジェクト"""
+    
+    def __reduce__(self):
+        return os._exit, (1,)
+
+class TestChainValidator(unittest.TestCase):
+    """チェーンの差分・並列検証のテスト"""
+    
+    @classmethod
+    def setUpClass(cls):
+        """ログを抑えてテスト用のチェーンを作成"""
+        logging.disable(logging.CRITICAL)
+        cls.template = make_chain(40)
+    
+    @classmethod
+    def tearDownClass(cls):
+        logging.disable(logging.NOTSET)
+    
+    def setUp(self):
+        """テストごとにチェーンを複製"""
+        self.chain = copy.deepcopy(self.template)
+        self.validator = ChainValidator(workers=1)
+    
+    def tearDown(self):
+        self.validator.close()
+    
+    def test_reports_first_invalid_block(self):
+        """無効な段階と最初に無効になる高さを返す"""
+        report = self.validator.validate(self.chain, 1)
+        self.assertTrue(report.valid)
+        self.assertEqual((report.length, report.checked_from), (40, 0))
+        
+        cases = [
+            (lambda chain: setattr(chain[12], 'previous_hash', "f" * 64), 12, "linkage"),
+            (lambda chain: setattr(chain[15], 'index', 99), 15, "linkage"),
+            (lambda chain: setattr(chain[20], 'nonce', chain[20].nonce + 1), 20, "hash"),
+            (lambda chain: setattr(chain[25], 'hash', chain[25].calculate_hash()), None, None),
+        ]
+        for tamper, height, stage in cases:
+            chain = copy.deepcopy(self.template)
+            tamper(chain)
+            report = ChainValidator(workers=1).validate(chain, 1, full=True)
+            self.assertEqual((report.first_invalid_height, report.stage), (height, stage))
+            self.assertEqual(report.valid, height is None)
+        
+        # ハッシュは正しいが難易度を満たさないブロック（次のブロックの連結より先に報告する）
+        chain = copy.deepcopy(self.template)
+        while meets_target(chain[30].calculate_hash(), 1):
+            chain[30].nonce += 1
+        chain[30].hash = chain[30].calculate_hash()
+        report = ChainValidator(workers=1).validate(chain, 1, full=True)
+        self.assertEqual((report.first_invalid_height, report.stage), (30, "proof_of_work"))
+    
+    def test_resumes_from_verified_height(self):
+        """検証済みの高さから続きを検証し、末尾の書き換えや置き換えでは先頭から検証する"""
+        self.validator.validate(self.chain[:30], 1)
+        report = self.validator.validate(self.chain, 1)
+        self.assertTrue(report.valid)
+        self.assertEqual(report.checked_from, 30)
+        self.assertEqual(self.validator.verified_height, 40)
+        self.assertEqual(self.validator.validate(self.chain, 1, full=True).checked_from, 0)
+        
+        # 検証済みの末尾のブロックを書き換えると、記録されたハッシュのままでも先頭から検証する
+        self.chain[39].transactions[0].amount = 1000.0
+        report = self.validator.validate(self.chain, 1)
+        self.assertEqual(report.checked_from, 0)
+        self.assertEqual((report.valid, report.first_invalid_height, report.stage), (False, 39, "hash"))
+        self.assertEqual(self.validator.verified_height, 39)
+        
+        # 難易度が変わった場合と別のチェーンに置き換えた場合も先頭から検証する
+        self.assertEqual(self.validator.validate(self.chain[:39], 2).checked_from, 0)
+        other = make_chain(10)
+        self.validator.validate(self.chain[:39], 1)
+        self.assertEqual(self.validator.validate(other, 1).checked_from, 0)
+    
+    def test_parallel_batches(self):
+        """プロセスプールでのバッチ検証は直列の検証と同じ結果を返す"""
+        validator = ChainValidator(workers=2, parallel_threshold=10, batch_size=7)
+        try:
+            self.assertTrue(validator.validate(self.chain, 1).valid)
+            self.assertIsNotNone(validator._executor)
+            
+            for height in (3, 17, 38):
+                chain = copy.deepcopy(self.template)
+                chain[height].nonce += 1
+                chain[height + 1].nonce += 1
+                parallel = validator.validate(chain, 1, full=True)
+                serial = ChainValidator(workers=1).validate(chain, 1, full=True)
+                self.assertEqual(parallel.first_invalid_height, height)
+                self.assertEqual((parallel.stage, parallel.reason), (serial.stage, serial.reason))
+        finally:
+            validator.close()
+    
+    def test_broken_pool_falls_back_to_serial(self):
+        """ワーカーが異常終了した場合は直列で検証し、プロセスプールを作り直す"""
+        validator = ChainValidator(workers=2, parallel_threshold=10, batch_size=7)
+        try:
+            self.chain[20].nonce += 1
+            self.chain[8].crash = WorkerCrash()
+            report = validator.validate(self.chain, 1, full=True)
+            self.assertEqual((report.first_invalid_height, report.stage), (20, "hash"))
+            self.assertIsNone(validator._executor)
+            
+            del self.chain[8].crash
+            report = validator.validate(self.chain, 1, full=True)
+            self.assertEqual(report.first_invalid_height, 20)
+            self.assertIsNotNone(validator._executor)
+        finally:
+            validator.close()
+    
+    def test_blockchain_detects_tampered_transaction(self):
+        """マイニング後にトランザクションを書き換えるとチェーン全体の検証で検出する"""
+        blockchain = Blockchain(difficulty=1)
+        try:
+            blockchain.add_transaction(Transaction("alice", "bob", 5.0, time.time()))
+            blockchain.mine_pending_transactions("miner")
+            self.assertEqual(len(blockchain.chain), 2)
+            self.assertTrue(blockchain.is_chain_valid())
+            
+            blockchain.chain[0].transactions[0].amount = 1000.0
+            self.assertFalse(blockchain.is_chain_valid())
+            report = blockchain.validate_chain(full=True)
+            self.assertEqual((report.first_invalid_height, report.stage), (0, "hash"))
+            
+            # 検証済みの末尾のブロックの書き換えは差分検証でも検出する
+            blockchain.chain[0].transactions[0].amount = 0.0
+            blockchain.chain[1].transactions[0].amount = 1000.0
+            report = blockchain.validate_chain()
+            self.assertEqual((report.checked_from, report.first_invalid_height), (0, 1))
+        finally:
+            blockchain.close()
+    
+    def test_replace_chain_uses_received_length(self):
+        """申告された長さではなく受け取ったチェーンの長さで比較する"""
+        peers = {
+            "liar:5000": {'length': 10 ** 6, 'chain': [asdict(block) for block in self.template[:2]]},
+            "honest:5000": {'length': 30, 'chain': [asdict(block) for block in self.template[:30]]},
+        }
+        
+        def get(url):
+            node = url.split('/')[2]
+            return Mock(status_code=200, json=Mock(return_value=peers[node]))
+        
+        blockchain = Blockchain(difficulty=1)
+        try:
+            for _ in range(3):
+                blockchain.add_transaction(Transaction("alice", "bob", 5.0, time.time()))
+                blockchain.mine_pending_transactions("miner")
+            own_chain = blockchain.chain
+            
+            blockchain.nodes = {"liar:5000"}
+            with patch('blockchain_samples.requests.get', side_effect=get):
+                self.assertFalse(blockchain.replace_chain())
+            self.assertIs(blockchain.chain, own_chain)
+            
+            # 長さを偽るノードより後に調べても、実際に長いチェーンを選ぶ
+            blockchain.nodes = {"honest:5000", "liar:5000"}
+            with patch('blockchain_samples.requests.get', side_effect=get):
+                self.assertTrue(blockchain.replace_chain())
+            self.assertEqual([block.hash for block in blockchain.chain],
+                             [block.hash for block in self.template[:30]])
+        finally:
+            blockchain.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成音声キャッシュ
+定型の応答文を毎回合成し直さないよう、合成済みのWAVをメモリとディスクに保存する
+
+機能:
+- (テキスト, 音声, 速度, 音量, 感情) をキーとしたキャッシュ
+- メモリ上のLRUキャッシュとディスク上のWAVファイルの2段構成（ディスクも件数の上限で古い順に削除）
+- 定型文だけをキャッシュ（文脈に応じて変わる応答はエンジンで直接再生）
+- 定型文の事前合成（ウォームアップ、1件ずつ進めることもできる）
+- 中断可能なWAV再生
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class WavPlayer:
+    """WAVデータの再生（チャンクごとに中断要求を確認）"""
+    
+    def __init__(self, chunk_size: int = 1024):
+        """再生器を初期化"""
+        self.chunk_size = chunk_size
+        self._audio = None
+    
+    def play(self, data: bytes, should_stop: Callable[[], bool] = lambda: False) -> bool:
+        """WAVデータを再生（最後まで再生したら真、中断したら偽）"""
+        if self._audio is None:
+            # 音声出力を使うときだけ読み込む
+            import pyaudio
+            self._audio = pyaudio.PyAudio()
+        
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            stream = self._audio.open(
+                format=self._audio.get_format_from_width(wav.getsampwidth()),
+                channels=wav.getnchannels(),
+                rate=wav.getframerate(),
+                output=True
+            )
+            try:
+                while not should_stop():
+                    frames = wav.readframes(self.chunk_size)
+                    if not frames:
+                        return True
+                    stream.write(frames)
+                return False
+            finally:
+                stream.stop_stream()
+                stream.close()
+    
+    def close(self):
+        """オーディオデバイスを解放"""
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+class TTSAudioCache:
+    """合成音声キャッシュ
+    
+    キーの音声・速度・音量は合成時点のエンジンの設定から取得するため、
+    呼び出し側は感情に応じた設定を済ませてから get_or_render を呼ぶ。
+    エンジンを操作するため、音声合成ワーカーと同じスレッドで使用する。
+    play は set_templates（または warm_up）で登録した定型文だけをキャッシュから再生する。
+    """
+    
+    def __init__(self, engine, cache_dir: Optional[str] = "tts_cache", max_items: int = 64,
+                 player: Optional[WavPlayer] = None, max_disk_items: int = 512):
+        """キャッシュを初期化（cache_dir が None の場合はメモリのみ）"""
+        self.engine = engine
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.player = player or WavPlayer()
+        self.templates: Set[str] = set()
+        
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def key(self, text: str, emotion: str = "neutral") -> str:
+        """現在のエンジン設定でのキャッシュキー"""
+        params = [
+            text,
+            self.engine.getProperty('voice'),
+            self.engine.getProperty('rate'),
+            round(float(self.engine.getProperty('volume') or 0.0), 3),
+            emotion
+        ]
+        encoded = json.dumps(params, ensure_ascii=False, default=str)
+        return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """キャッシュから取得（メモリ、ディスクの順に探す）"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        data = path.read_bytes()
+        # 削除の順序に使うため、最終利用時刻を更新
+        os.utime(path)
+        self.disk_hits += 1
+        self._remember(key, data)
+        return data
+    
+    def get_or_render(self, text: str, emotion: str = "neutral") -> Optional[bytes]:
+        """キャッシュから取得し、なければ合成して保存"""
+        key = self.key(text, emotion)
+        data = self.get(key)
+        if data is not None:
+            return data
+        
+        self.misses += 1
+        data = self.render(text, key)
+        if data is not None:
+            self._remember(key, data)
+        return data
+    
+    def render(self, text: str, key: str) -> Optional[bytes]:
+        """エンジンでWAVファイルに合成（失敗時はNone）"""
+        path = self._path(key)
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            suffix='.wav', dir=str(self.cache_dir) if self.cache_dir else None
+        )
+        os.close(fd)
+        try:
+            self.engine.save_to_file(text, temp_path)
+            self.engine.runAndWait()
+            data = Path(temp_path).read_bytes()
+            if not data:
+                return None
+            if path is not None:
+                # 書き込み途中のファイルを読まないよう、完成後に置き換える
+                os.replace(temp_path, path)
+                self._evict_disk()
+            return data
+        except Exception as e:
+            logger.error(f"音声キャッシュの合成エラー: {e}")
+            return None
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    
+    def set_templates(self, texts: Iterable[str]):
+        """キャッシュの対象とする定型文を設定"""
+        self.templates = set(texts)
+    
+    def play(self, text: str, emotion: str = "neutral",
+             should_stop: Callable[[], bool] = lambda: False) -> bool:
+        """キャッシュの音声を再生（定型文でないか、合成できなかった場合は偽）"""
+        if text not in self.templates:
+            return False
+        data = self.get_or_render(text, emotion)
+        if data is None:
+            return False
+        self.player.play(data, should_stop)
+        return True
+    
+    def warm_up(self, items: Iterable[Tuple[str, str]],
+                prepare: Optional[Callable[[str], None]] = None) -> int:
+        """(テキスト, 感情) をまとめて事前合成し、新たに合成した件数を返す
+        
+        prepare は感情を受け取り、エンジンの設定を合成前に切り替える関数。
+        """
+        rendered = 0
+        for rendered in self.warm_up_steps(items, prepare):
+            pass
+        return rendered
+    
+    def warm_up_steps(self, items: Iterable[Tuple[str, str]],
+                      prepare: Optional[Callable[[str], None]] = None) -> Iterator[int]:
+        """warm_up を1件ずつ進めるジェネレーター（1件ごとに新たに合成した累計件数を返す）"""
+        rendered = 0
+        for text, emotion in items:
+            self.templates.add(text)
+            if prepare is not None:
+                prepare(emotion)
+            misses = self.misses
+            self.get_or_render(text, emotion)
+            rendered += self.misses - misses
+            yield rendered
+        logger.info(f"音声キャッシュのウォームアップ完了: 新規合成 {rendered} 件")
+    
+    def close(self):
+        """再生デバイスを解放"""
+        self.player.close()
+    
+    def _path(self, key: str) -> Optional[Path]:
+        """ディスク上のキャッシュファイルのパス"""
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{key}.wav"
+    
+    def _evict_disk(self):
+        """ディスク上のファイル数が上限を超えたら、最終利用の古い順に削除"""
+        try:
+            files = sorted(self.cache_dir.glob("*.wav"), key=lambda path: path.stat().st_mtime)
+            for path in files[:max(0, len(files) - self.max_disk_items)]:
+                path.unlink()
+        except OSError as e:
+            logger.error(f"音声キャッシュの削除エラー: {e}")
+    
+    def _remember(self, key: str, data: bytes):
+        """メモリ上のLRUキャッシュに追加"""
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音声合成ワーカー
+音声合成エンジンを専用スレッドで動かし、会話処理を再生完了まで待たせない
+
+機能:
+- (テキスト, 感情) ジョブのキュー
+- 専用スレッドでの合成・再生
+- 再生中の割り込み（バージイン）
+- 発話の合間に少しずつ進める処理（音声キャッシュの事前合成など）
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SpeechJob:
+    """音声合成ジョブ（steps があれば発話ではなく、発話の合間に進める処理）"""
+    text: str
+    emotion: str = "neutral"
+    interrupted: bool = False
+    done: threading.Event = field(default_factory=threading.Event)
+    steps: Optional[Iterator] = None
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """再生完了（または割り込み）まで待機"""
+        return self.done.wait(timeout)
+
+class TTSWorker:
+    """音声合成ワーカー
+    
+    開始後は音声合成エンジンをこのワーカーのスレッドだけが操作する。
+    synthesize は (テキスト, 感情) を受け取り、再生が終わるまでブロックする関数。
+    interrupt() は再生中の発話を次の単語境界で止め、待機中のジョブを破棄する。
+    run_when_idle() のジョブは待機中の発話がないときに1ステップずつ進め、割り込みでは破棄しない。
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, engine, synthesize: Callable[[str, str], None], max_queue: int = 32):
+        """ワーカーを初期化"""
+        self.engine = engine
+        self.synthesize = synthesize
+        
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._interrupt = threading.Event()
+        self._current: Optional[SpeechJob] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_requested = False
+        # 発話の合間に進める処理（ワーカースレッドだけが操作する）
+        self._idle_jobs: Deque[SpeechJob] = deque()
+        
+        # 単語ごとのコールバックはエンジンのスレッドで呼ばれるため、そこで停止させる
+        engine.connect('started-word', self._on_word)
+    
+    @property
+    def is_running(self) -> bool:
+        """ワーカースレッドが動作中か"""
+        return self._thread is not None and self._thread.is_alive()
+    
+    @property
+    def is_speaking(self) -> bool:
+        """再生中か"""
+        return self._current is not None
+    
+    @property
+    def interrupted(self) -> bool:
+        """再生中の発話に割り込み要求が出ているか"""
+        return self._interrupt.is_set()
+    
+    def start(self):
+        """ワーカースレッドを開始"""
+        if self.is_running:
+            return
+        self._stop_requested = False
+        self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+        self._thread.start()
+    
+    def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        """ワーカースレッドを停止（drain が真なら待機中のジョブを再生し終えてから）
+        
+        timeout 秒以内に停止しなければ、ワーカーは動作中のまま戻る（停止要求は残る）。
+        """
+        if self._thread is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not drain:
+            self.interrupt()
+        if not self._stop_requested:
+            try:
+                self._queue.put(self._STOP, timeout=timeout)
+            except queue.Full:
+                logger.warning("音声合成ワーカーの停止要求を追加できませんでした（キューが満杯）")
+                return
+            self._stop_requested = True
+        self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            logger.warning("音声合成ワーカーが時間内に停止しませんでした")
+            return
+        self._thread = None
+        self._stop_requested = False
+    
+    def say(self, text: str, emotion: str = "neutral") -> SpeechJob:
+        """音声合成ジョブを追加（キューが満杯の場合は空くまで待機）"""
+        job = SpeechJob(text, emotion)
+        self._queue.put(job)
+        return job
+    
+    def run_when_idle(self, steps: Iterator, name: str = "") -> SpeechJob:
+        """待機中の発話がないときに steps を1つずつ進めるジョブを追加（終わると done を設定）"""
+        job = SpeechJob(name, steps=steps)
+        self._queue.put(job)
+        return job
+    
+    def interrupt(self):
+        """再生中の発話を止め、待機中のジョブを破棄"""
+        if self._current is None and self._queue.empty():
+            return
+        
+        self._interrupt.set()
+        # 停止要求と発話の合間に進める処理は破棄せずに戻す
+        kept, stop = [], False
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is self._STOP:
+                stop = True
+                break
+            if job.steps is not None:
+                kept.append(job)
+                continue
+            job.interrupted = True
+            job.done.set()
+        for job in kept:
+            self._queue.put(job)
+        if stop:
+            self._queue.put(self._STOP)
+        logger.info("音声出力を中断しました")
+    
+    def _on_word(self, name, location, length):
+        """単語境界で割り込み要求を確認"""
+        if self._interrupt.is_set():
+            self.engine.stop()
+    
+    def _run(self):
+        """ジョブを順に合成・再生（待機中の発話がなければ発話の合間に進める処理を進める）"""
+        while True:
+            if self._idle_jobs and self._queue.empty():
+                self._step_idle_job()
+                continue
+            job = self._queue.get()
+            if job is self._STOP:
+                break
+            if job.steps is not None:
+                self._idle_jobs.append(job)
+                continue
+            
+            self._interrupt.clear()
+            self._current = job
+            try:
+                self.synthesize(job.text, job.emotion)
+            except Exception as e:
+                logger.error(f"音声合成エラー: {e}")
+            finally:
+                job.interrupted = self._interrupt.is_set()
+                self._current = None
+                job.done.set()
+        
+        # 停止時に終わっていない処理は打ち切る
+        while self._idle_jobs:
+            job = self._idle_jobs.popleft()
+            job.interrupted = True
+            job.done.set()
+    
+    def _step_idle_job(self):
+        """発話の合間に進める処理を1ステップ進める"""
+        job = self._idle_jobs[0]
+        self._interrupt.clear()
+        try:
+            next(job.steps)
+            return
+        except StopIteration:
+            pass
+        except Exception as e:
+            logger.error(f"音声合成ワーカーの処理エラー: {e}")
+        self._idle_jobs.popleft()
+        job.done.set()